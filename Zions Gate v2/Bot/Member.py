@@ -1,12 +1,14 @@
 import discord
 from discord.ext import commands
 import aiohttp
-import asyncio
 import csv
 import os
+import time
 from datetime import datetime
-from typing import Optional
-from db_connection import db_connection
+from typing import Any, Dict, List, Optional
+from db_connection import STORAGE_BACKEND, db_connection, close_connections
+from migrate import pending_migrations
+from repository import AsyncRepository
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,6 +21,9 @@ LB_WEBHOOK_URL = os.getenv("LB_WEBHOOK_URL")
 PURGE_WEBHOOK_URL = os.getenv("PURGE_WEBHOOK_URL")
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+STORAGE_WORKERS = int(os.getenv("STORAGE_WORKERS", "4"))
+repo = AsyncRepository(db_connection, max_workers=STORAGE_WORKERS)
+
 intents = discord.Intents.default()
 intents.members = True
 bot = commands.Bot(command_prefix="!", intents=intents)
@@ -34,21 +39,18 @@ def get_user_display(user) -> str:
         disc = "0000"
     return f"{name}#{disc}"
 
+def _is_truthy(val) -> bool:
+    # Global_Banned is BOOLEAN after migration 003 and 'True'/'False' before it.
+    return str(val).strip().lower() in ("1", "true", "yes")
+
 # Server Registration
+# The unique Guild_ID key (migration 002) turns an existing server into a no-op.
+REGISTER_SERVER_QUERY = "INSERT IGNORE INTO servers (Guild_ID, Server_Name, OwnerID, setup) VALUES (%s, %s, 0, FALSE)"
+
 async def register_server(guild: discord.Guild):
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT Guild_ID FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (guild.id,))
-        result = cursor.fetchone()
-        if result is None:
-            insert_query = "INSERT INTO servers (Guild_ID, Server_Name, OwnerID, setup) VALUES (%s, %s, 0, FALSE)"
-            cursor.execute(insert_query, (guild.id, guild.name))
-            connection.commit()
+        if await repo.execute(REGISTER_SERVER_QUERY, (guild.id, guild.name)):
             print(f"Registered server: {guild.name} (ID: {guild.id})")
-        cursor.close()
-        connection.close()
     except Exception as e:
         print("Error registering server:", e)
 
@@ -60,13 +62,7 @@ async def check_server_setup(interaction: discord.Interaction) -> bool:
     if guild is None:
         return True
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT setup FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (guild.id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
+        result = await repo.fetchone("SELECT setup FROM servers WHERE Guild_ID = %s", (guild.id,))
         if result and (result[0] == 1 or result[0] is True or result[0] == "True"):
             return True
         else:
@@ -96,22 +92,15 @@ async def check_command_roles(interaction: discord.Interaction) -> bool:
         return True
     allowed_roles = []
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
         if command_name in ("globalban", "globalunban"):
-            cursor.execute("SELECT Global_1, Global_2, Global_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
-            result = cursor.fetchone()
+            result = await repo.fetchone("SELECT Global_1, Global_2, Global_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
             allowed_roles = [role for role in result if role is not None] if result else []
         elif command_name in ("localkick", "localban"):
-            cursor.execute("SELECT Local_1, Local_2, Local_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
-            local_result = cursor.fetchone()
+            local_result = await repo.fetchone("SELECT Local_1, Local_2, Local_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
             local_roles = [role for role in local_result if role is not None] if local_result else []
-            cursor.execute("SELECT Global_1, Global_2, Global_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
-            global_result = cursor.fetchone()
+            global_result = await repo.fetchone("SELECT Global_1, Global_2, Global_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
             global_roles = [role for role in global_result if role is not None] if global_result else []
             allowed_roles = local_roles + global_roles
-        cursor.close()
-        connection.close()
     except Exception as e:
         print("Error retrieving command roles:", e)
         raise discord.app_commands.CheckFailure("Access Denied: Could not verify your permissions.")
@@ -158,6 +147,9 @@ async def on_app_command_error(interaction: discord.Interaction, error: discord.
             await interaction.response.send_message("An unexpected error occurred.", ephemeral=True)
 
 # Database Utility Functions
+# Single-statement inserts; the unique User_ID key (migration 002) skips users already present.
+INSERT_USER_QUERY = "INSERT IGNORE INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
+
 async def add_member_to_users(member: discord.Member):
     if member.bot:
         return
@@ -165,66 +157,53 @@ async def add_member_to_users(member: discord.Member):
     user_name = get_user_display(member)
     account_age = member.created_at.strftime('%Y-%m-%d')
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        select_query = "SELECT User_ID FROM Users WHERE User_ID = %s"
-        cursor.execute(select_query, (user_id,))
-        result = cursor.fetchone()
-        if result is None:
-            insert_query = "INSERT INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
-            data_tuple = (user_id, user_name, account_age, "False")
-            cursor.execute(insert_query, data_tuple)
-            connection.commit()
+        if await repo.execute(INSERT_USER_QUERY, (user_id, user_name, account_age, False)):
             print(f"Added new user: {user_name} (ID: {user_id}) to Users table.")
-        cursor.close()
-        connection.close()
     except Exception as e:
         print("Database error:", e)
 
-async def add_user_to_db(user: discord.User):
-    user_id = user.id
-    user_name = get_user_display(user)
-    account_age = user.created_at.strftime('%Y-%m-%d')
+BULK_CHUNK_SIZE = 1000
+
+def _add_users_sync(cursor, rows: List[tuple]) -> int:
+    # The connector sends each chunk as one multi-row INSERT IGNORE.
+    inserted = 0
+    for i in range(0, len(rows), BULK_CHUNK_SIZE):
+        cursor.executemany(INSERT_USER_QUERY, rows[i:i + BULK_CHUNK_SIZE])
+        inserted += max(cursor.rowcount, 0)
+    return inserted
+
+async def add_members_to_users(members) -> Dict[str, Any]:
+    """Insert every non-bot member not already in Users with one executemany. Returns counts and timing."""
+    started = time.perf_counter()
+    rows = {}
+    for member in members:
+        if not member.bot:
+            rows[member.id] = (member.id, get_user_display(member), member.created_at.strftime('%Y-%m-%d'), False)
+    inserted = 0
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        select_query = "SELECT User_ID FROM Users WHERE User_ID = %s"
-        cursor.execute(select_query, (user_id,))
-        result = cursor.fetchone()
-        if result is None:
-            insert_query = "INSERT INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
-            data_tuple = (user_id, user_name, account_age, "False")
-            cursor.execute(insert_query, data_tuple)
-            connection.commit()
-            print(f"Added new user: {user_name} (ID: {user_id}) to Users table.")
-        cursor.close()
-        connection.close()
+        inserted = await repo.transaction(_add_users_sync, list(rows.values()))
     except Exception as e:
         print("Database error:", e)
+    stats = {"inserted": inserted, "skipped": len(rows) - inserted, "seconds": time.perf_counter() - started}
+    print(f"Bulk user sync: {stats['inserted']} added, {stats['skipped']} already present in {stats['seconds']:.3f}s.")
+    return stats
 
-async def set_global_ban(user_id: int, banned: bool):
+SET_GLOBAL_BAN_QUERY = (
+    "INSERT INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s) "
+    "ON DUPLICATE KEY UPDATE Global_Banned = VALUES(Global_Banned)"
+)
+
+async def set_global_ban(user: discord.User, banned: bool):
+    """Set the flag, creating the user's row first if they have never been seen."""
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "UPDATE Users SET Global_Banned = %s WHERE User_ID = %s"
-        value = "True" if banned else "False"
-        cursor.execute(query, (value, user_id))
-        connection.commit()
-        cursor.close()
-        connection.close()
+        await repo.execute(SET_GLOBAL_BAN_QUERY, (user.id, get_user_display(user), user.created_at.strftime('%Y-%m-%d'), banned))
     except Exception as e:
         print("Database error:", e)
 
 async def is_globally_banned(user_id: int) -> bool:
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT Global_Banned FROM Users WHERE User_ID = %s"
-        cursor.execute(query, (user_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        return result and result[0] == "True"
+        result = await repo.fetchone("SELECT Global_Banned FROM Users WHERE User_ID = %s", (user_id,))
+        return bool(result) and _is_truthy(result[0])
     except Exception as e:
         print("Database error:", e)
         return False
@@ -233,13 +212,7 @@ async def is_globally_banned(user_id: int) -> bool:
 @bot.event
 async def on_member_join(member: discord.Member):
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT setup FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (member.guild.id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
+        result = await repo.fetchone("SELECT setup FROM servers WHERE Guild_ID = %s", (member.guild.id,))
         if result and (result[0] == 1 or result[0] is True or result[0] == "True"):
             await add_member_to_users(member)
             if await is_globally_banned(member.id):
@@ -273,13 +246,7 @@ async def setup(interaction: discord.Interaction, local1: discord.Role, global1:
     except Exception as e:
         print("Error registering server in /setup:", e)
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT OwnerID FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (guild.id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
+        result = await repo.fetchone("SELECT OwnerID FROM servers WHERE Guild_ID = %s", (guild.id,))
     except Exception as e:
         print("Error retrieving OwnerID:", e)
         await interaction.response.send_message("Error checking server registration.", ephemeral=True)
@@ -291,16 +258,10 @@ async def setup(interaction: discord.Interaction, local1: discord.Role, global1:
         await interaction.response.send_message("Access Denied: Only the registered server owner can run this command.", ephemeral=True)
         return
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
         update_query = "UPDATE servers SET Server_Name = %s, Local_1 = %s, Local_2 = %s, Local_3 = %s, Global_1 = %s, Global_2 = %s, Global_3 = %s, setup = TRUE WHERE Guild_ID = %s"
         data = (guild.name, local1.id, local2.id if local2 else None, local3.id if local3 else None, global1.id, global2.id if global2 else None, global3.id if global3 else None, guild.id)
-        cursor.execute(update_query, data)
-        connection.commit()
-        cursor.close()
-        connection.close()
-        for member in guild.members:
-            await add_member_to_users(member)
+        await repo.execute(update_query, data)
+        await add_members_to_users(guild.members)
         await interaction.response.send_message("Server setup complete. Command access is now enabled.", ephemeral=True)
     except Exception as e:
         print("Error in /setup:", e)
@@ -310,9 +271,7 @@ async def setup(interaction: discord.Interaction, local1: discord.Role, global1:
 @bot.tree.command(name="globalban", description="Globally ban a user from all servers. Reason required; reply with evidence screenshots.")
 async def globalban(interaction: discord.Interaction, user: discord.User, reason: str):
     await interaction.response.defer(ephemeral=True)
-    # Ensure the user is in the database
-    await add_user_to_db(user)
-    await set_global_ban(user.id, True)
+    await set_global_ban(user, True)
     banned_in = []
     for guild in bot.guilds:
         member = guild.get_member(user.id)
@@ -354,7 +313,7 @@ async def globalban(interaction: discord.Interaction, user: discord.User, reason
 @bot.tree.command(name="globalunban", description="Globally unban a user from all servers and remove the global ban flag.")
 async def globalunban(interaction: discord.Interaction, user: discord.User):
     await interaction.response.defer(ephemeral=True)
-    await set_global_ban(user.id, False)
+    await set_global_ban(user, False)
     unbanned_in = []
     for guild in bot.guilds:
         try:
@@ -506,19 +465,33 @@ async def on_ready():
         except Exception as e:
             print("Error auto-registering server:", e)
         try:
-            connection = db_connection()
-            cursor = connection.cursor()
-            query = "SELECT setup FROM servers WHERE Guild_ID = %s"
-            cursor.execute(query, (guild.id,))
-            result = cursor.fetchone()
-            cursor.close()
-            connection.close()
+            result = await repo.fetchone("SELECT setup FROM servers WHERE Guild_ID = %s", (guild.id,))
             if result and (result[0] == 1 or result[0] is True or result[0] == "True"):
-                for member in guild.members:
-                    await add_member_to_users(member)
+                await add_members_to_users(guild.members)
             else:
                 print(f"Server {guild.name} is not set up; not adding members to Users table.")
         except Exception as e:
             print(f"Error checking setup for guild {guild.name}:", e)
 
-bot.run(BOT_TOKEN)
\ No newline at end of file
+def check_schema():
+    """Refuse to start on a MySQL schema with pending migrations.
+
+    The INSERT IGNORE and ON DUPLICATE KEY UPDATE queries above only dedupe
+    once migration 002 has added the unique User_ID and Guild_ID keys.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        return
+    conn = db_connection()
+    try:
+        pending = pending_migrations(conn)
+    finally:
+        conn.close()
+    if pending:
+        names = ", ".join(f"{m.version:03d} {m.name}" for m in pending)
+        raise SystemExit(f"Database schema is missing migration(s) {names}. Run python migrate.py first.")
+
+if __name__ == "__main__":
+    check_schema()
+    bot.run(BOT_TOKEN)
+    repo.close()
+    close_connections()
\ No newline at end of file
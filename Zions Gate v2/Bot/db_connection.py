@@ -1,14 +1,194 @@
-import mysql.connector
 import os
+import queue
+import threading
+import time
 from dotenv import load_dotenv
+from sqlite_backend import SQLiteDatabase
 
 load_dotenv()
 
-def db_connection():
+# "mysql" (default) or "sqlite"; import existing CSV exports with
+#   python sqlite_backend.py <database> "../SQL Files/servers.csv" "../SQL Files/Users.csv"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mysql").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "zions_gate.db")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Idle connections older than this are health-checked before being handed out.
+DB_POOL_PING_AFTER = float(os.getenv("DB_POOL_PING_AFTER", "30"))
+
+
+def _connect():
+    import mysql.connector
+
     dbc = mysql.connector.connect(
-        host="localhost",
-        user="ChilledFisher",
+        host=os.getenv("DB_HOST", "localhost"),
+        user=os.getenv("DB_USER", "ChilledFisher"),
         passwd=os.getenv("db_passwd"),
-        database="Discord" 
+        database=os.getenv("DB_NAME", "Discord")
     )
     return dbc
+
+
+def _is_alive(conn) -> bool:
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+class PooledConnection:
+    """Wraps a pooled connection; close() hands it back to the pool instead of closing it."""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            # Drop anything the caller left uncommitted so the next user starts clean.
+            conn.rollback()
+        except Exception:
+            self._pool.release(conn, broken=True)
+            return
+        self._pool.release(conn)
+
+
+class ConnectionPool:
+    def __init__(self, factory, size: int = 5, acquire_timeout: float = 10.0, ping_after: float = 30.0):
+        self._factory = factory
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.ping_after = ping_after
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._vacant = 0
+        self._acquires = 0
+        self._acquire_total = 0.0
+        self._acquire_max = 0.0
+        self._timeouts = 0
+        self._reconnects = 0
+
+    def acquire(self) -> PooledConnection:
+        started = time.perf_counter()
+        conn = self._take(started)
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._acquires += 1
+            self._acquire_total += waited
+            self._acquire_max = max(self._acquire_max, waited)
+        return PooledConnection(self, conn)
+
+    def _take(self, started: float):
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                return self._new_connection()
+            try:
+                conn, last_used = self._idle.get(timeout=self.acquire_timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._timeouts += 1
+                raise TimeoutError(f"No database connection available after {time.perf_counter() - started:.1f}s")
+        if conn is None:
+            # A vacated slot: open a connection in its place.
+            with self._lock:
+                self._vacant -= 1
+            return self._new_connection()
+        if time.monotonic() - last_used >= self.ping_after and not _is_alive(conn):
+            with self._lock:
+                self._reconnects += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return self._new_connection()
+        return conn
+
+    def _new_connection(self):
+        try:
+            return self._factory()
+        except Exception:
+            self._vacate()
+            raise
+
+    def _vacate(self):
+        # The slot stays counted in _created; whoever takes the marker, including a
+        # thread already blocked in _take(), opens a new connection for it.
+        with self._lock:
+            self._vacant += 1
+        self._idle.put((None, 0.0))
+
+    def release(self, conn, broken: bool = False):
+        if broken:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            self._vacate()
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            acquires = self._acquires or 1
+            return {
+                "size": self.size,
+                "open": self._created - self._vacant,
+                "idle": self._idle.qsize() - self._vacant,
+                "acquires": self._acquires,
+                "avg_acquire_ms": self._acquire_total / acquires * 1000,
+                "max_acquire_ms": self._acquire_max * 1000,
+                "timeouts": self._timeouts,
+                "reconnects": self._reconnects,
+            }
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            with self._lock:
+                self._created -= 1
+                self._vacant -= conn is None
+
+
+if STORAGE_BACKEND == "sqlite":
+    database = SQLiteDatabase(SQLITE_PATH)
+    pool = None
+else:
+    database = None
+    pool = ConnectionPool(_connect, size=DB_POOL_SIZE, acquire_timeout=DB_POOL_TIMEOUT, ping_after=DB_POOL_PING_AFTER)
+
+def db_connection():
+    if database is not None:
+        return database.connect()
+    return pool.acquire()
+
+def close_connections():
+    if database is not None:
+        database.close()
+    else:
+        pool.close()
@@ -0,0 +1,112 @@
+"""Versioned schema migrations for the MySQL/MariaDB backend.
+
+    python migrate.py            apply pending migrations
+    python migrate.py --status   list applied and pending migrations
+
+Migrations are the numbered files in "SQL Files/migrations" (NNN_name.sql).
+Each is applied once, in order, and recorded in schema_migrations. DDL
+commits implicitly, so every statement must be safe to run again if a
+migration stops halfway.
+
+The connection settings are the bot's (DB_HOST, DB_USER, DB_NAME,
+db_passwd), so pointing them at a local MariaDB tests a migration before
+it runs against the live database.
+"""
+import argparse
+import re
+from pathlib import Path
+from typing import List, NamedTuple, Set
+
+from db_connection import _connect
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "SQL Files" / "migrations"
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version int(11) NOT NULL PRIMARY KEY,
+  name varchar(100) NOT NULL,
+  applied_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+
+def migration_files(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations = []
+    for path in directory.glob("*.sql"):
+        match = re.match(r"^(\d+)_(.+)\.sql$", path.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), path))
+    migrations.sort()
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration version in {directory}")
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+
+
+def applied_versions(cursor) -> Set[int]:
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {int(row[0]) for row in cursor.fetchall()}
+
+
+def pending_migrations(conn) -> List[Migration]:
+    cursor = conn.cursor()
+    try:
+        applied = applied_versions(cursor)
+    finally:
+        cursor.close()
+    return [m for m in migration_files() if m.version not in applied]
+
+
+def migrate(conn) -> List[Migration]:
+    """Apply every pending migration in version order; stops at the first failure."""
+    done = []
+    for migration in pending_migrations(conn):
+        cursor = conn.cursor()
+        try:
+            for statement in split_statements(migration.path.read_text(encoding="utf-8")):
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (migration.version, migration.name),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        print(f"Applied migration {migration.version:03d} {migration.name}")
+        done.append(migration)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    args = parser.parse_args()
+    conn = _connect()
+    try:
+        if args.status:
+            pending = {m.version for m in pending_migrations(conn)}
+            for m in migration_files():
+                print(f"{m.version:03d} {m.name:<40} {'pending' if m.version in pending else 'applied'}")
+        elif not migrate(conn):
+            print("Database schema is up to date.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""SQLite storage behind the same db_connection() interface as the MySQL and CSV backends.
+
+Queries are written for MySQL (%s placeholders, INSERT IGNORE) and translated
+once per statement text; sqlite3 keeps the compiled statements cached per
+connection. The database runs in WAL mode, so readers don't wait on a writer.
+
+One-shot import from the CSV files:
+
+    python sqlite_backend.py <database> <servers.csv> <users.csv>
+"""
+import csv
+import re
+import sqlite3
+import sys
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS Users (
+    User_AI_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    User_ID INTEGER NOT NULL,
+    User_Name TEXT NOT NULL,
+    Account_Age TEXT NOT NULL,
+    Global_Banned TEXT NOT NULL DEFAULT 'False'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS Users_User_ID ON Users (User_ID);
+
+CREATE TABLE IF NOT EXISTS servers (
+    Server_AI_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Guild_ID INTEGER NOT NULL,
+    Server_Name TEXT NOT NULL,
+    Local_1 INTEGER,
+    Local_2 INTEGER,
+    Local_3 INTEGER,
+    Global_1 INTEGER,
+    Global_2 INTEGER,
+    Global_3 INTEGER,
+    OwnerID INTEGER NOT NULL DEFAULT 0,
+    setup INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS servers_Guild_ID ON servers (Guild_ID);
+"""
+
+_INSERT = re.compile(r"^\s*INSERT\s+(?:(?:OR\s+)?IGNORE\s+)?INTO\s+(\w+)\s*\(([^)]*)\)", re.IGNORECASE)
+_UPSERT = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+
+# (table, inserted rows as column -> value dicts), called after the transaction commits.
+InsertHook = Callable[[str, List[Dict[str, Any]]], None]
+
+
+@lru_cache(maxsize=256)
+def translate(query: str) -> str:
+    """MySQL-flavoured statement -> SQLite."""
+    query = query.replace("%s", "?")
+    query = re.sub(r"^\s*INSERT\s+IGNORE\s+INTO", "INSERT OR IGNORE INTO", query, flags=re.IGNORECASE)
+    upsert = re.search(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\s+(.*)$", query, flags=re.IGNORECASE | re.DOTALL)
+    if upsert:
+        assignments = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", upsert.group(1), flags=re.IGNORECASE)
+        query = query[:upsert.start()] + "ON CONFLICT DO UPDATE SET " + assignments
+    return query
+
+
+@lru_cache(maxsize=64)
+def _insert_target(query: str):
+    match = _INSERT.match(query)
+    if not match:
+        return None
+    return match.group(1), [c.strip() for c in match.group(2).split(",")]
+
+
+@lru_cache(maxsize=64)
+def _is_upsert(query: str) -> bool:
+    return _UPSERT.search(query) is not None
+
+
+class SQLiteCursor:
+    def __init__(self, connection: "SQLiteConnection"):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self.rowcount = 0
+
+    def execute(self, query: str, params: Sequence = ()):
+        last_rowid = self._last_insert_rowid(query)
+        self._cursor.execute(translate(query), tuple(params))
+        self.rowcount = self._cursor.rowcount
+        if self._inserted(last_rowid):
+            self._record_insert(query, [params])
+
+    def executemany(self, query: str, seq_params):
+        seq_params = [tuple(p) for p in seq_params]
+        target = _insert_target(query)
+        if target is None or self._connection.on_insert is None:
+            self._cursor.executemany(translate(query), seq_params)
+            self.rowcount = self._cursor.rowcount
+            return
+        # Run the rows one by one (same prepared statement) to learn which ones were new.
+        sql = translate(query)
+        last_rowid = self._last_insert_rowid(query)
+        inserted = []
+        for params in seq_params:
+            self._cursor.execute(sql, params)
+            if self._inserted(last_rowid):
+                inserted.append(params)
+                if last_rowid is not None:
+                    last_rowid = self._cursor.lastrowid
+        self.rowcount = len(inserted)
+        self._record_insert(query, inserted)
+
+    def _last_insert_rowid(self, query: str) -> Optional[int]:
+        """For an upsert with an insert hook, the connection's last inserted rowid before it runs.
+
+        SQLite counts an upsert that updated a row as one change, same as an
+        insert; only an insert moves last_insert_rowid.
+        """
+        if self._connection.on_insert is None or not _is_upsert(query):
+            return None
+        return self._connection.raw.execute("SELECT last_insert_rowid()").fetchone()[0]
+
+    def _inserted(self, last_rowid: Optional[int]) -> bool:
+        if self._cursor.rowcount <= 0:
+            return False
+        return last_rowid is None or self._cursor.lastrowid != last_rowid
+
+    def _record_insert(self, query: str, seq_params):
+        if self._connection.on_insert is None or not seq_params:
+            return
+        target = _insert_target(query)
+        if target is not None:
+            table, columns = target
+            self._connection.pending.append((table, [dict(zip(columns, p)) for p in seq_params]))
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """A thread's connection; close() rolls back anything uncommitted but keeps it open for reuse."""
+
+    def __init__(self, raw: sqlite3.Connection, on_insert: Optional[InsertHook]):
+        self.raw = raw
+        self.on_insert = on_insert
+        self.pending = []
+
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self)
+
+    def commit(self):
+        self.raw.commit()
+        pending, self.pending = self.pending, []
+        for table, rows in pending:
+            self.on_insert(table, rows)
+
+    def rollback(self):
+        self.raw.rollback()
+        self.pending = []
+
+    def close(self):
+        self.rollback()
+
+
+class SQLiteDatabase:
+    """Opens one connection per thread against a WAL-mode database file."""
+
+    def __init__(self, path: Path, on_insert: Optional[InsertHook] = None, busy_timeout: float = 5.0):
+        self.path = Path(path)
+        self.on_insert = on_insert
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        raw = self._open()
+        try:
+            raw.executescript(SCHEMA)
+        finally:
+            raw.close()
+
+    def _open(self) -> sqlite3.Connection:
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False, cached_statements=256)
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("PRAGMA synchronous=NORMAL")
+        return raw
+
+    def connect(self) -> SQLiteConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            raw = self._open()
+            with self._lock:
+                self._connections.append(raw)
+            connection = self._local.connection = SQLiteConnection(raw, self.on_insert)
+        return connection
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for raw in connections:
+            try:
+                raw.close()
+            except sqlite3.Error:
+                pass
+
+
+def _csv_value(value: Optional[str]) -> Optional[str]:
+    if value is None or value.strip() == "" or value.strip().upper() == "NULL":
+        return None
+    return value
+
+
+def _csv_flag(value: Optional[str]) -> int:
+    return 1 if str(value).strip().lower() in ("1", "true", "yes") else 0
+
+
+def import_csvs(db_path: Path, servers_csv: Path, users_csv: Path) -> Dict[str, int]:
+    """Load servers.csv and users.csv into the database; rows already present (by Guild_ID/User_ID) are kept."""
+    database = SQLiteDatabase(db_path)
+    raw = database.connect().raw
+    counts = {}
+    with open(servers_csv, newline="", encoding="utf-8") as f:
+        rows = [
+            (
+                _csv_value(r.get("Server_AI_ID")), r["Guild_ID"], r.get("Server_Name") or "",
+                _csv_value(r.get("Local_1")), _csv_value(r.get("Local_2")), _csv_value(r.get("Local_3")),
+                _csv_value(r.get("Global_1")), _csv_value(r.get("Global_2")), _csv_value(r.get("Global_3")),
+                _csv_value(r.get("OwnerID")) or 0, _csv_flag(r.get("setup")),
+            )
+            for r in csv.DictReader(f)
+        ]
+    before = raw.total_changes
+    raw.executemany(
+        "INSERT OR IGNORE INTO servers (Server_AI_ID, Guild_ID, Server_Name, Local_1, Local_2, Local_3, "
+        "Global_1, Global_2, Global_3, OwnerID, setup) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    counts["servers"] = raw.total_changes - before
+    with open(users_csv, newline="", encoding="utf-8") as f:
+        before = raw.total_changes
+        raw.executemany(
+            "INSERT OR IGNORE INTO Users (User_AI_ID, User_ID, User_Name, Account_Age, Global_Banned) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                (_csv_value(r.get("User_AI_ID")), r["User_ID"], r["User_Name"], r["Account_Age"],
+                 "True" if _csv_flag(r.get("Global_Banned")) else "False")
+                for r in csv.DictReader(f)
+            ),
+        )
+        counts["users"] = raw.total_changes - before
+    raw.commit()
+    database.close()
+    return counts
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        sys.exit(__doc__)
+    counts = import_csvs(Path(sys.argv[1]), Path(sys.argv[2]), Path(sys.argv[3]))
+    print(f"Imported {counts['servers']} server(s) and {counts['users']} user(s) into {sys.argv[1]}.")
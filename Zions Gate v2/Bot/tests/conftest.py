@@ -0,0 +1,5 @@
+"""Run from this directory's bot folder: cd "Zions Gate v2/Bot" && python -m pytest tests"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from db_connection import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, n: int):
+        self.n = n
+        self.closed = False
+        self.fail_rollback = False
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise OSError("server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+def counting_factory():
+    made = []
+
+    def factory():
+        made.append(FakeConnection(len(made)))
+        return made[-1]
+
+    return factory, made
+
+
+def acquire_in_thread(pool):
+    result = {}
+
+    def run():
+        started = time.perf_counter()
+        try:
+            result["conn"] = pool.acquire()
+        except Exception as e:
+            result["error"] = e
+        result["waited"] = time.perf_counter() - started
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, result
+
+
+def test_reuses_released_connection():
+    factory, made = counting_factory()
+    pool = ConnectionPool(factory, size=2)
+    pool.acquire().close()
+    pool.acquire().close()
+    assert len(made) == 1
+    assert pool.stats()["open"] == 1
+
+
+def test_times_out_when_exhausted():
+    factory, _ = counting_factory()
+    pool = ConnectionPool(factory, size=1, acquire_timeout=0.05)
+    held = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+
+
+def test_broken_release_wakes_a_waiter():
+    factory, made = counting_factory()
+    pool = ConnectionPool(factory, size=1, acquire_timeout=5)
+    held = pool.acquire()
+    thread, result = acquire_in_thread(pool)
+    time.sleep(0.1)
+    assert thread.is_alive()
+    held._conn.fail_rollback = True
+    held.close()
+    thread.join(timeout=2)
+    assert not thread.is_alive()
+    assert "error" not in result and result["waited"] < 2
+    assert result["conn"]._conn is made[1]
+    assert made[0].closed
+    assert pool.stats()["open"] == 1
+
+
+def test_failed_connect_frees_the_slot():
+    made = []
+
+    def factory():
+        if not made:
+            made.append(None)
+            raise OSError("refused")
+        made.append(FakeConnection(len(made)))
+        return made[-1]
+
+    pool = ConnectionPool(factory, size=1, acquire_timeout=0.5)
+    with pytest.raises(OSError):
+        pool.acquire()
+    conn = pool.acquire()
+    assert conn._conn is made[1]
+    assert pool.stats()["open"] == 1
+    conn.close()
+    pool.close()
+    assert pool.stats()["open"] == 0
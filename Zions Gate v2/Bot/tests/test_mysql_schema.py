@@ -0,0 +1,131 @@
+"""Schema and upsert checks against a real MySQL/MariaDB server.
+
+These drop and recreate Users, servers and schema_migrations, so they only
+run against a scratch database named in MYSQL_TEST_DATABASE:
+
+    MYSQL_TEST_DATABASE=zg_test MYSQL_TEST_USER=root MYSQL_TEST_PASSWORD=... python -m pytest tests
+"""
+import os
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import migrate
+
+INIT_SQL = Path(migrate.MIGRATIONS_DIR).parent / "init.sql"
+
+# The tables as they were before migrations 001-003.
+LEGACY_SCHEMA = """
+CREATE TABLE Users (
+  User_AI_ID int(11) NOT NULL AUTO_INCREMENT,
+  User_ID bigint(20) NOT NULL,
+  User_Name varchar(45) NOT NULL,
+  Account_Age date NOT NULL,
+  Global_Banned varchar(5) NOT NULL,
+  PRIMARY KEY (User_AI_ID)
+);
+CREATE TABLE servers (
+  Server_AI_ID int(11) NOT NULL AUTO_INCREMENT,
+  Guild_ID bigint(20) NOT NULL,
+  Server_Name varchar(100) NOT NULL,
+  Local_1 bigint(20) DEFAULT NULL,
+  Local_2 bigint(20) DEFAULT NULL,
+  Local_3 bigint(20) DEFAULT NULL,
+  Global_1 bigint(20) DEFAULT NULL,
+  Global_2 bigint(20) DEFAULT NULL,
+  Global_3 bigint(20) DEFAULT NULL,
+  OwnerID bigint(20) NOT NULL DEFAULT 0,
+  setup tinyint(1) NOT NULL DEFAULT 0,
+  PRIMARY KEY (Server_AI_ID)
+)
+"""
+
+
+@pytest.fixture
+def conn():
+    database = os.getenv("MYSQL_TEST_DATABASE")
+    if not database:
+        pytest.skip("MYSQL_TEST_DATABASE is not set")
+    mysql_connector = pytest.importorskip("mysql.connector")
+    try:
+        connection = mysql_connector.connect(
+            host=os.getenv("MYSQL_TEST_HOST", "localhost"),
+            port=int(os.getenv("MYSQL_TEST_PORT", "3306")),
+            user=os.getenv("MYSQL_TEST_USER", "root"),
+            passwd=os.getenv("MYSQL_TEST_PASSWORD", ""),
+            database=database,
+        )
+    except mysql_connector.Error as e:
+        pytest.skip(f"no MySQL/MariaDB server: {e}")
+    run(connection, "DROP TABLE IF EXISTS Users; DROP TABLE IF EXISTS servers; DROP TABLE IF EXISTS schema_migrations")
+    yield connection
+    connection.close()
+
+
+def run(conn, sql: str):
+    cursor = conn.cursor()
+    try:
+        for statement in migrate.split_statements(sql):
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def query(conn, sql: str, params=()):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def execute(conn, sql: str, params=()) -> int:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def test_init_sql_has_no_pending_migrations(conn):
+    run(conn, INIT_SQL.read_text(encoding="utf-8"))
+    assert migrate.pending_migrations(conn) == []
+    assert migrate.migrate(conn) == []
+
+
+def test_migrations_upgrade_legacy_schema(conn):
+    run(conn, LEGACY_SCHEMA)
+    users = [(1, "a#0001", "False"), (1, "a#0001", "True"), (2, "b#0002", "false"), (2, "b#0002", "False")]
+    for user_id, name, banned in users:
+        execute(conn, "INSERT INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)",
+                (user_id, name, date(2020, 1, 1), banned))
+    for guild_id, setup in ((10, 0), (10, 1), (11, 0)):
+        execute(conn, "INSERT INTO servers (Guild_ID, Server_Name, setup) VALUES (%s, 'g', %s)", (guild_id, setup))
+
+    assert [m.version for m in migrate.pending_migrations(conn)] == [1, 2, 3]
+    migrate.migrate(conn)
+    assert migrate.pending_migrations(conn) == []
+    # The banned duplicate survives, then the oldest.
+    assert query(conn, "SELECT User_ID, Global_Banned FROM Users ORDER BY User_ID") == [(1, 1), (2, 0)]
+    assert query(conn, "SELECT Guild_ID, setup FROM servers ORDER BY Guild_ID") == [(10, 1), (11, 0)]
+
+
+def test_member_queries_rely_on_unique_keys(conn):
+    import Member
+
+    run(conn, INIT_SQL.read_text(encoding="utf-8"))
+    row = (42, "c#0003", date(2021, 5, 6), False)
+    assert execute(conn, Member.INSERT_USER_QUERY, row) == 1
+    assert execute(conn, Member.INSERT_USER_QUERY, row) == 0
+    execute(conn, Member.SET_GLOBAL_BAN_QUERY, (42, "c#0003", date(2021, 5, 6), True))
+    execute(conn, Member.SET_GLOBAL_BAN_QUERY, (43, "d#0004", date(2021, 5, 6), True))
+    assert query(conn, "SELECT User_ID, Global_Banned FROM Users ORDER BY User_ID") == [(42, 1), (43, 1)]
+
+    assert execute(conn, Member.REGISTER_SERVER_QUERY, (10, "g")) == 1
+    assert execute(conn, Member.REGISTER_SERVER_QUERY, (10, "g")) == 0
+    assert query(conn, "SELECT COUNT(*) FROM servers") == [(1,)]
@@ -0,0 +1,67 @@
+"""Member.py's MySQL-flavoured writes against the SQLite backend (STORAGE_BACKEND=sqlite)."""
+import asyncio
+
+import pytest
+
+import Member
+from repository import AsyncRepository
+from sqlite_backend import SQLiteDatabase
+
+
+@pytest.fixture
+def repo(tmp_path):
+    database = SQLiteDatabase(tmp_path / "zions_gate.db")
+    repository = AsyncRepository(database.connect, max_workers=2)
+    yield repository
+    repository.close()
+    database.close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_insert_ignore_skips_known_users(repo):
+    row = (42, "c#0003", "2021-05-06", False)
+    assert run(repo.execute(Member.INSERT_USER_QUERY, row)) == 1
+    assert run(repo.execute(Member.INSERT_USER_QUERY, row)) == 0
+    assert run(repo.fetchone("SELECT COUNT(*) FROM Users")) == (1,)
+
+
+def test_bulk_insert_counts_only_new_rows(repo, monkeypatch):
+    monkeypatch.setattr(Member, "BULK_CHUNK_SIZE", 3)
+    rows = [(i, f"u{i}#0001", "2021-05-06", False) for i in range(10)]
+    assert run(repo.transaction(Member._add_users_sync, rows[:4])) == 4
+    assert run(repo.transaction(Member._add_users_sync, rows)) == 6
+    assert run(repo.fetchone("SELECT COUNT(*) FROM Users")) == (10,)
+
+
+def test_set_global_ban_upserts(repo):
+    run(repo.execute(Member.INSERT_USER_QUERY, (42, "c#0003", "2021-05-06", False)))
+    run(repo.execute(Member.SET_GLOBAL_BAN_QUERY, (42, "c#0003", "2021-05-06", True)))
+    run(repo.execute(Member.SET_GLOBAL_BAN_QUERY, (43, "d#0004", "2021-05-06", True)))
+    rows = run(repo.fetchall("SELECT User_ID, User_Name, Global_Banned FROM Users ORDER BY User_ID"))
+    assert [(user_id, name, Member._is_truthy(banned)) for user_id, name, banned in rows] == [
+        (42, "c#0003", True), (43, "d#0004", True)]
+
+
+def test_register_server_once(repo):
+    assert run(repo.execute(Member.REGISTER_SERVER_QUERY, (10, "guild"))) == 1
+    assert run(repo.execute(Member.REGISTER_SERVER_QUERY, (10, "guild"))) == 0
+    assert run(repo.fetchone("SELECT Guild_ID, OwnerID, setup FROM servers")) == (10, 0, 0)
+
+
+def test_upsert_reports_only_new_users_to_the_insert_hook(tmp_path):
+    inserted = []
+    database = SQLiteDatabase(tmp_path / "zions_gate.db", on_insert=lambda table, rows: inserted.extend(rows))
+    repository = AsyncRepository(database.connect, max_workers=1)
+    try:
+        run(repository.execute(Member.INSERT_USER_QUERY, (42, "c#0003", "2021-05-06", False)))
+        run(repository.execute(Member.SET_GLOBAL_BAN_QUERY, (42, "c#0003", "2021-05-06", True)))
+        run(repository.executemany(Member.SET_GLOBAL_BAN_QUERY, [
+            (42, "c#0003", "2021-05-06", False), (43, "d#0004", "2021-05-06", True),
+            (43, "d#0004", "2021-05-06", False), (44, "e#0005", "2021-05-06", True)]))
+    finally:
+        repository.close()
+        database.close()
+    assert [row["User_ID"] for row in inserted] == [42, 43, 44]
@@ -27,8 +27,10 @@ CREATE TABLE `Users` (
   `User_ID` bigint(20) NOT NULL,
   `User_Name` varchar(45) NOT NULL,
   `Account_Age` date NOT NULL,
-  `Global_Banned` varchar(5) NOT NULL,
-  PRIMARY KEY (`User_AI_ID`)
+  `Global_Banned` tinyint(1) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`User_AI_ID`),
+  UNIQUE KEY `Users_User_ID` (`User_ID`),
+  KEY `Users_Global_Banned` (`Global_Banned`,`User_ID`)
 ) ENGINE=InnoDB AUTO_INCREMENT=2210 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -51,9 +53,29 @@ CREATE TABLE `servers` (
   `Global_3` bigint(20) DEFAULT NULL,
   `OwnerID` bigint(20) NOT NULL DEFAULT 0,
   `setup` tinyint(1) NOT NULL DEFAULT 0,
-  PRIMARY KEY (`Server_AI_ID`)
+  PRIMARY KEY (`Server_AI_ID`),
+  UNIQUE KEY `servers_Guild_ID` (`Guild_ID`)
 ) ENGINE=InnoDB AUTO_INCREMENT=9 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `schema_migrations`
+--
+-- The tables above already match migrations 001-003 (see migrate.py).
+
+DROP TABLE IF EXISTS `schema_migrations`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `schema_migrations` (
+  `version` int(11) NOT NULL,
+  `name` varchar(100) NOT NULL,
+  `applied_at` timestamp NOT NULL DEFAULT current_timestamp(),
+  PRIMARY KEY (`version`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+INSERT INTO `schema_migrations` (`version`, `name`) VALUES (1,'dedupe_users_servers'),(2,'unique_ids'),(3,'global_banned_boolean');
+
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -0,0 +1,19 @@
+-- Remove duplicate rows so User_ID and Guild_ID can become unique.
+-- Users: keep a banned row over an unbanned one, then the oldest.
+DELETE dup FROM Users dup
+JOIN Users keep
+  ON keep.User_ID = dup.User_ID
+ AND (
+      (LOWER(keep.Global_Banned) IN ('true', '1')) > (LOWER(dup.Global_Banned) IN ('true', '1'))
+   OR ((LOWER(keep.Global_Banned) IN ('true', '1')) = (LOWER(dup.Global_Banned) IN ('true', '1'))
+       AND keep.User_AI_ID < dup.User_AI_ID)
+ );
+
+-- servers: keep a configured row over an unconfigured one, then the oldest.
+DELETE dup FROM servers dup
+JOIN servers keep
+  ON keep.Guild_ID = dup.Guild_ID
+ AND (
+      keep.setup > dup.setup
+   OR (keep.setup = dup.setup AND keep.Server_AI_ID < dup.Server_AI_ID)
+ );
@@ -0,0 +1,3 @@
+-- Point lookups by Discord ID use these instead of scanning, and duplicates are rejected.
+ALTER TABLE Users ADD UNIQUE KEY IF NOT EXISTS Users_User_ID (User_ID);
+ALTER TABLE servers ADD UNIQUE KEY IF NOT EXISTS servers_Guild_ID (Guild_ID);
@@ -0,0 +1,7 @@
+-- Global_Banned varchar(5) 'True'/'False' -> BOOLEAN.
+UPDATE Users SET Global_Banned = IF(LOWER(TRIM(Global_Banned)) IN ('true', '1', 'yes'), '1', '0');
+ALTER TABLE Users MODIFY Global_Banned BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- MySQL/MariaDB have no partial indexes; leading with Global_Banned keeps the
+-- banned users together and covers "SELECT User_ID ... WHERE Global_Banned".
+CREATE INDEX IF NOT EXISTS Users_Global_Banned ON Users (Global_Banned, User_ID);
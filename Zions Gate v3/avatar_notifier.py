@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+import discord
+
+MAX_EMBEDS = 10
+
+
+class AvatarNotifier:
+    """Coalesces avatar changes per user and posts them as multi-embed batches.
+
+    A user's first change opens a `window`-second window; further changes
+    inside it only replace the pending avatar. When the window closes, the
+    latest avatar is announced, unless it is the one announced last time
+    (someone cycling back). Users due at the same time share messages of up
+    to 10 embeds, handed to `send` (the webhook dispatcher does the posting).
+    """
+
+    def __init__(self, send: Callable[[List[Dict[str, Any]]], None], window: float = 30.0,
+                 remember: int = 10_000):
+        self.send = send
+        self.window = window
+        self.remember = remember
+        # user_id -> [deadline, avatar_url, changes]; insertion order is deadline order.
+        self._pending: "OrderedDict[int, list]" = OrderedDict()
+        self._announced: "OrderedDict[int, Optional[str]]" = OrderedDict()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.events = 0
+        self.posted = 0
+        self.suppressed = 0
+
+    def changed(self, user_id: int, avatar_url: Optional[str]):
+        self.events += 1
+        entry = self._pending.get(user_id)
+        if entry is None:
+            self._pending[user_id] = [time.monotonic() + self.window, avatar_url, 1]
+        else:
+            entry[1] = avatar_url
+            entry[2] += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            deadline = next(iter(self._pending.values()))[0]
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._emit(time.monotonic())
+
+    def _emit(self, now: float):
+        due = []
+        while self._pending:
+            user_id, entry = next(iter(self._pending.items()))
+            if entry[0] > now:
+                break
+            del self._pending[user_id]
+            due.append((user_id, entry[1], entry[2]))
+        embeds = []
+        for user_id, avatar_url, changes in due:
+            if user_id in self._announced and self._announced[user_id] == avatar_url:
+                self.suppressed += 1
+                continue
+            self._announced[user_id] = avatar_url
+            self._announced.move_to_end(user_id)
+            if len(self._announced) > self.remember:
+                self._announced.popitem(last=False)
+            description = f"<@{user_id}> changed their profile picture."
+            if changes > 1:
+                description += f" ({changes} changes)"
+            embed = discord.Embed(description=description)
+            if avatar_url:
+                embed.set_image(url=avatar_url)
+            embeds.append(embed.to_dict())
+        for i in range(0, len(embeds), MAX_EMBEDS):
+            self.send(embeds[i:i + MAX_EMBEDS])
+            self.posted += 1
+
+    async def close(self):
+        """Announce everything still pending, then stop."""
+        self._emit(float("inf"))
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
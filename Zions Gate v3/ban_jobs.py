@@ -0,0 +1,319 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fanout import FAILED, FORBIDDEN, GuildResult
+
+PENDING = "pending"
+# Outcomes that retrying will not change; FAILED guilds are retried on request.
+FAILED_STATUSES = (FAILED, FORBIDDEN)
+
+# What retry_failed() did.
+RETRY_QUEUED = "queued"
+RETRY_RUNNING = "running"          # still queued or running, so its failures are not final
+RETRY_NO_FAILURES = "no_failures"
+RETRY_SUPERSEDED = "superseded"    # a newer job for the same user decides their state
+RETRY_UNKNOWN = "unknown"
+
+
+class BanJob:
+    """One /globalban or /globalunban and where each of its guilds stands."""
+
+    def __init__(self, job_id: str, kind: str, user_id: int, reason: str,
+                 guilds: Iterable[Tuple[int, str]], meta: Optional[Dict[str, Any]] = None,
+                 created_at: Optional[str] = None):
+        self.id = job_id
+        self.kind = kind
+        self.user_id = user_id
+        self.reason = reason
+        self.meta = meta or {}
+        self.created_at = created_at or datetime.now(UTC).isoformat()
+        self.finished_at: Optional[str] = None
+        # guild_id -> [guild name, status, error]
+        self.guilds: Dict[int, list] = {guild_id: [name, PENDING, None] for guild_id, name in guilds}
+        # True when this run picked the job up from the log after a restart.
+        self.resumed = False
+        self._finished: Optional[asyncio.Event] = None
+
+    @property
+    def finished(self) -> asyncio.Event:
+        if self._finished is None:
+            self._finished = asyncio.Event()
+            if self.finished_at is not None:
+                self._finished.set()
+        return self._finished
+
+    def pending(self) -> List[int]:
+        return [guild_id for guild_id, (_, status, _) in self.guilds.items() if status == PENDING]
+
+    def failed(self) -> List[Tuple[int, str, str]]:
+        return [(guild_id, name, error or status) for guild_id, (name, status, error) in self.guilds.items()
+                if status in FAILED_STATUSES]
+
+    def results(self) -> List[GuildResult]:
+        return [GuildResult(guild_id, name, status, error)
+                for guild_id, (name, status, error) in self.guilds.items() if status != PENDING]
+
+    def summary(self) -> Dict[str, Any]:
+        """Plain-data view for /banjobs, also sent between shard processes."""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "user_id": self.user_id,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "total": len(self.guilds),
+            "pending": [[guild_id, self.guilds[guild_id][0]] for guild_id in self.pending()],
+            "failed": [list(f) for f in self.failed()],
+        }
+
+
+Runner = Callable[[BanJob, List[int], Callable[[GuildResult], None]], Awaitable[None]]
+
+
+class BanJobQueue:
+    """Global ban/unban jobs, persisted to a JSON-lines log as they progress.
+
+    submit() writes the job (fsynced) before any guild is touched; each
+    guild's result is appended as soon as it is known. After a restart,
+    resume() re-queues every job that still has pending guilds. Running a
+    guild twice is harmless: Discord's ban is idempotent and unbans treat
+    "not banned" as done. At most `concurrency` jobs run at once, and jobs
+    for the same user run one after another in the order they were
+    submitted, so a /globalunban never races the /globalban before it.
+    Within a job, the runner's fan-out applies its own limits.
+    """
+
+    def __init__(self, path: Path, runner: Runner, concurrency: int = 2,
+                 on_complete: Optional[Callable[[BanJob], None]] = None,
+                 keep_finished: int = 50, compact_bytes: int = 1024 * 1024):
+        self.path = path
+        self.runner = runner
+        self.concurrency = concurrency
+        self.on_complete = on_complete
+        self.keep_finished = keep_finished
+        self.compact_bytes = compact_bytes
+        self.jobs: Dict[str, BanJob] = {}
+        self._queued = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # user_id -> jobs for that user waiting behind the one running now.
+        self._user_waiting: Dict[int, List[BanJob]] = {}
+        self.completed = 0
+        self._load()
+        self._compact()
+        self._log = open(self.path, "a", encoding="utf-8")
+
+    # Log
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-append.
+                    break
+                self._apply(record)
+
+    def _apply(self, record: Dict[str, Any]):
+        op = record["op"]
+        if op == "job":
+            job = BanJob(record["id"], record["kind"], record["user_id"], record["reason"],
+                         record["guilds"], record.get("meta"), record["created_at"])
+            self.jobs[job.id] = job
+            return
+        job = self.jobs.get(record["id"])
+        if job is None:
+            return
+        if op == "guild":
+            entry = job.guilds.get(record["guild_id"])
+            if entry is not None:
+                entry[1], entry[2] = record["status"], record.get("error")
+        elif op == "finish":
+            job.finished_at = record["finished_at"]
+        elif op == "retry":
+            job.finished_at = None
+            for guild_id in record["guild_ids"]:
+                entry = job.guilds.get(guild_id)
+                if entry is not None:
+                    entry[1], entry[2] = PENDING, None
+
+    @staticmethod
+    def _job_record(job: BanJob) -> Dict[str, Any]:
+        return {"op": "job", "id": job.id, "kind": job.kind, "user_id": job.user_id, "reason": job.reason,
+                "meta": job.meta, "created_at": job.created_at,
+                "guilds": [[guild_id, name] for guild_id, (name, _, _) in job.guilds.items()]}
+
+    def _write(self, record: Dict[str, Any]):
+        self._log.write(json.dumps(record) + "\n")
+        self._log.flush()
+
+    async def _sync(self):
+        await asyncio.to_thread(os.fsync, self._log.fileno())
+
+    def _compact(self):
+        """Rewrite the log with unfinished jobs and the most recent finished ones."""
+        finished = sorted((j for j in self.jobs.values() if j.finished_at), key=lambda j: j.finished_at)
+        for job in finished[:-self.keep_finished] if self.keep_finished else finished:
+            del self.jobs[job.id]
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for job in self.jobs.values():
+                f.write(json.dumps(self._job_record(job)) + "\n")
+                for guild_id, (_, status, error) in job.guilds.items():
+                    if status != PENDING:
+                        f.write(json.dumps({"op": "guild", "id": job.id, "guild_id": guild_id,
+                                            "status": status, "error": error}) + "\n")
+                if job.finished_at:
+                    f.write(json.dumps({"op": "finish", "id": job.id, "finished_at": job.finished_at}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    # Jobs
+    async def submit(self, kind: str, user_id: int, reason: str, guilds: Iterable[Tuple[int, str]],
+                     meta: Optional[Dict[str, Any]] = None, job_id: Optional[str] = None) -> BanJob:
+        """Record a job durably and queue it; await wait(job) for its results."""
+        job = BanJob(job_id or os.urandom(4).hex(), kind, user_id, reason, guilds, meta)
+        self.jobs[job.id] = job
+        self._write(self._job_record(job))
+        await self._sync()
+        self._enqueue(job)
+        return job
+
+    async def wait(self, job: BanJob) -> List[GuildResult]:
+        await job.finished.wait()
+        return job.results()
+
+    def resume(self) -> int:
+        """Queue every job the log says is unfinished; returns how many were queued."""
+        resumed = 0
+        for job in self.jobs.values():
+            if job.finished_at is None and job.id not in self._queued:
+                job.resumed = True
+                self._enqueue(job)
+                resumed += 1
+        if resumed:
+            print(f"[ban-jobs] Resuming {resumed} unfinished job(s).")
+        return resumed
+
+    async def retry_failed(self, job_id: str) -> str:
+        """Put a finished job's FAILED guilds back to pending and run it again; returns a RETRY_* outcome."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return RETRY_UNKNOWN
+        if job.id in self._queued:
+            return RETRY_RUNNING
+        if any(other.user_id == job.user_id and other.created_at > job.created_at for other in self.jobs.values()):
+            # Re-running an old ban after a newer unban (or the reverse) would undo it.
+            return RETRY_SUPERSEDED
+        guild_ids = [guild_id for guild_id, (_, status, _) in job.guilds.items() if status == FAILED]
+        if not guild_ids:
+            return RETRY_NO_FAILURES
+        self._apply({"op": "retry", "id": job.id, "guild_ids": guild_ids})
+        self._write({"op": "retry", "id": job.id, "guild_ids": guild_ids})
+        await self._sync()
+        if job._finished is not None:
+            job._finished.clear()
+        self._enqueue(job)
+        return RETRY_QUEUED
+
+    def _enqueue(self, job: BanJob):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        self._queued.add(job.id)
+        self._queue.put_nowait(job)
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            try:
+                waiting = self._user_waiting.get(job.user_id)
+                if waiting is not None:
+                    # Another worker is running a job for this user; it runs this one next.
+                    waiting.append(job)
+                    continue
+                waiting = self._user_waiting[job.user_id] = []
+                try:
+                    while True:
+                        try:
+                            await self._run_job(job)
+                        except Exception as e:
+                            print(f"[ban-jobs] Job {job.id} stopped: {e}")
+                        finally:
+                            self._queued.discard(job.id)
+                        if not waiting:
+                            break
+                        job = waiting.pop(0)
+                finally:
+                    del self._user_waiting[job.user_id]
+            finally:
+                queue.task_done()
+
+    async def _run_job(self, job: BanJob):
+        def record(result: GuildResult):
+            entry = job.guilds.get(result.guild_id)
+            if entry is None:
+                return
+            entry[1], entry[2] = result.status, result.error
+            self._write({"op": "guild", "id": job.id, "guild_id": result.guild_id,
+                         "status": result.status, "error": result.error})
+
+        started = time.perf_counter()
+        pending = job.pending()
+        try:
+            # Called even with no guilds left: the runner may have per-job work of its own.
+            await self.runner(job, pending, record)
+        except asyncio.CancelledError:
+            # Shutting down: what is still pending resumes on the next start.
+            raise
+        except Exception as e:
+            for guild_id in job.pending():
+                record(GuildResult(guild_id, job.guilds[guild_id][0], FAILED, f"job error: {e}"))
+        for guild_id in job.pending():
+            # The runner skipped it (e.g. the bot is no longer in that guild).
+            record(GuildResult(guild_id, job.guilds[guild_id][0], FAILED, "not attempted"))
+        job.finished_at = datetime.now(UTC).isoformat()
+        self._write({"op": "finish", "id": job.id, "finished_at": job.finished_at})
+        await self._sync()
+        self.completed += 1
+        job.finished.set()
+        print(f"[ban-jobs] Job {job.id} ({job.kind} {job.user_id}) finished {len(pending)} guild(s) "
+              f"in {time.perf_counter() - started:.1f}s, {len(job.failed())} failed.")
+        if self.on_complete:
+            try:
+                self.on_complete(job)
+            except Exception as e:
+                print(f"[ban-jobs] Completion handler for job {job.id} failed: {e}")
+        if self._log.tell() >= self.compact_bytes and not self._queued - {job.id}:
+            self._log.close()
+            self._compact()
+            self._log = open(self.path, "a", encoding="utf-8")
+
+    def stats(self) -> Dict[str, int]:
+        unfinished = [j for j in self.jobs.values() if j.finished_at is None]
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "unfinished": len(unfinished),
+            "pending_guilds": sum(len(j.pending()) for j in unfinished),
+            "completed": self.completed,
+        }
+
+    async def close(self):
+        """Stop the workers; unfinished jobs stay in the log and resume on the next start."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._queued.clear()
+        self._user_waiting.clear()
+        self._log.close()
@@ -0,0 +1,50 @@
+"""Global ban fan-out throughput against a fake guild set.
+
+    python benchmarks/bench_globalban.py [guild_count]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fanout
+from fakes import FakeGateway, make_guilds
+
+
+async def sequential(guilds, user):
+    # The loop /globalban used before the fan-out executor.
+    for guild in guilds:
+        try:
+            await guild.ban(user, reason="bench")
+        except Exception:
+            pass
+
+
+async def bench(guild_count: int):
+    user = SimpleNamespace(id=42)
+    gateway = FakeGateway()
+    guilds = make_guilds(guild_count, gateway)
+    started = time.perf_counter()
+    await sequential(guilds, user)
+    elapsed = time.perf_counter() - started
+    print(f"sequential          {guild_count} guilds  {elapsed:7.2f}s  {guild_count / elapsed:7.1f} guilds/s")
+
+    for concurrency in (4, 8, 16, 32):
+        gateway = FakeGateway()
+        guilds = make_guilds(guild_count, gateway)
+        runner = fanout.GuildFanout(concurrency=concurrency, rate=45)
+        started = time.perf_counter()
+        results = fanout.summarize(await runner.run(guilds, fanout.ban_action(user, "bench")))
+        elapsed = time.perf_counter() - started
+        counts = ", ".join(f"{status}={len(rs)}" for status, rs in sorted(results.items()))
+        print(
+            f"fanout c={concurrency:<3}        {guild_count} guilds  {elapsed:7.2f}s  "
+            f"{guild_count / elapsed:7.1f} guilds/s  429s={gateway.rate_limited}  [{counts}]"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
@@ -0,0 +1,288 @@
+"""Handler latency/throughput against synthetic users.csv/servers.csv.
+
+    python benchmarks/bench_handlers.py [--rows 10000 100000 1000000]
+        [--scenarios join setup on_ready combined_check globalban searchuser]
+        [--backend csv|sqlite] [--out bench_handlers.json] [--compare previous.json]
+
+Each (rows, scenario) pair runs in a fresh interpreter that imports main.py
+with DATA_DIR pointed at a copy of the synthetic data, so module state and
+peak RSS are per scenario. REST calls go to benchmarks/fakes.py and webhook
+posts are counted instead of sent.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BOT_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BOT_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+SCENARIOS = ["join", "setup", "on_ready", "combined_check", "globalban", "searchuser"]
+GUILDS = 50
+OWNER_ID = 999
+LOCAL_ROLE = 11
+GLOBAL_ROLE = 21
+FIRST_USER_ID = 100_000_000_000_000_000
+NEW_USER_ID = 900_000_000_000_000_000
+SYLLABLES = ["ka", "zu", "mi", "ro", "te", "shi", "na", "lo", "ve", "dra", "qu", "in", "ox", "el", "pa"]
+
+
+def user_id(i: int) -> int:
+    return FIRST_USER_ID + i * 7919
+
+
+def user_name(i: int) -> str:
+    word = SYLLABLES[i % 15] + SYLLABLES[i // 15 % 15] + SYLLABLES[i // 225 % 15]
+    return f"{word}{i % 10_000}#0"
+
+
+def generate(data_dir: Path, rows: int):
+    data_dir.mkdir(parents=True, exist_ok=True)
+    with open(data_dir / "users.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["User_AI_ID", "User_ID", "User_Name", "Account_Age", "Global_Banned"])
+        for i in range(rows):
+            writer.writerow([i + 1, user_id(i), user_name(i), "2021-06-01", "True" if i % 1000 == 0 else "False"])
+    with open(data_dir / "servers.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Server_AI_ID", "Guild_ID", "Server_Name", "Local_1", "Local_2", "Local_3",
+                         "Global_1", "Global_2", "Global_3", "OwnerID", "setup"])
+        for g in range(GUILDS):
+            # The last few guilds are registered but not set up yet, for the setup scenario.
+            setup = "True" if g < GUILDS - 10 else "False"
+            writer.writerow([g + 1, 1_000_000 + g, f"Guild {g}", LOCAL_ROLE, "", "", GLOBAL_ROLE, "", "", OWNER_ID, setup])
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+async def timed(latencies, coro):
+    started = time.perf_counter()
+    await coro
+    latencies.append(time.perf_counter() - started)
+
+
+# Scenarios: each returns (operation count, per-operation latencies, extra fields).
+
+async def scenario_join(main, fakes, rows):
+    guild = fakes.FakeGuild(1_000_000, fakes.FakeGateway(latency=0.01, jitter=0.0))
+    latencies = []
+    count = 5_000
+    for i in range(count):
+        # Every tenth joiner is an existing (and sometimes banned) user.
+        uid = user_id(i * 10 % rows) if i % 10 == 0 else NEW_USER_ID + i
+        await timed(latencies, main.on_member_join(fakes.FakeMember(uid, guild)))
+    drain = time.perf_counter()
+    await main.joins.close()
+    return count, latencies, {"drain_ms": (time.perf_counter() - drain) * 1000, "bans": len(guild.bans), **main.joins.stats()}
+
+
+async def scenario_setup(main, fakes, rows):
+    gateway = fakes.FakeGateway(latency=0.0, jitter=0.0)
+    latencies = []
+    owner = fakes.FakeMember(OWNER_ID)
+    for g in range(GUILDS - 10, GUILDS):
+        guild = fakes.FakeGuild(1_000_000 + g, gateway)
+        guild.members = [fakes.FakeMember(NEW_USER_ID + g * 10_000 + m, guild) for m in range(2_000)]
+        interaction = fakes.FakeInteraction(guild, owner, "setup")
+        await timed(latencies, main.setup.callback(interaction, fakes.FakeRole(LOCAL_ROLE), fakes.FakeRole(GLOBAL_ROLE)))
+    return len(latencies), latencies, {"members_per_guild": 2_000}
+
+
+async def scenario_on_ready(main, fakes, rows):
+    gateway = fakes.FakeGateway(latency=0.0, jitter=0.0)
+    guilds = fakes.make_guilds(GUILDS, gateway)
+    per_guild = max(100, min(rows, 200_000) // GUILDS)
+    for g, guild in enumerate(guilds):
+        # Mostly known users plus some who joined while the bot was offline.
+        guild.members = [fakes.FakeMember(user_id((g * per_guild + m) % rows), guild) for m in range(per_guild)]
+        guild.members += [fakes.FakeMember(NEW_USER_ID + g * 1_000 + m, guild) for m in range(per_guild // 20)]
+    main.bot._connection._guilds = {guild.id: guild for guild in guilds}
+
+    async def no_sync(*args, **kwargs):
+        return []
+    main.bot.tree.sync = no_sync
+    latencies = []
+    await timed(latencies, main.on_ready())
+    await timed(latencies, main.on_ready())
+    members = sum(len(guild.members) for guild in guilds)
+    return members, latencies, {"cold_ms": latencies[0] * 1000, "warm_ms": latencies[1] * 1000, "members": members}
+
+
+async def scenario_combined_check(main, fakes, rows):
+    guild = fakes.FakeGuild(1_000_000, fakes.FakeGateway())
+    user = fakes.FakeMember(OWNER_ID, guild, roles=[fakes.FakeRole(5), fakes.FakeRole(GLOBAL_ROLE)])
+    latencies = []
+    count = 20_000
+    for i in range(count):
+        command = ("globalban", "localkick", "searchuser", "reportuser")[i % 4]
+        await timed(latencies, main.combined_check(fakes.FakeInteraction(guild, user, command)))
+    return count, latencies, {}
+
+
+async def scenario_globalban(main, fakes, rows):
+    gateway = fakes.FakeGateway(latency=0.02, jitter=0.005)
+    guilds = fakes.make_guilds(GUILDS, gateway)
+    main.bot._connection._guilds = {guild.id: guild for guild in guilds}
+    posted = []
+    main.webhooks.enqueue = lambda url, content=None, embeds=None, files=None: posted.append(content) or True
+    moderator = fakes.FakeMember(OWNER_ID, guilds[0], roles=[fakes.FakeRole(GLOBAL_ROLE)])
+    latencies = []
+    for i in range(5):
+        target = fakes.FakeMember(user_id(i * 7 % rows + 1))
+        interaction = fakes.FakeInteraction(guilds[0], moderator, "globalban")
+        await timed(latencies, main.globalban.callback(interaction, target, "bench"))
+    return len(latencies), latencies, {"guilds": GUILDS, "rest_calls": gateway.calls,
+                                       "rate_limited": gateway.rate_limited, "webhooks": len(posted)}
+
+
+async def scenario_searchuser(main, fakes, rows):
+    guild = fakes.FakeGuild(1_000_000, fakes.FakeGateway())
+    user = fakes.FakeMember(OWNER_ID, guild, roles=[fakes.FakeRole(GLOBAL_ROLE)])
+    queries = []
+    for i in range(0, rows, max(1, rows // 500)):
+        name = user_name(i).split("#")[0]
+        queries += [name, name[:4], name[:-2] + name[-1] + name[-2], str(user_id(i))]
+    latencies = []
+    for query in queries:
+        interaction = fakes.FakeInteraction(guild, user, "searchuser")
+        await timed(latencies, main.searchuser.callback(interaction, query))
+    return len(queries), latencies, {"index_names": len(main.user_search)}
+
+
+def worker(rows: int, scenario: str, backend: str, data_dir: Path, result_path: Path):
+    os.environ["DATA_DIR"] = str(data_dir)
+    os.environ["STORAGE_BACKEND"] = backend
+    os.environ["CSV_PUSH_REMOTE"] = ""
+    os.environ["CSV_PUSH_TOKEN"] = ""
+    if backend == "sqlite":
+        import sqlite_backend
+        sqlite_backend.import_csvs(data_dir / "zions_gate.db", data_dir / "servers.csv", data_dir / "users.csv")
+    started = time.perf_counter()
+    import main
+    import fakes
+    main.users_loaded.wait()
+    for thread in threading.enumerate():
+        if thread.name == "search-index":
+            thread.join()
+    load_seconds = time.perf_counter() - started
+    rss_after_load = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    async def run():
+        return await globals()[f"scenario_{scenario}"](main, fakes, rows)
+    started = time.perf_counter()
+    ops, latencies, extra = asyncio.run(run())
+    seconds = time.perf_counter() - started
+    main.user_writes.close()
+    main.repo.close()
+    if main.database is not None:
+        main.database.close()
+    else:
+        main.servers_table.close()
+        main.users_table.close()
+    result = {
+        "rows": rows,
+        "scenario": scenario,
+        "backend": backend,
+        "ops": ops,
+        "seconds": seconds,
+        "ops_per_s": ops / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "load_s": load_seconds,
+        "rss_after_load_mb": rss_after_load / 1024,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        **extra,
+    }
+    result_path.write_text(json.dumps(result))
+
+
+def compare(results, previous_path: Path):
+    previous = {(r["rows"], r["scenario"], r.get("backend", "csv")): r
+                for r in json.loads(previous_path.read_text())["results"]}
+    print(f"\nChange vs {previous_path}:")
+    for r in results:
+        old = previous.get((r["rows"], r["scenario"], r["backend"]))
+        if not old:
+            continue
+        changes = []
+        for key in ("ops_per_s", "p50_ms", "p99_ms", "peak_rss_mb"):
+            if old.get(key):
+                changes.append(f"{key} {(r[key] - old[key]) / old[key] * 100:+.1f}%")
+        print(f"  {r['rows']:>8} {r['scenario']:<15} " + "  ".join(changes))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--out", type=Path, default=Path("bench_handlers.json"))
+    parser.add_argument("--compare", type=Path)
+    parser.add_argument("--worker", nargs=5, metavar=("ROWS", "SCENARIO", "BACKEND", "DATA_DIR", "RESULT"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        rows, scenario, backend, data_dir, result = args.worker
+        return worker(int(rows), scenario, backend, Path(data_dir), Path(result))
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="zg-bench-") as tmp:
+        tmp = Path(tmp)
+        for rows in args.rows:
+            base = tmp / f"base-{rows}"
+            started = time.perf_counter()
+            generate(base, rows)
+            print(f"Generated {rows} users in {time.perf_counter() - started:.1f}s")
+            for scenario in args.scenarios:
+                data_dir = tmp / f"run-{rows}-{scenario}"
+                shutil.copytree(base, data_dir)
+                result_path = data_dir / "result.json"
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--worker", str(rows), scenario, args.backend, str(data_dir), str(result_path)],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                )
+                if proc.returncode != 0 or not result_path.exists():
+                    print(f"{rows:>8} {scenario:<15} FAILED\n{proc.stderr}")
+                    continue
+                r = json.loads(result_path.read_text())
+                results.append(r)
+                print(
+                    f"{rows:>8} {scenario:<15} {r['ops']:>8} ops  {r['ops_per_s']:>10.1f}/s  "
+                    f"p50 {r['p50_ms']:8.3f}ms  p99 {r['p99_ms']:8.3f}ms  peak RSS {r['peak_rss_mb']:7.1f}MB"
+                )
+                shutil.rmtree(data_dir)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BOT_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main_cli()
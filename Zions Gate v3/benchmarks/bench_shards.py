@@ -0,0 +1,191 @@
+"""Cross-process /globalban and /globalunban over shard IPC, on one machine.
+
+    python benchmarks/bench_shards.py [--processes 1 2 4] [--guilds 60] [--out bench_shards.json]
+
+For each process count, starts that many interpreters with the environment
+shard_launcher.py would give them, sharing one SQLite database. Each process
+imports main.py and owns every P-th fake guild. Process 0 runs /globalban
+and /globalunban; the run checks that the merged result covers every guild,
+that every process's ban cache followed and that a user stored by process 0
+becomes searchable in every process, and reports command latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BOT_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BOT_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from bench_handlers import GLOBAL_ROLE, OWNER_ID, generate, percentile, user_id  # noqa: E402
+
+ROUNDS = 5
+BASE_PORT = 7400
+
+
+async def wait_for_peers(main, deadline: float = 30.0):
+    started = time.monotonic()
+    while True:
+        replies = await main.shard_ipc.broadcast("bench_is_banned", {"user_id": 0}, timeout=2)
+        if all(error is None for _, _, error in replies):
+            return
+        if time.monotonic() - started > deadline:
+            raise RuntimeError(f"peers not reachable: {replies}")
+        await asyncio.sleep(0.2)
+
+
+async def peer_bans(main, target: int):
+    replies = await main.shard_ipc.broadcast("bench_is_banned", {"user_id": target})
+    return [main.is_globally_banned(target)] + [result for _, result, _ in replies]
+
+
+async def peers_find(main, name: str, deadline: float = 10.0) -> bool:
+    started = time.monotonic()
+    while time.monotonic() - started < deadline:
+        replies = await main.shard_ipc.broadcast("bench_search", {"query": name})
+        if all(result for _, result, _ in replies):
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+async def run_worker(main, fakes, fanout, index: int, processes: int, guilds: int, result_path: Path):
+    gateway = fakes.FakeGateway(latency=0.02, jitter=0.005)
+    owned = [g for i, g in enumerate(fakes.make_guilds(guilds, gateway)) if i % processes == index]
+    main.bot._connection._guilds = {guild.id: guild for guild in owned}
+    main.webhooks.enqueue = lambda url, content=None, embeds=None, files=None: True
+
+    async def is_banned(payload):
+        return main.is_globally_banned(int(payload["user_id"]))
+
+    async def search(payload):
+        user_ids, _ = main.user_search.search(payload["query"], limit=1)
+        return bool(user_ids)
+
+    main.shard_ipc.register("bench_is_banned", is_banned)
+    main.shard_ipc.register("bench_search", search)
+    await main.shard_ipc.start()
+    if index != 0:
+        # Serve until the parent closes stdin.
+        await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+        await main.shard_ipc.close()
+        return
+
+    await wait_for_peers(main)
+    moderator = fakes.FakeMember(OWNER_ID, owned[0], roles=[fakes.FakeRole(GLOBAL_ROLE)])
+    ban_latencies, unban_latencies = [], []
+    checks = {"merged_guilds": True, "caches_banned": True, "caches_unbanned": True}
+    newcomer = fakes.FakeMember(user_id(10_000_000))
+    await main.add_user_to_db(newcomer)
+    checks["search_shared"] = await peers_find(main, newcomer.name)
+    for i in range(ROUNDS):
+        target = fakes.FakeMember(user_id(i * 7 + 1))
+        interaction = fakes.FakeInteraction(owned[0], moderator, "globalban")
+        started = time.perf_counter()
+        await main.globalban.callback(interaction, target, "bench")
+        ban_latencies.append(time.perf_counter() - started)
+        checks["caches_banned"] &= all(await peer_bans(main, target.id))
+        # A second pass must reach every guild of every process and leave the bans in place.
+        again = await main.global_fanout("ban", target, "bench")
+        checks["merged_guilds"] &= len(again) == guilds and all(r.status == fanout.BANNED for r in again)
+
+        interaction = fakes.FakeInteraction(owned[0], moderator, "globalunban")
+        started = time.perf_counter()
+        await main.globalunban.callback(interaction, target)
+        unban_latencies.append(time.perf_counter() - started)
+        checks["caches_unbanned"] &= not any(await peer_bans(main, target.id))
+    result = {
+        "processes": processes,
+        "guilds": guilds,
+        "ban_p50_ms": percentile(ban_latencies, 50) * 1000,
+        "ban_max_ms": max(ban_latencies) * 1000,
+        "unban_p50_ms": percentile(unban_latencies, 50) * 1000,
+        "ipc": main.shard_ipc.stats(),
+        **checks,
+    }
+    result_path.write_text(json.dumps(result))
+    await main.shard_ipc.close()
+
+
+def worker(index: int, processes: int, guilds: int, result_path: Path):
+    import fakes
+    import fanout
+    import main
+
+    asyncio.run(run_worker(main, fakes, fanout, index, processes, guilds, result_path))
+    main.user_writes.close()
+    main.repo.close()
+    main.database.close()
+
+
+def run(processes: int, guilds: int, data_dir: Path, base_port: int) -> dict:
+    from shard_launcher import plan
+
+    result_path = data_dir / f"shards-{processes}.json"
+    base_env = {**os.environ, "DATA_DIR": str(data_dir), "CSV_PUSH_REMOTE": "", "CSV_PUSH_TOKEN": "",
+                "TRACING_ENABLED": "false"}
+    children = []
+    for i, overrides in enumerate(plan(processes, processes, base_port, environ=base_env)):
+        children.append(subprocess.Popen(
+            [sys.executable, __file__, "--worker", str(i), str(processes), str(guilds), str(result_path)],
+            env={**base_env, **overrides}, stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        ))
+    first = children[0]
+    _, errors = first.communicate(timeout=600)
+    for child in children[1:]:
+        child.communicate(timeout=60)
+    if first.returncode != 0 or not result_path.exists():
+        raise RuntimeError(f"process 0 failed:\n{errors}")
+    return json.loads(result_path.read_text())
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--guilds", type=int, default=60)
+    parser.add_argument("--base-port", type=int, default=BASE_PORT)
+    parser.add_argument("--out", type=Path, default=Path("bench_shards.json"))
+    parser.add_argument("--worker", nargs=4, metavar=("INDEX", "PROCESSES", "GUILDS", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        index, processes, guilds, result = args.worker
+        return worker(int(index), int(processes), int(guilds), Path(result))
+
+    import sqlite_backend
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="zg-shards-") as tmp:
+        data_dir = Path(tmp)
+        generate(data_dir, 10_000)
+        sqlite_backend.import_csvs(data_dir / "zions_gate.db", data_dir / "servers.csv", data_dir / "users.csv")
+        for processes in args.processes:
+            r = run(processes, args.guilds, data_dir, args.base_port)
+            results.append(r)
+            ok = r["merged_guilds"] and r["caches_banned"] and r["caches_unbanned"] and r["search_shared"]
+            print(
+                f"{processes:>2} process(es)  {r['guilds']} guilds  globalban p50 {r['ban_p50_ms']:8.1f}ms "
+                f"max {r['ban_max_ms']:8.1f}ms  globalunban p50 {r['unban_p50_ms']:8.1f}ms  "
+                f"ipc sent {r['ipc']['sent']} failed {r['ipc']['failed']}  {'OK' if ok else 'MISMATCH'}"
+            )
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main_cli()
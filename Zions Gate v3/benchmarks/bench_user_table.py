@@ -0,0 +1,146 @@
+"""Memory and lookup cost of users.csv held as dicts (CSVTable), columns (UserTable) or mmap index (UserIdIndex).
+
+    python benchmarks/bench_user_table.py [--rows 100000 1000000] [--out bench_user_table.json]
+
+Each (rows, table) pair loads the same synthetic users.csv in a fresh
+interpreter and reports the resident memory the table added, load time,
+and the latency of get() and of reading one column through the returned row.
+For "index", load is opening users.csv.idx (built beforehand) and get is
+is_banned(); the full-table scan does not apply.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BOT_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(BOT_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from bench_handlers import generate, percentile, user_id  # noqa: E402
+
+TABLES = ["dict", "columnar", "index"]
+LOOKUPS = 100_000
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # Not Linux: peak RSS is the closest available figure.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def worker(rows: int, table: str, users_csv: Path, result_path: Path):
+    from csv_store import CSVTable
+    from id_index import UserIdIndex, build_index
+    from user_table import COLUMNS, UserTable
+
+    index_path = users_csv.with_name(users_csv.name + ".idx")
+    if table == "index":
+        build_index(users_csv, index_path)
+    gc.collect()
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    if table == "index":
+        users = UserIdIndex.open(index_path, users_csv)
+    else:
+        users = (UserTable if table == "columnar" else CSVTable)(users_csv, COLUMNS, "User_ID", "User_AI_ID")
+    load_seconds = time.perf_counter() - started
+    gc.collect()
+    rss_loaded = current_rss_mb()
+
+    rng = random.Random(7)
+    keys = [str(user_id(rng.randrange(rows))) for _ in range(LOOKUPS)]
+    get_latencies = []
+    read_latencies = []
+    for key in keys:
+        started = time.perf_counter()
+        if table == "index":
+            users.is_banned(key)
+            get_latencies.append(time.perf_counter() - started)
+            read_latencies.append(0.0)
+            continue
+        row = users.get(key)
+        got = time.perf_counter()
+        row["Global_Banned"]
+        get_latencies.append(got - started)
+        read_latencies.append(time.perf_counter() - got)
+
+    started = time.perf_counter()
+    banned = 0 if table == "index" else sum(1 for r in users.rows() if r["Global_Banned"] == "True")
+    scan_seconds = time.perf_counter() - started
+
+    result = {
+        "rows": rows,
+        "table": table,
+        "load_s": load_seconds,
+        "table_mb": rss_loaded - rss_before,
+        "bytes_per_row": (rss_loaded - rss_before) * 2 ** 20 / rows,
+        "get_p50_us": percentile(get_latencies, 50) * 1e6,
+        "get_p99_us": percentile(get_latencies, 99) * 1e6,
+        "read_p50_us": percentile(read_latencies, 50) * 1e6,
+        "scan_s": scan_seconds,
+        "banned": banned,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    result_path.write_text(json.dumps(result))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--tables", nargs="+", choices=TABLES, default=TABLES)
+    parser.add_argument("--out", type=Path, default=Path("bench_user_table.json"))
+    parser.add_argument("--worker", nargs=4, metavar=("ROWS", "TABLE", "USERS_CSV", "RESULT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        rows, table, users_csv, result = args.worker
+        return worker(int(rows), table, Path(users_csv), Path(result))
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="zg-bench-") as tmp:
+        tmp = Path(tmp)
+        for rows in args.rows:
+            data_dir = tmp / f"rows-{rows}"
+            generate(data_dir, rows)
+            for table in args.tables:
+                result_path = data_dir / f"{table}.json"
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--worker", str(rows), table, str(data_dir / "users.csv"), str(result_path)],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                )
+                if proc.returncode != 0 or not result_path.exists():
+                    print(f"{rows:>8} {table:<9} FAILED\n{proc.stderr}")
+                    continue
+                r = json.loads(result_path.read_text())
+                results.append(r)
+                print(
+                    f"{rows:>8} {table:<9} {r['table_mb']:8.1f}MB ({r['bytes_per_row']:6.1f} B/row)  "
+                    f"load {r['load_s']:6.2f}s  get p50 {r['get_p50_us']:6.2f}us p99 {r['get_p99_us']:6.2f}us  "
+                    f"read p50 {r['read_p50_us']:5.2f}us  scan {r['scan_s']:5.2f}s"
+                )
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    args.out.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,124 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, UTC
+from types import SimpleNamespace
+
+import discord
+
+
+def http_error(cls, status: int, message: str = ""):
+    response = SimpleNamespace(status=status, reason=message or str(status))
+    return cls(response, message)
+
+
+class FakeGateway:
+    """Stands in for Discord's REST API: per-call latency plus a global requests-per-second cap."""
+
+    def __init__(self, latency: float = 0.08, jitter: float = 0.02, global_rate: int = 50):
+        self.latency = latency
+        self.jitter = jitter
+        self.global_rate = global_rate
+        self.calls = 0
+        self.rate_limited = 0
+        self._window_start = time.monotonic()
+        self._window_calls = 0
+
+    async def call(self):
+        now = time.monotonic()
+        if now - self._window_start >= 1.0:
+            self._window_start = now
+            self._window_calls = 0
+        self._window_calls += 1
+        self.calls += 1
+        if self._window_calls > self.global_rate:
+            self.rate_limited += 1
+            error = http_error(discord.HTTPException, 429, "You are being rate limited.")
+            error.retry_after = max(0.0, 1.0 - (now - self._window_start))
+            raise error
+        await asyncio.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+
+
+class FakeMember:
+    def __init__(self, user_id: int, guild=None, roles=(), bot: bool = False):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.discriminator = "0"
+        self.bot = bot
+        self.guild = guild
+        self.roles = list(roles)
+        self.created_at = datetime(2020, 1, 1, tzinfo=UTC) + timedelta(seconds=user_id % 100_000_000)
+        self.joined_at = datetime(2024, 1, 1, tzinfo=UTC)
+
+    def __str__(self):
+        return f"{self.name}#{self.discriminator}"
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, gateway: FakeGateway, name: str = None):
+        self.id = guild_id
+        self.name = name or f"Guild {guild_id}"
+        self.gateway = gateway
+        self.owner_id = 0
+        self.bans = set()
+        self.members = []
+
+    def get_member(self, user_id):
+        return next((m for m in self.members if m.id == user_id), None)
+
+    async def ban(self, user, reason=None):
+        await self.gateway.call()
+        self.bans.add(user.id)
+
+    async def unban(self, user, reason=None):
+        await self.gateway.call()
+        if user.id not in self.bans:
+            raise http_error(discord.NotFound, 404, "Unknown Ban")
+        self.bans.discard(user.id)
+
+
+def make_guilds(count: int, gateway: FakeGateway):
+    return [FakeGuild(1_000_000 + i, gateway) for i in range(count)]
+
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+        self.messages = []
+
+    def is_done(self):
+        return self.done
+
+    async def defer(self, ephemeral=False):
+        self.done = True
+
+    async def send_message(self, content=None, ephemeral=False, **kwargs):
+        self.done = True
+        self.messages.append(content)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, ephemeral=False, **kwargs):
+        self.messages.append(content)
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the bot's checks and command callbacks."""
+
+    def __init__(self, guild, user, command_name: str):
+        self.id = random.getrandbits(63)
+        self.guild = guild
+        self.user = user
+        self.command = SimpleNamespace(name=command_name, qualified_name=command_name)
+        self.extras = {}
+        self.channel = SimpleNamespace(id=1, name="bench", mention="#bench")
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
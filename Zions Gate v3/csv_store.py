@@ -0,0 +1,309 @@
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from metrics import metrics
+
+
+def iter_csv(path: Path) -> Iterator[Dict[str, Any]]:
+    if not path.exists():
+        return
+    with open(path, newline='', encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+def load_csv(path: Path) -> List[Dict[str, Any]]:
+    return list(iter_csv(path))
+
+def save_csv(path: Path, rows: Iterable[Dict[str, Any]], fieldnames: List[str]):
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def save_csv_atomic(path: Path, rows: Iterable[Dict[str, Any]], fieldnames: List[str]):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", newline='', encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def next_id(rows: List[Dict[str, Any]], id_field: str) -> int:
+    ids = [int(r[id_field]) for r in rows if r.get(id_field, "").isdigit()]
+    return max(ids) + 1 if ids else 1
+
+
+class CSVTable:
+    """Resident copy of one CSV file, indexed by its key column and written through to disk.
+
+    on_change is called after every mutation has been written; on_insert
+    additionally receives the list of newly inserted rows.
+
+    With a journal_path, mutations are appended to a JSON-lines log instead of
+    rewriting the CSV. The log is fsynced every fsync_every records or
+    fsync_interval seconds (whichever comes first; a timer covers writes that
+    stop arriving) and folded back into the CSV by a background compaction
+    once it grows past compact_bytes.
+    """
+
+    def __init__(self, path: Path, columns: List[str], key_field: str, id_field: str,
+                 on_change: Optional[Callable[[], None]] = None,
+                 on_insert: Optional[Callable[[List[Dict[str, str]]], None]] = None,
+                 journal_path: Optional[Path] = None, fsync_every: int = 32,
+                 fsync_interval: float = 1.0, compact_bytes: int = 1024 * 1024):
+        self.path = path
+        self.columns = columns
+        self.key_field = key_field
+        self.id_field = id_field
+        self.on_change = on_change
+        self.on_insert = on_insert
+        self.journal_path = journal_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self._lock = threading.RLock()
+        self._rows: List[Dict[str, str]] = []
+        self._index: Dict[str, Dict[str, str]] = {}
+        self._next_id = 1
+        self._journal = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer: Optional[threading.Timer] = None
+        self._compactor: Optional[threading.Thread] = None
+        # Held for a whole compaction (rotate, rewrite, unlink) so two never overlap.
+        self._compact_lock = threading.Lock()
+        self.load()
+
+    @property
+    def _old_journal_path(self) -> Path:
+        return self.journal_path.with_name(self.journal_path.name + ".old")
+
+    # Row storage. Subclasses (UserTable) can keep the same rows in another form.
+    def _read_csv(self) -> Iterable[Any]:
+        return iter_csv(self.path)
+
+    def _reset(self, rows: Iterable[Dict[str, str]]):
+        self._rows = list(rows)
+        self._index = {}
+        for row in self._rows:
+            # First row wins, same as the old linear scan.
+            self._index.setdefault(row[self.key_field], row)
+
+    def _append(self, row: Dict[str, str]):
+        self._rows.append(row)
+        self._index.setdefault(row[self.key_field], row)
+
+    def _assign(self, key: str, values: Dict[str, Any]) -> bool:
+        row = self._index.get(key)
+        if row is None:
+            return False
+        row.update(values)
+        return True
+
+    def _known_ids(self) -> Set[str]:
+        return {r[self.id_field] for r in self._rows}
+
+    def _max_id(self) -> int:
+        return next_id(self._rows, self.id_field) - 1
+
+    def _iter_rows(self) -> Iterable[Dict[str, str]]:
+        """Live rows for writing out; only valid while the lock is held."""
+        return self._rows
+
+    def _snapshot(self) -> Iterable[Dict[str, str]]:
+        """Rows that stay valid after the lock is released."""
+        # Rows are mutated in place by update(), so copy them.
+        return [dict(r) for r in self._rows]
+
+    def _rewritten(self):
+        """Called after the CSV file itself has been rewritten (replay, compaction or save)."""
+
+    def load(self):
+        with self._lock:
+            self._reset(self._read_csv())
+            if self.journal_path:
+                replayed = self._replay(self._old_journal_path) + self._replay(self.journal_path)
+            else:
+                replayed = 0
+            self._next_id = self._max_id() + 1
+            if self.journal_path:
+                if replayed or self._old_journal_path.exists():
+                    print(f"[{self.path.name}] Replayed {replayed} journal record(s).")
+                    self._close_journal()
+                    save_csv_atomic(self.path, self._iter_rows(), self.columns)
+                    self._old_journal_path.unlink(missing_ok=True)
+                    self.journal_path.unlink(missing_ok=True)
+                    self._rewritten()
+                self._open_journal()
+
+    def _replay(self, journal_path: Path) -> int:
+        if not journal_path.exists():
+            return 0
+        seen_ids = self._known_ids()
+        count = 0
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn final line from a crash mid-append.
+                    break
+                if record["op"] == "insert":
+                    row = record["row"]
+                    if row[self.id_field] in seen_ids:
+                        continue
+                    seen_ids.add(row[self.id_field])
+                    self._append(row)
+                elif record["op"] == "update":
+                    self._assign(record["key"], record["values"])
+                count += 1
+        return count
+
+    def get(self, key) -> Optional[Dict[str, str]]:
+        return self._index.get(str(key))
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self._index
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def rows(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return list(self._rows)
+
+    def insert(self, values: Dict[str, Any]) -> Dict[str, str]:
+        with self._lock:
+            row = dict.fromkeys(self.columns, "")
+            row.update(values)
+            row[self.id_field] = str(self._next_id)
+            self._next_id += 1
+            self._append(row)
+            self._write({"op": "insert", "row": row})
+            if self.on_insert:
+                self.on_insert([row])
+            return row
+
+    def insert_many(self, values_list: Iterable[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Insert every row whose key is not already present, in a single write."""
+        with self._lock:
+            inserted = []
+            for values in values_list:
+                if values[self.key_field] in self:
+                    continue
+                row = dict.fromkeys(self.columns, "")
+                row.update(values)
+                row[self.id_field] = str(self._next_id)
+                self._next_id += 1
+                self._append(row)
+                inserted.append(row)
+            if inserted:
+                self._write_many([{"op": "insert", "row": row} for row in inserted])
+                if self.on_insert:
+                    self.on_insert(inserted)
+            return inserted
+
+    def update(self, key, values: Dict[str, Any]) -> bool:
+        with self._lock:
+            if not self._assign(str(key), values):
+                return False
+            self._write({"op": "update", "key": str(key), "values": values})
+            return True
+
+    def _write(self, record: Dict[str, Any]):
+        self._write_many([record])
+
+    def _write_many(self, records: List[Dict[str, Any]]):
+        if self._journal is None:
+            self.save()
+        else:
+            with metrics.timer("csv_write_seconds", table=self.path.stem, op="journal"):
+                self._journal.write("".join(json.dumps(r) + "\n" for r in records))
+                self._journal.flush()
+                self._unsynced += len(records)
+                due = self._last_sync + self.fsync_interval - time.monotonic()
+                if self._unsynced >= self.fsync_every or due <= 0:
+                    self.sync()
+                elif self._sync_timer is None:
+                    self._sync_timer = threading.Timer(due, self.sync)
+                    self._sync_timer.daemon = True
+                    self._sync_timer.start()
+            if self._journal.tell() >= self.compact_bytes:
+                self.compact_in_background()
+        if self.on_change:
+            self.on_change()
+
+    def sync(self):
+        with self._lock:
+            if self._sync_timer is not None:
+                if self._sync_timer is not threading.current_thread():
+                    self._sync_timer.cancel()
+                self._sync_timer = None
+            if self._journal is not None and self._unsynced:
+                os.fsync(self._journal.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def _open_journal(self):
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self.sync()
+            self._journal.close()
+            self._journal = None
+
+    def compact_in_background(self) -> threading.Thread:
+        """Start a compaction unless one is already running; returns the compacting thread."""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return self._compactor
+            self._compactor = threading.Thread(target=self.compact, name=f"compact-{self.path.name}", daemon=True)
+            self._compactor.start()
+            return self._compactor
+
+    def compact(self):
+        """Fold the journal into the CSV. Writers keep appending to a fresh journal meanwhile."""
+        with self._compact_lock:
+            with self._lock:
+                if self._journal is None:
+                    return
+                self._close_journal()
+                if self._old_journal_path.exists():
+                    # An earlier compaction failed after rotating. Append this journal to
+                    # the old one so it still covers everything since the CSV was written.
+                    with open(self._old_journal_path, "a", encoding="utf-8") as old, \
+                            open(self.journal_path, encoding="utf-8") as new:
+                        shutil.copyfileobj(new, old)
+                        old.flush()
+                        os.fsync(old.fileno())
+                    self.journal_path.unlink()
+                else:
+                    os.replace(self.journal_path, self._old_journal_path)
+                self._open_journal()
+                snapshot = self._snapshot()
+            try:
+                with metrics.timer("csv_write_seconds", table=self.path.stem, op="compact"):
+                    save_csv_atomic(self.path, snapshot, self.columns)
+                self._old_journal_path.unlink()
+                self._rewritten()
+            except Exception as e:
+                print(f"[{self.path.name}] Journal compaction failed: {e}")
+
+    def save(self):
+        with self._lock, metrics.timer("csv_write_seconds", table=self.path.stem, op="save"):
+            save_csv(self.path, self._iter_rows(), self.columns)
+            self._rewritten()
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            self._close_journal()
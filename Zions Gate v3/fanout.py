@@ -0,0 +1,134 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import discord
+
+from metrics import metrics
+from tracing import tracer
+
+Throttle = Callable[[], Awaitable[None]]
+Action = Callable[[object, Throttle], Awaitable[str]]
+
+BANNED = "banned"
+ALREADY_BANNED = "already banned"
+UNBANNED = "unbanned"
+NOT_BANNED = "not banned"
+FORBIDDEN = "forbidden"
+FAILED = "failed"
+
+
+class GuildResult(NamedTuple):
+    guild_id: int
+    guild_name: str
+    status: str
+    error: Optional[str] = None
+
+
+class RateLimiter:
+    """Token bucket shared by every request the fan-out makes (Discord's global limit is 50/s)."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        # A small burst keeps any one-second window under the cap.
+        self.burst = burst if burst is not None else max(1.0, rate / 10)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class GuildFanout:
+    """Runs one REST action per guild concurrently, within a concurrency cap and a global rate limit.
+
+    Ban/unban routes are bucketed per guild, and each guild gets exactly one
+    in-flight request, so per-route buckets are never contended. 429s that
+    reach us and 5xx responses are retried with backoff.
+    """
+
+    def __init__(self, concurrency: int = 8, rate: float = 40.0, max_retries: int = 3):
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+        self.max_retries = max_retries
+
+    async def run(self, guilds: Iterable, action: Action,
+                  on_result: Optional[Callable[[GuildResult], None]] = None) -> List[GuildResult]:
+        """action(guild, throttle) must await throttle() before each REST call it makes.
+
+        on_result, if given, is called with each guild's result as soon as it is known.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(guild) -> GuildResult:
+            async with semaphore:
+                started = time.perf_counter()
+                with tracer.span("guild_fanout", {"guild_id": guild.id}):
+                    result = await self._attempt(guild, action)
+                metrics.observe("rest_call_seconds", time.perf_counter() - started,
+                                call="guild_fanout", status=result.status)
+                if on_result is not None:
+                    on_result(result)
+                return result
+
+        return list(await asyncio.gather(*(one(g) for g in guilds)))
+
+    async def _attempt(self, guild, action) -> GuildResult:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return GuildResult(guild.id, guild.name, await action(guild, self.limiter.acquire))
+            except discord.Forbidden as e:
+                return GuildResult(guild.id, guild.name, FORBIDDEN, str(e))
+            except discord.HTTPException as e:
+                retryable = e.status == 429 or e.status >= 500
+                if not retryable or attempt == self.max_retries:
+                    return GuildResult(guild.id, guild.name, FAILED, str(e))
+                retry_after = getattr(e, "retry_after", None) or (2 ** attempt) * 0.5
+                await asyncio.sleep(retry_after + random.uniform(0, 0.25))
+            except Exception as e:
+                return GuildResult(guild.id, guild.name, FAILED, str(e))
+        return GuildResult(guild.id, guild.name, FAILED, "retries exhausted")
+
+
+def ban_action(user, reason: str) -> Action:
+    # One request per guild: Discord's ban is idempotent (204 for a user who is
+    # already banned), so asking first would only double the calls.
+    async def action(guild, throttle: Throttle) -> str:
+        await throttle()
+        try:
+            with metrics.timer("rest_call_seconds", call="ban"):
+                await guild.ban(user, reason=reason)
+        except discord.NotFound:
+            # Unknown user: there is nothing left to ban.
+            return ALREADY_BANNED
+        return BANNED
+    return action
+
+
+def unban_action(user, reason: str) -> Action:
+    async def action(guild, throttle: Throttle) -> str:
+        await throttle()
+        try:
+            with metrics.timer("rest_call_seconds", call="unban"):
+                await guild.unban(user, reason=reason)
+        except discord.NotFound:
+            return NOT_BANNED
+        return UNBANNED
+    return action
+
+
+def summarize(results: List[GuildResult]) -> Dict[str, List[GuildResult]]:
+    by_status: Dict[str, List[GuildResult]] = {}
+    for result in results:
+        by_status.setdefault(result.status, []).append(result)
+    return by_status
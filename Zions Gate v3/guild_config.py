@@ -0,0 +1,66 @@
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional
+
+
+GUILD_CONFIG_QUERY = (
+    "SELECT setup, Local_1, Local_2, Local_3, Global_1, Global_2, Global_3, OwnerID "
+    "FROM servers WHERE Guild_ID = %s"
+)
+
+
+def _role_ids(values: Iterable) -> FrozenSet[int]:
+    roles = set()
+    for role in values:
+        if role and str(role).upper() != "NULL":
+            try:
+                roles.add(int(role))
+            except (ValueError, TypeError):
+                continue
+    return frozenset(roles)
+
+
+class GuildConfig(NamedTuple):
+    setup: bool
+    local_roles: FrozenSet[int]
+    global_roles: FrozenSet[int]
+    owner_id: int
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "GuildConfig":
+        setup = str(row[0]).strip().lower() in ("1", "true", "yes")
+        try:
+            owner_id = int(row[7] or 0)
+        except (ValueError, TypeError):
+            owner_id = 0
+        return cls(setup, _role_ids(row[1:4]), _role_ids(row[4:7]), owner_id)
+
+
+class GuildConfigCache:
+    """Per-guild servers row, cached until invalidate() is called for that guild.
+
+    Unregistered guilds are cached as None too, so register_server() must
+    invalidate after inserting.
+    """
+
+    def __init__(self, fetch_row: Callable[[int], Awaitable[Optional[tuple]]]):
+        self._fetch_row = fetch_row
+        self._configs: Dict[int, Optional[GuildConfig]] = {}
+        self._generation = 0
+
+    async def get(self, guild_id: int) -> Optional[GuildConfig]:
+        if guild_id in self._configs:
+            return self._configs[guild_id]
+        generation = self._generation
+        row = await self._fetch_row(guild_id)
+        config = GuildConfig.from_row(row) if row else None
+        # Don't cache a row read before an invalidate() that happened while we awaited.
+        if generation == self._generation:
+            self._configs[guild_id] = config
+        return config
+
+    def invalidate(self, guild_id: int):
+        self._generation += 1
+        self._configs.pop(guild_id, None)
+
+    def clear(self):
+        self._generation += 1
+        self._configs.clear()
@@ -0,0 +1,251 @@
+"""Sorted binary User_ID index for users.csv, read through mmap.
+
+    python id_index.py users.csv [users.csv.idx]    (re)build the index
+
+Layout (native byte order, checked on open):
+
+    header   64 bytes: magic, version, byte-order check, count,
+             size and mtime_ns of the CSV it describes
+    keys     count x uint64, User_IDs in ascending order
+    values   count x uint64, (byte offset of the row in the CSV << 1) | banned
+
+A cold process opens the file, confirms the CSV is the one it was built
+from, replays the table's journal (at most one compaction's worth of
+records) into a small overlay, and answers "does this user exist / are
+they banned" with one binary search, without reading the CSV.
+"""
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"ZGUSRIDX"
+VERSION = 1
+BYTE_ORDER_CHECK = 0x0102030405060708
+HEADER = struct.Struct("=8sIIQQQQ")
+HEADER_SIZE = 64
+USER_ID = "User_ID"
+GLOBAL_BANNED = "Global_Banned"
+TRUTHY = (b"1", b"true", b"yes")
+
+
+def _truthy(value) -> bool:
+    return str(value).strip().lower() in ("1", "true", "yes")
+
+
+def _user_id(value) -> Optional[int]:
+    value = str(value)
+    if value.isascii() and value.isdigit() and (value[0] != "0" or value == "0") and int(value) < 1 << 64:
+        return int(value)
+    return None
+
+
+def _records(f, columns: List[str]):
+    """(User_ID, row offset, banned) for each row of the CSV, reading from just after the header."""
+    id_pos = columns.index(USER_ID)
+    ban_pos = columns.index(GLOBAL_BANNED)
+    width = max(id_pos, ban_pos) + 1
+    offset = f.tell()
+    start = offset
+    pending = b""
+    for line in f:
+        offset += len(line)
+        record = pending + line if pending else line
+        if record.count(b'"') % 2:
+            # A quoted field runs onto the next line.
+            pending = record
+            continue
+        pending = b""
+        if b'"' in record:
+            fields = [field.encode("utf-8") for field in next(csv.reader([record.decode("utf-8")]), [])]
+        else:
+            fields = record.rstrip(b"\r\n").split(b",")
+        if len(fields) >= width:
+            user_id = _user_id(fields[id_pos].decode("ascii", "replace"))
+            if user_id is not None:
+                yield user_id, start, fields[ban_pos].strip().lower() in TRUTHY
+        start = offset
+
+
+def build_index(csv_path: Path, index_path: Path) -> int:
+    """Scan the CSV and atomically replace the index; returns the number of User_IDs indexed."""
+    with open(csv_path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]), [])
+        keys = array("Q")
+        values = array("Q")
+        for user_id, offset, banned in _records(f, header):
+            keys.append(user_id)
+            values.append(offset << 1 | banned)
+    # Stable sort on the ID keeps the first row of a duplicated User_ID, as the table does.
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    sorted_keys = array("Q")
+    sorted_values = array("Q")
+    previous = None
+    for i in order:
+        if keys[i] != previous:
+            previous = keys[i]
+            sorted_keys.append(keys[i])
+            sorted_values.append(values[i])
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, BYTE_ORDER_CHECK, len(sorted_keys),
+                            stat.st_size, stat.st_mtime_ns).ljust(HEADER_SIZE, b"\0"))
+        sorted_keys.tofile(f)
+        sorted_values.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, index_path)
+    return len(sorted_keys)
+
+
+def _read_header(f) -> Optional[Tuple[int, int, int]]:
+    data = f.read(HEADER_SIZE)
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, version, _, order_check, count, csv_size, csv_mtime_ns = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or order_check != BYTE_ORDER_CHECK:
+        return None
+    return count, csv_size, csv_mtime_ns
+
+
+def index_is_fresh(index_path: Path, csv_path: Path) -> bool:
+    try:
+        with open(index_path, "rb") as f:
+            header = _read_header(f)
+        stat = os.stat(csv_path)
+    except OSError:
+        return False
+    return header is not None and header[1:] == (stat.st_size, stat.st_mtime_ns)
+
+
+class UserIdIndex:
+    """Read-only view of an index file plus the journal written since it was built.
+
+    Use open(), which returns None when the index is missing or was built
+    from a different users.csv.
+    """
+
+    def __init__(self, index_path: Path, csv_path: Path, journal_paths: Iterable[Path] = ()):
+        self.index_path = index_path
+        self.csv_path = csv_path
+        # Keep the CSV the offsets refer to open, even if a compaction replaces it.
+        self._csv = open(csv_path, "rb")
+        # Lookups come from several storage workers; a seek and its reads must not interleave.
+        self._csv_lock = threading.Lock()
+        self._file = open(index_path, "rb")
+        try:
+            header = _read_header(self._file)
+            stat = os.fstat(self._csv.fileno())
+            if header is None or header[1:] != (stat.st_size, stat.st_mtime_ns):
+                raise ValueError(f"{index_path} does not match {csv_path}")
+            self.count = header[0]
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(self._mmap)
+            end = HEADER_SIZE + 8 * self.count
+            self._keys = view[HEADER_SIZE:end].cast("Q")
+            self._values = view[end:end + 8 * self.count].cast("Q")
+        except Exception:
+            self._file.close()
+            self._csv.close()
+            raise
+        self._columns = next(csv.reader([self._csv.readline().decode("utf-8-sig")]), [])
+        # User_ID -> banned for rows inserted or updated after the index was built.
+        self._overlay: Dict[int, bool] = {}
+        for path in journal_paths:
+            self._replay(path)
+
+    @classmethod
+    def open(cls, index_path: Path, csv_path: Path, journal_paths: Iterable[Path] = ()) -> Optional["UserIdIndex"]:
+        try:
+            return cls(index_path, csv_path, journal_paths)
+        except (OSError, ValueError):
+            return None
+
+    def _replay(self, path: Path):
+        if not path.exists():
+            return
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record["op"] == "insert":
+                    user_id = _user_id(record["row"].get(USER_ID, ""))
+                    if user_id is not None and self._find(user_id) is None and user_id not in self._overlay:
+                        self._overlay[user_id] = _truthy(record["row"].get(GLOBAL_BANNED, ""))
+                elif record["op"] == "update" and GLOBAL_BANNED in record["values"]:
+                    user_id = _user_id(record["key"])
+                    if user_id is not None and (user_id in self._overlay or self._find(user_id) is not None):
+                        self._overlay[user_id] = _truthy(record["values"][GLOBAL_BANNED])
+
+    def _find(self, user_id: int) -> Optional[int]:
+        i = bisect_left(self._keys, user_id)
+        if i < self.count and self._keys[i] == user_id:
+            return i
+        return None
+
+    def is_banned(self, user_id) -> Optional[bool]:
+        """True/False for a known user, None if the ID is not in users.csv."""
+        user_id = _user_id(user_id)
+        if user_id is None:
+            return None
+        banned = self._overlay.get(user_id)
+        if banned is not None:
+            return banned
+        i = self._find(user_id)
+        return None if i is None else bool(self._values[i] & 1)
+
+    def __contains__(self, user_id) -> bool:
+        return self.is_banned(user_id) is not None
+
+    def __len__(self) -> int:
+        return self.count + sum(1 for user_id in self._overlay if self._find(user_id) is None)
+
+    def read_row(self, user_id) -> Optional[Dict[str, str]]:
+        """The user's full CSV row, read at its offset; None if unknown or only in the journal."""
+        user_id = _user_id(user_id)
+        i = None if user_id is None else self._find(user_id)
+        if i is None:
+            return None
+        with self._csv_lock:
+            self._csv.seek(self._values[i] >> 1)
+            record = self._csv.readline()
+            while record.count(b'"') % 2:
+                line = self._csv.readline()
+                if not line:
+                    break
+                record += line
+        fields = next(csv.reader([record.decode("utf-8")]), [])
+        row = dict(zip(self._columns, fields))
+        if user_id in self._overlay:
+            row[GLOBAL_BANNED] = str(self._overlay[user_id])
+        return row
+
+    def close(self):
+        self._keys.release()
+        self._values.release()
+        self._mmap.close()
+        self._file.close()
+        self._csv.close()
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print(__doc__.splitlines()[2].strip())
+        sys.exit(2)
+    csv_path = Path(sys.argv[1])
+    index_path = Path(sys.argv[2]) if len(sys.argv) == 3 else csv_path.with_name(csv_path.name + ".idx")
+    print(f"Indexed {build_index(csv_path, index_path)} user ID(s) into {index_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+Flush = Callable[[List[Any]], Awaitable[Any]]
+SpikeHandler = Callable[[Any, int, bool], None]
+
+
+class SpikeDetector:
+    """Sliding-window join counter per guild.
+
+    A guild enters raid mode when it sees `threshold` joins within `window`
+    seconds, and leaves it once the rate falls back under half of that.
+    """
+
+    def __init__(self, threshold: int = 30, window: float = 60.0):
+        self.threshold = threshold
+        self.window = window
+        self._joins: Dict[int, Deque[float]] = {}
+        self.raiding: Dict[int, bool] = {}
+
+    def record(self, guild_id: int, now: float) -> Optional[bool]:
+        """Count one join; returns True/False when the guild enters/leaves raid mode, else None."""
+        joins = self._joins.setdefault(guild_id, deque())
+        joins.append(now)
+        while joins and now - joins[0] > self.window:
+            joins.popleft()
+        raiding = self.raiding.get(guild_id, False)
+        if not raiding and len(joins) >= self.threshold:
+            self.raiding[guild_id] = True
+            return True
+        if raiding and len(joins) < self.threshold // 2:
+            self.raiding[guild_id] = False
+            return False
+        return None
+
+    def rate(self, guild_id: int) -> int:
+        return len(self._joins.get(guild_id, ()))
+
+
+class JoinPipeline:
+    """Separates the join-time decision from the user-row write.
+
+    The caller makes the ban decision inline and then submit()s the member.
+    Members are queued and flushed in batches of up to `batch_size`, or
+    whatever arrived within `flush_interval` seconds of the first one, so a
+    raid costs one storage write per batch instead of one per join.
+    """
+
+    def __init__(self, flush: Flush, batch_size: int = 100, flush_interval: float = 0.25,
+                 spikes: Optional[SpikeDetector] = None, on_spike: Optional[SpikeHandler] = None):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spikes = spikes or SpikeDetector()
+        self.on_spike = on_spike
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.joins = 0
+        self.batches = 0
+        self.flushed = 0
+        self.max_batch = 0
+        self.max_queue_depth = 0
+        self._latency_total = 0.0
+        self.max_latency = 0.0
+
+    def record_decision(self, guild_id: int, started: float):
+        """Note that a join (received at perf_counter() `started`) has had its ban decision made."""
+        now = time.perf_counter()
+        latency = now - started
+        self.joins += 1
+        self._latency_total += latency
+        self.max_latency = max(self.max_latency, latency)
+        change = self.spikes.record(guild_id, time.monotonic())
+        if change is not None and self.on_spike:
+            self.on_spike(guild_id, self.spikes.rate(guild_id), change)
+
+    def submit(self, member):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        self._queue.put_nowait(member)
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    async def _run(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self.flush(batch)
+            except Exception as e:
+                print(f"[joins] Error persisting {len(batch)} joined member(s): {e}")
+            finally:
+                self.batches += 1
+                self.flushed += len(batch)
+                self.max_batch = max(self.max_batch, len(batch))
+                for _ in batch:
+                    queue.task_done()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "joins": self.joins,
+            "batches": self.batches,
+            "avg_batch": self.flushed / self.batches if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "avg_decision_ms": self._latency_total / self.joins * 1000 if self.joins else 0.0,
+            "max_decision_ms": self.max_latency * 1000,
+        }
+
+    async def close(self, timeout: float = 10.0):
+        """Flush whatever is queued, then stop the worker."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[joins] Pipeline closed with {self._queue.qsize()} member(s) not persisted.")
+        self._worker.cancel()
+        await asyncio.gather(self._worker, return_exceptions=True)
+        self._queue = None
+        self._worker = None
@@ -1,191 +1,333 @@
 import discord
 from discord.ext import commands
-import aiohttp
 import asyncio
-import csv
 import os
-from datetime import datetime, UTC
+import threading
+import time
+from datetime import datetime, timedelta, UTC
 from typing import Optional
 from dotenv import load_dotenv
-import csv
 from pathlib import Path
-from typing import List, Dict, Any
-from git import Repo
+from typing import List, Dict, Any, Set, Tuple
+from csv_store import CSVTable
+from user_table import UserTable
+from search_index import UserSearchIndex
+from sqlite_backend import SQLiteDatabase
+from snapshot import SnapshotPublisher
+from repository import AsyncRepository
+from guild_config import GUILD_CONFIG_QUERY, GuildConfigCache
+import fanout
+from webhooks import WebhookDispatcher
+from purge_archive import PurgeArchive
+from avatar_notifier import AvatarNotifier
+from purge_engine import PurgeEngine, PurgeFilter, compile_pattern
+from reconcile import ReconcileCheckpoints, member_digest
+from join_pipeline import JoinPipeline, SpikeDetector
+from metrics import metrics, serve as serve_metrics
+from tracing import tracer
+from id_index import UserIdIndex
+from shard_ipc import ShardIPC, parse_peers
+from ban_jobs import (BanJob, BanJobQueue, RETRY_NO_FAILURES, RETRY_QUEUED, RETRY_RUNNING,
+                      RETRY_SUPERSEDED)
 load_dotenv()
 
 BASE_DIR = Path(__file__).parent
-SERVERS_CSV = BASE_DIR / "servers.csv"
-USERS_CSV = BASE_DIR / "users.csv"
+# DATA_DIR points the bot at another set of CSVs (the benchmarks use synthetic data).
+DATA_DIR = Path(os.getenv("DATA_DIR") or BASE_DIR)
+SERVERS_CSV = DATA_DIR / "servers.csv"
+USERS_CSV = DATA_DIR / "users.csv"
+
+# === Sharding ===
+# SHARD_COUNT unset: one gateway connection (commands.Bot). "auto" or a number:
+# AutoShardedBot. SHARD_IDS runs only those shards, for splitting them across
+# processes (shard_launcher.py sets all of this up). Processes reach each other
+# on SHARD_IPC_PORT / SHARD_IPC_PEERS so /globalban and /globalunban cover the
+# guilds of every shard; they share storage, so they need STORAGE_BACKEND=sqlite.
+SHARD_COUNT = os.getenv("SHARD_COUNT", "").strip().lower()
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()]
+SHARD_IPC_HOST = os.getenv("SHARD_IPC_HOST", "127.0.0.1")
+SHARD_IPC_PORT = int(os.getenv("SHARD_IPC_PORT", "0"))
+SHARD_IPC_PEERS = parse_peers(os.getenv("SHARD_IPC_PEERS", ""))
+SHARD_IPC_SECRET = os.getenv("SHARD_IPC_SECRET", "")
+SHARD_IPC_TIMEOUT = float(os.getenv("SHARD_IPC_TIMEOUT", "120"))
+SHARD_LABEL = f"shards {','.join(map(str, SHARD_IDS))}" if SHARD_IDS else "all shards"
+
+# Each process keeps checkpoints and ban jobs only for its own guilds.
+SHARD_SUFFIX = f".shards-{'-'.join(map(str, SHARD_IDS))}" if SHARD_IDS else ""
+RECONCILE_STATE = DATA_DIR / f"reconcile_state{SHARD_SUFFIX}.json"
+BAN_JOBS_FILE = DATA_DIR / f"ban_jobs{SHARD_SUFFIX}.jsonl"
+
+# === Metrics ===
+# Latency histograms for commands, checks, storage and REST/webhook calls. With
+# METRICS_PORT set they are served in Prometheus text format on METRICS_HOST.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+metrics.enabled = METRICS_ENABLED
+
+# === Tracing ===
+# Every slash command is traced; those slower than TRACE_SLOW_MS go to TRACE_FILE
+# (JSON lines; `python tracing.py slow_traces.jsonl -o out.json` for a flame graph).
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "1000"))
+TRACE_FILE = Path(os.getenv("TRACE_FILE") or DATA_DIR / "slow_traces.jsonl")
+tracer.enabled = TRACING_ENABLED
+tracer.slow_ms = TRACE_SLOW_MS
+tracer.path = TRACE_FILE
 
 # === Git snapshot settings ===
 GIT_TOKEN = os.getenv("CSV_PUSH_TOKEN")
 REPO_PATH = BASE_DIR
 CSV_FILES = ["servers.csv", "users.csv"]
+# CSV_PUSH_REMOTE overrides the GitHub remote (e.g. a local bare repo for testing).
+CSV_PUSH_REMOTE = os.getenv("CSV_PUSH_REMOTE") or (
+    f"https://{GIT_TOKEN}@github.com/TylerOlsen-dev/zions-gate-bot.git" if GIT_TOKEN else None
+)
+CSV_SNAPSHOT_WINDOW = float(os.getenv("CSV_SNAPSHOT_WINDOW", "60"))
+
+def _compact_tables():
+    # Make sure the journal is folded into the CSVs that get committed. Go through the
+    # tables' own compactor so a snapshot never starts a second, overlapping one; writes
+    # that an already running compaction misses mark the snapshot dirty again.
+    for table in (servers_table, _users()):
+        table.compact_in_background().join()
+
+snapshots = SnapshotPublisher(
+    REPO_PATH, [SERVERS_CSV, USERS_CSV], CSV_PUSH_REMOTE,
+    window=CSV_SNAPSHOT_WINDOW, before_push=_compact_tables,
+)
 
 def push_csv_snapshot():
-    """Stage CSVs, amend moving snapshot commit, force-push."""
-    if not GIT_TOKEN:
-        return 
-    try:
-        repo = Repo(REPO_PATH, search_parent_directories=True)
-        repo_root = Path(repo.working_tree_dir)             
-        rel_files = [str(SERVERS_CSV.relative_to(repo_root)), 
-                     str(USERS_CSV.relative_to(repo_root))]
-        repo.index.add(rel_files)
-        commit_msg = f"CSV snapshot {datetime.now(UTC):%Y-%m-%d %H:%M UTC}"
-
-        if repo.head.is_valid():
-            repo.git.commit("--amend", "--no-edit", "-m", commit_msg)
-        else:
-            repo.index.commit(commit_msg)
-        origin = repo.remote(name="origin")
-        origin.set_url(f"https://{GIT_TOKEN}@github.com/TylerOlsen-dev/zions-gate-bot.git")
-        origin.push(force=True)
-    except Exception as e:
-        print(f"[CSV snapshot] Git push skipped: {e}")
+    """Schedule a coalesced snapshot push; the git work happens off the event loop."""
+    snapshots.mark_dirty()
 
 
 SERVERS_COLUMNS = ["Server_AI_ID","Guild_ID","Server_Name","Local_1","Local_2","Local_3","Global_1","Global_2","Global_3","OwnerID","setup"]
 USERS_COLUMNS = ["User_AI_ID","User_ID","User_Name","Account_Age","Global_Banned"]
 
-def _load_csv(path: Path) -> List[Dict[str, Any]]:
-    if not path.exists():
+# === Journal settings ===
+CSV_JOURNAL = os.getenv("CSV_JOURNAL", "true").strip().lower() in ("1", "true", "yes")
+JOURNAL_FSYNC_EVERY = int(os.getenv("JOURNAL_FSYNC_EVERY", "32"))
+JOURNAL_FSYNC_INTERVAL = float(os.getenv("JOURNAL_FSYNC_INTERVAL", "1.0"))
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", str(1024 * 1024)))
+
+def _journal_path(path: Path) -> Optional[Path]:
+    return path.with_name(path.name + ".journal") if CSV_JOURNAL else None
+
+def _open_table(path: Path, columns: List[str], key_field: str, id_field: str, on_insert=None,
+                table_class=CSVTable, **kwargs) -> CSVTable:
+    return table_class(
+        path, columns, key_field, id_field,
+        on_change=push_csv_snapshot,
+        on_insert=on_insert,
+        journal_path=_journal_path(path),
+        fsync_every=JOURNAL_FSYNC_EVERY,
+        fsync_interval=JOURNAL_FSYNC_INTERVAL,
+        compact_bytes=JOURNAL_COMPACT_BYTES,
+        **kwargs,
+    )
+
+# === User_ID index ===
+# users.csv.idx holds every User_ID in sorted order with its ban flag and row
+# offset, read through mmap. While it matches users.csv, startup answers ban
+# checks and user lookups from it and loads the users table in the background.
+USER_INDEX_ENABLED = os.getenv("USER_INDEX_ENABLED", "true").strip().lower() in ("1", "true", "yes")
+USERS_INDEX = DATA_DIR / "users.csv.idx"
+
+# Username index for /searchuser, kept current by every insert into Users.
+user_search = UserSearchIndex()
+
+def _index_users(rows: List[Dict[str, Any]]):
+    user_search.add_many((str(r["User_ID"]), r["User_Name"]) for r in rows)
+
+def _on_database_insert(table: str, rows: List[Dict[str, Any]]):
+    if table.lower() == "users":
+        _index_users(rows)
+        _share_indexed_users(rows)
+
+# === Storage backend ===
+# "csv": CSV tables loaded once at startup (replaying any journal); every query is a dict lookup.
+# "sqlite": both tables live in SQLITE_PATH, indexed on Guild_ID/User_ID.
+# Import existing CSVs once with: python sqlite_backend.py <database> servers.csv users.csv
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "csv").strip().lower()
+SQLITE_PATH = Path(os.getenv("SQLITE_PATH") or DATA_DIR / "zions_gate.db")
+
+if SHARD_IPC_PEERS and STORAGE_BACKEND != "sqlite":
+    # Each process would hold its own copy of the CSVs and overwrite the others' writes.
+    raise SystemExit("Running shards in several processes needs STORAGE_BACKEND=sqlite.")
+if (SHARD_IPC_PORT or SHARD_IPC_PEERS) and not SHARD_IPC_SECRET:
+    raise SystemExit("Shard IPC needs SHARD_IPC_SECRET set to the same random value in every process.")
+
+users_table: Optional[UserTable] = None
+users_index: Optional[UserIdIndex] = None
+# Set once users_table (CSV) or the database is ready to serve every query.
+users_loaded = threading.Event()
+
+def _users() -> UserTable:
+    users_loaded.wait()
+    return users_table
+
+if STORAGE_BACKEND == "sqlite":
+    database = SQLiteDatabase(SQLITE_PATH, on_insert=_on_database_insert)
+    servers_table = None
+else:
+    database = None
+    servers_table = _open_table(SERVERS_CSV, SERVERS_COLUMNS, "Guild_ID", "Server_AI_ID")
+    if USER_INDEX_ENABLED:
+        journal = _journal_path(USERS_CSV)
+        journals = [journal.with_name(journal.name + ".old"), journal] if journal else []
+        users_index = UserIdIndex.open(USERS_INDEX, USERS_CSV, journals)
+
+def _user_rows() -> List[Dict[str, Any]]:
+    """Every user row (User_ID, User_Name, Global_Banned), for building the in-memory indexes."""
+    if database is None:
+        return _users().rows()
+    cursor = database.connect().cursor()
+    try:
+        cursor.execute("SELECT User_ID, User_Name, Global_Banned FROM Users")
+        return [{"User_ID": str(u), "User_Name": n, "Global_Banned": b} for u, n, b in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+if database is not None:
+    user_search.add_in_background([(r["User_ID"], r["User_Name"]) for r in _user_rows()])
+
+_COLUMN_LOOKUP = {c.upper(): c for c in SERVERS_COLUMNS + USERS_COLUMNS}
+
+def _selected_columns(query_upper: str, table_columns: List[str]) -> List[str]:
+    # "SELECT a, b FROM ..." -> ["a", "b"]; empty if any column is unknown.
+    names = query_upper[len("SELECT"):query_upper.index(" FROM ")].split(",")
+    columns = [_COLUMN_LOOKUP.get(n.strip()) for n in names]
+    if not all(c in table_columns for c in columns):
         return []
-    with open(path, newline='', encoding="utf-8") as f:
-        return list(csv.DictReader(f))
-
-def _save_csv(path: Path, rows: List[Dict[str, Any]], fieldnames: List[str]):
-    with open(path, "w", newline='', encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-        push_csv_snapshot()
-
-def _next_id(rows: List[Dict[str, Any]], id_field: str) -> int:
-    if not rows:
-        return 1
-    max_id = max(int(r[id_field]) for r in rows if r.get(id_field, "").isdigit())
-    return max_id + 1
+    return columns
+
+def _query_kind(query_upper: str) -> str:
+    # "select_users", "update_servers", ... as the metrics label.
+    verb = query_upper.split(None, 1)[0].lower()
+    return f"{verb}_{'servers' if 'SERVERS' in query_upper else 'users'}"
+
+def _index_row(user_id, columns: List[str]) -> Optional[Dict[str, str]]:
+    """Answer a Users lookup from users_index before the table has loaded; None means ask the table.
+
+    An empty dict means the user is not in users.csv.
+    """
+    banned = users_index.is_banned(user_id)
+    if banned is None:
+        return {}
+    with _ban_lock:
+        if users_loaded.is_set():
+            return None
+        # Bans set since startup are only in _ban_changes until the table has loaded.
+        banned = _ban_changes.get(int(user_id), banned)
+    if set(columns) <= {"User_ID", "Global_Banned"}:
+        return {"User_ID": str(user_id), "Global_Banned": str(banned)}
+    # Rows added since the index was built are only in the journal.
+    row = users_index.read_row(user_id)
+    if row is not None:
+        row["Global_Banned"] = str(banned)
+    return row
 
 class CSVCursor:
     def __init__(self):
         self._results = []
+        self.rowcount = 0
     
     def execute(self, query: str, params: tuple = ()):
         query_upper = query.upper()
-        if query_upper.startswith("SELECT"):
-            self._handle_select(query_upper, params)
-        elif query_upper.startswith("INSERT INTO SERVERS"):
-            self._handle_insert_servers(params)
-        elif query_upper.startswith("INSERT INTO USERS"):
-            self._handle_insert_users(params)
-        elif query_upper.startswith("UPDATE USERS"):
-            self._handle_update_users(params)
-        elif query_upper.startswith("UPDATE SERVERS"):
-            self._handle_update_servers(params)
+        with metrics.timer("csv_query_seconds", query=_query_kind(query_upper)):
+            if query_upper.startswith("SELECT"):
+                self._handle_select(query_upper, params)
+            elif query_upper.startswith("INSERT INTO SERVERS"):
+                self._handle_insert_servers(params)
+            elif query_upper.startswith("INSERT INTO USERS"):
+                self._handle_insert_users(params)
+            elif query_upper.startswith("UPDATE USERS"):
+                self._handle_update_users(params)
+            elif query_upper.startswith("UPDATE SERVERS"):
+                self._handle_update_servers(params)
+            else:
+                raise NotImplementedError(f"Query not supported: {query}")
+
+    def executemany(self, query: str, seq_params):
+        query_upper = query.upper()
+        if query_upper.startswith("INSERT IGNORE INTO USERS"):
+            with metrics.timer("csv_query_seconds", query="insert_many_users"):
+                self._handle_insert_many_users(seq_params)
         else:
-            raise NotImplementedError(f"Query not supported: {query}")
+            for params in seq_params:
+                self.execute(query, params)
     
     def _handle_select(self, query_upper: str, params: tuple):
         if "FROM SERVERS" in query_upper:
-            servers = _load_csv(SERVERS_CSV)
-            guild_id = str(params[0])
-            if "SELECT GUILD_ID" in query_upper:
-                row = next((r for r in servers if r["Guild_ID"] == guild_id), None)
-                self._results = [(row["Guild_ID"],)] if row else []
-            elif "SELECT SETUP" in query_upper:
-                row = next((r for r in servers if r["Guild_ID"] == guild_id), None)
-                self._results = [(row["setup"],)] if row else []
-            elif "GLOBAL_1" in query_upper:
-                row = next((r for r in servers if r["Guild_ID"] == guild_id), None)
-                if row:
-                    self._results = [(row["Global_1"], row["Global_2"], row["Global_3"])]
-                else:
-                    self._results = []
-            elif "LOCAL_1" in query_upper:
-                row = next((r for r in servers if r["Guild_ID"] == guild_id), None)
-                if row:
-                    self._results = [(row["Local_1"], row["Local_2"], row["Local_3"])]
-                else:
-                    self._results = []
-            elif "OWNERID" in query_upper:
-                row = next((r for r in servers if r["Guild_ID"] == guild_id), None)
-                self._results = [(row["OwnerID"],)] if row else []
-            else:
+            row = servers_table.get(params[0])
+            columns = _selected_columns(query_upper, SERVERS_COLUMNS)
+            if row is None or not columns:
                 self._results = []
-        elif "FROM USERS" in query_upper:
-            users = _load_csv(USERS_CSV)
-            user_id = str(params[0])
-            if "SELECT USER_ID" in query_upper:
-                row = next((r for r in users if r["User_ID"] == user_id), None)
-                self._results = [(row["User_ID"],)] if row else []
-            elif "SELECT GLOBAL_BANNED" in query_upper:
-                row = next((r for r in users if r["User_ID"] == user_id), None)
-                self._results = [(row["Global_Banned"],)] if row else []
             else:
+                self._results = [tuple(row[c] for c in columns)]
+        elif "FROM USERS" in query_upper:
+            columns = _selected_columns(query_upper, USERS_COLUMNS)
+            row = _index_row(params[0], columns) if not users_loaded.is_set() else None
+            if row is None:
+                row = _users().get(params[0])
+            if not row or not columns:
                 self._results = []
+            else:
+                self._results = [tuple(row[c] for c in columns)]
         else:
             self._results = []
     
     def _handle_insert_servers(self, params: tuple):
-        servers = _load_csv(SERVERS_CSV)
-        new_id = str(_next_id(servers, "Server_AI_ID"))
         guild_id, server_name = str(params[0]), params[1]
-        new_row = dict.fromkeys(SERVERS_COLUMNS, "")
-        new_row.update({
-            "Server_AI_ID": new_id,
+        servers_table.insert({
             "Guild_ID": guild_id,
             "Server_Name": server_name,
             "OwnerID": "0",
             "setup": "False",
         })
-        servers.append(new_row)
-        _save_csv(SERVERS_CSV, servers, SERVERS_COLUMNS)
         self._results = []
     
     def _handle_insert_users(self, params: tuple):
-        users = _load_csv(USERS_CSV)
-        new_id = str(_next_id(users, "User_AI_ID"))
         user_id, user_name, account_age, global_banned = params
-        new_row = dict.fromkeys(USERS_COLUMNS, "")
-        new_row.update({
-            "User_AI_ID": new_id,
+        _users().insert({
             "User_ID": str(user_id),
             "User_Name": user_name,
             "Account_Age": account_age,
             "Global_Banned": str(global_banned),
         })
-        users.append(new_row)
-        _save_csv(USERS_CSV, users, USERS_COLUMNS)
+        self._results = []
+    
+    def _handle_insert_many_users(self, seq_params):
+        inserted = _users().insert_many(
+            {
+                "User_ID": str(user_id),
+                "User_Name": user_name,
+                "Account_Age": account_age,
+                "Global_Banned": str(global_banned),
+            }
+            for user_id, user_name, account_age, global_banned in seq_params
+        )
+        self.rowcount = len(inserted)
         self._results = []
     
     def _handle_update_users(self, params: tuple):
         global_banned, user_id = params
-        users = _load_csv(USERS_CSV)
-        for row in users:
-            if row["User_ID"] == str(user_id):
-                row["Global_Banned"] = str(global_banned)
-                break
-        _save_csv(USERS_CSV, users, USERS_COLUMNS)
+        _users().update(user_id, {"Global_Banned": str(global_banned)})
         self._results = []
     
     def _handle_update_servers(self, params: tuple):
         (server_name, local1, local2, local3, global1, global2, global3, guild_id) = params
-        servers = _load_csv(SERVERS_CSV)
-        for row in servers:
-            if row["Guild_ID"] == str(guild_id):
-                row.update({
-                    "Server_Name": server_name,
-                    "Local_1": str(local1) if local1 else "",
-                    "Local_2": str(local2) if local2 else "",
-                    "Local_3": str(local3) if local3 else "",
-                    "Global_1": str(global1) if global1 else "",
-                    "Global_2": str(global2) if global2 else "",
-                    "Global_3": str(global3) if global3 else "",
-                    "setup": "True",
-                })
-                break
-        _save_csv(SERVERS_CSV, servers, SERVERS_COLUMNS)
+        servers_table.update(guild_id, {
+            "Server_Name": server_name,
+            "Local_1": str(local1) if local1 else "",
+            "Local_2": str(local2) if local2 else "",
+            "Local_3": str(local3) if local3 else "",
+            "Global_1": str(global1) if global1 else "",
+            "Global_2": str(global2) if global2 else "",
+            "Global_3": str(global3) if global3 else "",
+            "setup": "True",
+        })
         self._results = []
     
     def fetchone(self):
@@ -206,12 +348,72 @@ class CSVConnection:
         pass
 
 def db_connection():
+    if database is not None:
+        return database.connect()
     return CSVConnection()
 
+STORAGE_WORKERS = int(os.getenv("STORAGE_WORKERS", "4"))
+repo = AsyncRepository(
+    db_connection, max_workers=STORAGE_WORKERS,
+    instrument=lambda op: metrics.timer("storage_call_seconds", op=op),
+)
+# Writes to Users get their own worker: while users.csv loads in the background they
+# wait for it there instead of tying up the pool that serves guild configs and joins.
+# One worker also keeps a user's ban and unban in the order they were made.
+user_writes = AsyncRepository(
+    db_connection, max_workers=1,
+    instrument=lambda op: metrics.timer("storage_call_seconds", op=op),
+)
+
+async def _fetch_guild_config_row(guild_id: int):
+    return await repo.fetchone(GUILD_CONFIG_QUERY, (guild_id,))
+
+# Setup flag, role sets and owner per guild; /setup and register_server invalidate.
+guild_configs = GuildConfigCache(_fetch_guild_config_row)
+
+# Member-ID digest and last reconcile time per guild, so restarts only process the delta.
+checkpoints = ReconcileCheckpoints(RECONCILE_STATE)
+
 
 def _is_truthy(val):
     return str(val).strip().lower() in ("1", "true", "yes")
 
+# Globally banned user IDs, so the join-time ban decision never waits on storage.
+# Built from users.csv once; set_global_ban keeps it in step with the table. Until
+# a background load finishes, bans come from users_index plus _ban_changes.
+banned_ids: Set[int] = set()
+_ban_changes: Dict[int, bool] = {}
+_ban_lock = threading.Lock()
+
+def _load_users():
+    global users_table, banned_ids
+    started = time.perf_counter()
+    # Users are held column-wise (typed arrays, one name pool) rather than as a dict per row.
+    table = _open_table(USERS_CSV, USERS_COLUMNS, "User_ID", "User_AI_ID", on_insert=_index_users,
+                        table_class=UserTable, index_path=USERS_INDEX if USER_INDEX_ENABLED else None)
+    banned = set(table.banned_user_ids())
+    with _ban_lock:
+        for user_id, is_banned in _ban_changes.items():
+            if is_banned:
+                banned.add(user_id)
+            else:
+                banned.discard(user_id)
+        _ban_changes.clear()
+        banned_ids = banned
+        users_table = table
+        users_loaded.set()
+    user_search.add_in_background(table.id_name_pairs())
+    print(f"[users.csv] Loaded {len(table)} user(s) in {time.perf_counter() - started:.2f}s.")
+
+if database is not None:
+    banned_ids = {int(r["User_ID"]) for r in _user_rows() if _is_truthy(r["Global_Banned"])}
+    users_loaded.set()
+elif users_index is not None:
+    print(f"[users.csv] Serving {len(users_index)} user ID(s) from {USERS_INDEX.name} while the table loads.")
+    threading.Thread(target=_load_users, name="users-load", daemon=True).start()
+else:
+    _load_users()
+
 
 BAN_WEBHOOK_URL = os.getenv("BAN_WEBHOOK_URL")
 AVATAR_WEBHOOK_URL = os.getenv("AVATAR_WEBHOOK_URL")
@@ -219,11 +421,83 @@ REPORT_WEBHOOK_URL = os.getenv("REPORT_WEBHOOK_URL")
 LK_WEBHOOK_URL = os.getenv("LK_WEBHOOK_URL")
 LB_WEBHOOK_URL = os.getenv("LB_WEBHOOK_URL")
 PURGE_WEBHOOK_URL = os.getenv("PURGE_WEBHOOK_URL")
+RAID_WEBHOOK_URL = os.getenv("RAID_WEBHOOK_URL")
+# Avatar changes by the same user within this many seconds are announced once.
+AVATAR_COALESCE_SECONDS = float(os.getenv("AVATAR_COALESCE_SECONDS", "30"))
+PURGE_LOG_GZIP = _is_truthy(os.getenv("PURGE_LOG_GZIP", "false"))
+# Discord rejects webhook attachments over 10 MiB; purge logs are split below this.
+PURGE_ATTACHMENT_BYTES = int(os.getenv("PURGE_ATTACHMENT_BYTES", str(8 * 1024 * 1024)))
+PURGE_MAX_MESSAGES = int(os.getenv("PURGE_MAX_MESSAGES", "10000"))
+# With an author or pattern filter, stop after scanning this many messages.
+PURGE_SCAN_LIMIT = int(os.getenv("PURGE_SCAN_LIMIT", "100000"))
+# Messages too old for bulk delete are removed one at a time at this rate (per second).
+PURGE_SINGLE_DELETE_RATE = float(os.getenv("PURGE_SINGLE_DELETE_RATE", "1.0"))
 BOT_TOKEN = os.getenv("BOT_TOKEN")
+GLOBALBAN_CONCURRENCY = int(os.getenv("GLOBALBAN_CONCURRENCY", "8"))
+# Global ban/unban jobs run at once; each fans out with GLOBALBAN_CONCURRENCY.
+BAN_JOB_CONCURRENCY = int(os.getenv("BAN_JOB_CONCURRENCY", "2"))
+REST_RATE_LIMIT = float(os.getenv("REST_RATE_LIMIT", "40"))
+JOIN_BATCH_SIZE = int(os.getenv("JOIN_BATCH_SIZE", "100"))
+JOIN_FLUSH_MS = float(os.getenv("JOIN_FLUSH_MS", "250"))
+RAID_JOIN_THRESHOLD = int(os.getenv("RAID_JOIN_THRESHOLD", "30"))
+RAID_WINDOW_SECONDS = float(os.getenv("RAID_WINDOW_SECONDS", "60"))
+
+guild_fanout = fanout.GuildFanout(concurrency=GLOBALBAN_CONCURRENCY, rate=REST_RATE_LIMIT)
 
 intents = discord.Intents.default()
 intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(
+        command_prefix="!", intents=intents,
+        shard_count=None if SHARD_COUNT == "auto" else int(SHARD_COUNT),
+        shard_ids=SHARD_IDS or None,
+    )
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents)
+
+# Other processes of a sharded deployment; None when this process runs every shard.
+shard_ipc = ShardIPC(SHARD_LABEL, SHARD_IPC_HOST, SHARD_IPC_PORT, SHARD_IPC_PEERS,
+                     secret=SHARD_IPC_SECRET, timeout=SHARD_IPC_TIMEOUT) \
+    if SHARD_IPC_PORT or SHARD_IPC_PEERS else None
+
+# One aiohttp session for every webhook; commands enqueue and move on.
+webhooks = WebhookDispatcher()
+
+# Avatar changes, coalesced per user and posted in batches of up to 10 embeds.
+avatars = AvatarNotifier(
+    lambda embeds: webhooks.enqueue(AVATAR_WEBHOOK_URL, embeds=embeds),
+    window=AVATAR_COALESCE_SECONDS,
+)
+
+_bot_close = bot.close
+
+metrics_runner = None
+
+async def start_background_servers():
+    global metrics_runner
+    if METRICS_ENABLED and METRICS_PORT:
+        try:
+            metrics_runner = await serve_metrics(metrics, METRICS_HOST, METRICS_PORT)
+        except Exception as e:
+            print(f"[metrics] Could not start the metrics endpoint: {e}")
+    if shard_ipc is not None:
+        await shard_ipc.start()
+
+bot.setup_hook = start_background_servers
+
+async def close_bot():
+    # Flush background services while the event loop is still running.
+    await joins.close()
+    await avatars.close()
+    await webhooks.close()
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+    if shard_ipc is not None:
+        await shard_ipc.close()
+    await ban_jobs.close()
+    await _bot_close()
+
+bot.close = close_bot
 
 def get_user_display(user) -> str:
     try:
@@ -237,20 +511,20 @@ def get_user_display(user) -> str:
     return f"{name}#{disc}"
 
 # Server Registration
+def _register_server_sync(cursor, guild_id: int, guild_name: str) -> bool:
+    query = "SELECT Guild_ID FROM servers WHERE Guild_ID = %s"
+    cursor.execute(query, (guild_id,))
+    result = cursor.fetchone()
+    if result is None:
+        insert_query = "INSERT INTO servers (Guild_ID, Server_Name, OwnerID, setup) VALUES (%s, %s, 0, FALSE)"
+        cursor.execute(insert_query, (guild_id, guild_name))
+    return result is None
+
 async def register_server(guild: discord.Guild):
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT Guild_ID FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (guild.id,))
-        result = cursor.fetchone()
-        if result is None:
-            insert_query = "INSERT INTO servers (Guild_ID, Server_Name, OwnerID, setup) VALUES (%s, %s, 0, FALSE)"
-            cursor.execute(insert_query, (guild.id, guild.name))
-            connection.commit()
+        if await repo.transaction(_register_server_sync, guild.id, guild.name):
+            guild_configs.invalidate(guild.id)
             print(f"Registered server: {guild.name} (ID: {guild.id})")
-        cursor.close()
-        connection.close()
     except Exception as e:
         print("Error registering server:", e)
 
@@ -262,14 +536,8 @@ async def check_server_setup(interaction: discord.Interaction) -> bool:
     if guild is None:
         return True
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT setup FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (guild.id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        if result and _is_truthy(result[0]):
+        config = await guild_configs.get(guild.id)
+        if config and config.setup:
             return True
         else:
             if not interaction.response.is_done():
@@ -287,7 +555,7 @@ async def check_server_setup(interaction: discord.Interaction) -> bool:
 
 # Command Role Check
 async def check_command_roles(interaction: discord.Interaction) -> bool:
-    restricted_commands = {"localkick", "localban", "globalban", "globalunban"}
+    restricted_commands = {"localkick", "localban", "globalban", "globalunban", "banjobs"}
     if interaction.command is None:
         return True
     command_name = interaction.command.name.lower()
@@ -297,52 +565,56 @@ async def check_command_roles(interaction: discord.Interaction) -> bool:
     if guild is None:
         return True
 
-    allowed_roles_raw = []
+    allowed_roles = frozenset()
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        if command_name in ("globalban", "globalunban"):
-            cursor.execute("SELECT Global_1, Global_2, Global_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
-            result = cursor.fetchone()
-            allowed_roles_raw = list(result) if result else []
-        elif command_name in ("localkick", "localban"):
-            cursor.execute("SELECT Local_1, Local_2, Local_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
-            local_result = cursor.fetchone()
-            local_roles = list(local_result) if local_result else []
-            cursor.execute("SELECT Global_1, Global_2, Global_3 FROM servers WHERE Guild_ID = %s", (guild.id,))
-            global_result = cursor.fetchone()
-            global_roles = list(global_result) if global_result else []
-            allowed_roles_raw = local_roles + global_roles
-        cursor.close()
-        connection.close()
+        config = await guild_configs.get(guild.id)
+        if config is not None:
+            if command_name in ("globalban", "globalunban", "banjobs"):
+                allowed_roles = config.global_roles
+            elif command_name in ("localkick", "localban"):
+                allowed_roles = config.local_roles | config.global_roles
     except Exception as e:
         print("Error retrieving command roles:", e)
         raise discord.app_commands.CheckFailure("Access Denied: Could not verify your permissions.")
 
-    # Clean and convert role IDs
-    allowed_roles = []
-    for role in allowed_roles_raw:
-        if role and str(role).upper() != "NULL":
-            try:
-                allowed_roles.append(int(role))
-            except (ValueError, TypeError):
-                continue
-
-    user_role_ids = [role.id for role in interaction.user.roles]
-    if any(r in user_role_ids for r in allowed_roles):
+    user_role_ids = {role.id for role in interaction.user.roles}
+    if not allowed_roles.isdisjoint(user_role_ids):
         return True
     else:
         raise discord.app_commands.CheckFailure("Access Denied: You do not have permission to use this command.")
 
+def _command_name(interaction: discord.Interaction) -> str:
+    return interaction.command.qualified_name if interaction.command else "unknown"
+
+def _observe_command(interaction: discord.Interaction, status: str):
+    started = interaction.extras.pop("started", None)
+    if started is not None:
+        metrics.observe("command_seconds", time.perf_counter() - started,
+                        command=_command_name(interaction), status=status)
+    tracer.finish(interaction.extras.pop("trace", None), status)
+
 # Combined Global Check
 async def combined_check(interaction: discord.Interaction) -> bool:
+    # Command latency and the interaction's trace run from here to completion
+    # (on_app_command_completion / tree.on_error).
+    interaction.extras["started"] = time.perf_counter()
+    interaction.extras["trace"] = tracer.start(
+        f"/{_command_name(interaction)}",
+        interaction_id=interaction.id,
+        guild_id=interaction.guild.id if interaction.guild else None,
+        user_id=interaction.user.id,
+    )
     try:
-        if not await check_server_setup(interaction):
-            return False
-        if not await check_command_roles(interaction):
-            return False
-        return True
+        with metrics.timer("check_seconds", stage="server_setup"):
+            allowed = await check_server_setup(interaction)
+        if allowed:
+            with metrics.timer("check_seconds", stage="command_roles"):
+                allowed = await check_command_roles(interaction)
+        if not allowed:
+            _observe_command(interaction, "denied")
+        return allowed
     except discord.app_commands.CheckFailure as e:
+        _observe_command(interaction, "denied")
         try:
             if not interaction.response.is_done():
                 await interaction.response.send_message(str(e), ephemeral=True)
@@ -354,6 +626,19 @@ async def combined_check(interaction: discord.Interaction) -> bool:
 
 bot.tree.interaction_check = combined_check
 
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    _observe_command(interaction, "ok")
+
+_tree_on_error = bot.tree.on_error
+
+async def tree_on_error(interaction: discord.Interaction, error: discord.app_commands.AppCommandError):
+    denied = isinstance(error, discord.app_commands.CheckFailure)
+    _observe_command(interaction, "denied" if denied else "error")
+    await _tree_on_error(interaction, error)
+
+bot.tree.on_error = tree_on_error
+
 # Global Error Handler
 @bot.event
 async def on_app_command_error(interaction: discord.Interaction, error: discord.app_commands.AppCommandError):
@@ -371,96 +656,113 @@ async def on_app_command_error(interaction: discord.Interaction, error: discord.
             await interaction.response.send_message("An unexpected error occurred.", ephemeral=True)
 
 # Database Utility Functions
-async def add_member_to_users(member: discord.Member):
-    if member.bot:
-        return
-    user_id = member.id
-    user_name = get_user_display(member)
-    account_age = member.created_at.strftime('%Y-%m-%d')
+async def add_members_to_users(members) -> Dict[str, Any]:
+    """Insert every non-bot member not already in Users with one write.
+
+    Returns counts, timing and "error", which is None unless the write failed.
+    """
+    started = time.perf_counter()
+    rows = [
+        (member.id, get_user_display(member), member.created_at.strftime('%Y-%m-%d'), "False")
+        for member in members if not member.bot
+    ]
+    inserted = 0
+    error = None
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        select_query = "SELECT User_ID FROM Users WHERE User_ID = %s"
-        cursor.execute(select_query, (user_id,))
-        result = cursor.fetchone()
-        if result is None:
-            insert_query = "INSERT INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
-            data_tuple = (user_id, user_name, account_age, "False")
-            cursor.execute(insert_query, data_tuple)
-            connection.commit()
-            print(f"Added new user: {user_name} (ID: {user_id}) to Users table.")
-        cursor.close()
-        connection.close()
+        insert_query = "INSERT IGNORE INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
+        inserted = await user_writes.executemany(insert_query, rows)
     except Exception as e:
         print("Database error:", e)
+        error = str(e) or type(e).__name__
+    stats = {"inserted": inserted, "skipped": len(rows) - inserted, "seconds": time.perf_counter() - started,
+             "error": error}
+    if error is None:
+        print(f"Bulk user sync: {stats['inserted']} added, {stats['skipped']} already present in {stats['seconds']:.3f}s.")
+    return stats
+
+def on_join_spike(guild_id: int, joins_in_window: int, raiding: bool):
+    guild = bot.get_guild(guild_id)
+    name = guild.name if guild else guild_id
+    stats = joins.stats()
+    if raiding:
+        message = f"**Raid mode:** {joins_in_window} joins in the last {RAID_WINDOW_SECONDS:.0f}s in {name}."
+    else:
+        message = f"**Raid mode ended** in {name}."
+    print(f"{message} (queue depth {stats['queue_depth']}, avg batch {stats['avg_batch']:.1f}, "
+          f"avg decision {stats['avg_decision_ms']:.2f}ms)")
+    if RAID_WEBHOOK_URL:
+        webhooks.enqueue(RAID_WEBHOOK_URL, content=message)
+
+# Joined members are persisted in micro-batches; the ban decision is made before queueing.
+joins = JoinPipeline(
+    add_members_to_users,
+    batch_size=JOIN_BATCH_SIZE,
+    flush_interval=JOIN_FLUSH_MS / 1000,
+    spikes=SpikeDetector(RAID_JOIN_THRESHOLD, RAID_WINDOW_SECONDS),
+    on_spike=on_join_spike,
+)
+
+metrics.gauge("storage_queue_depth", lambda: repo.stats()["queue_depth"])
+metrics.gauge("user_write_queue_depth", lambda: user_writes.stats()["queue_depth"])
+metrics.gauge("join_queue_depth", lambda: joins.stats()["queue_depth"])
+metrics.gauge("webhook_queue_depth", lambda: sum(webhooks.queue_depths().values()))
+metrics.gauge("globally_banned_users", lambda: len(banned_ids))
 
 async def add_user_to_db(user: discord.User):
     user_id = user.id
     user_name = get_user_display(user)
     account_age = user.created_at.strftime('%Y-%m-%d')
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        select_query = "SELECT User_ID FROM Users WHERE User_ID = %s"
-        cursor.execute(select_query, (user_id,))
-        result = cursor.fetchone()
-        if result is None:
-            insert_query = "INSERT INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
-            data_tuple = (user_id, user_name, account_age, "False")
-            cursor.execute(insert_query, data_tuple)
-            connection.commit()
+        insert_query = "INSERT IGNORE INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
+        data_tuple = (user_id, user_name, account_age, "False")
+        if await user_writes.executemany(insert_query, [data_tuple]):
             print(f"Added new user: {user_name} (ID: {user_id}) to Users table.")
-        cursor.close()
-        connection.close()
     except Exception as e:
         print("Database error:", e)
 
+def _cache_global_ban(user_id: int, banned: bool):
+    with _ban_lock:
+        if not users_loaded.is_set():
+            _ban_changes[user_id] = banned
+        if banned:
+            banned_ids.add(user_id)
+        else:
+            banned_ids.discard(user_id)
+
 async def set_global_ban(user_id: int, banned: bool):
+    _cache_global_ban(user_id, banned)
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
         query = "UPDATE Users SET Global_Banned = %s WHERE User_ID = %s"
         value = "True" if banned else "False"
-        cursor.execute(query, (value, user_id))
-        connection.commit()
-        cursor.close()
-        connection.close()
+        await user_writes.execute(query, (value, user_id))
     except Exception as e:
         print("Database error:", e)
 
-async def is_globally_banned(user_id: int) -> bool:
-    try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT Global_Banned FROM Users WHERE User_ID = %s"
-        cursor.execute(query, (user_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        return result and _is_truthy(result[0])
-    except Exception as e:
-        print("Database error:", e)
-        return False
+def is_globally_banned(user_id: int) -> bool:
+    if users_loaded.is_set():
+        return user_id in banned_ids
+    banned = _ban_changes.get(user_id)
+    if banned is None:
+        banned = users_index.is_banned(user_id)
+    return bool(banned)
 
 # On Member Join
 @bot.event
 async def on_member_join(member: discord.Member):
+    started = time.perf_counter()
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT setup FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (member.guild.id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
-        if result and _is_truthy(result[0]):
-            await add_member_to_users(member)
-            if await is_globally_banned(member.id):
+        config = await guild_configs.get(member.guild.id)
+        if config and config.setup:
+            # Remove a banned raider before doing any storage work for them.
+            if is_globally_banned(member.id):
                 try:
-                    await member.guild.ban(member, reason="Global ban active.")
+                    with metrics.timer("rest_call_seconds", call="join_ban"):
+                        await member.guild.ban(member, reason="Global ban active.")
                     print(f"Banned {member} from {member.guild.name} due to global ban.")
                 except Exception as e:
                     print(f"Error banning {member} in {member.guild.name}: {e}")
+            joins.record_decision(member.guild.id, started)
+            joins.submit(member)
         else:
             print(f"Server {member.guild.name} is not set up; not adding {member} to Users table.")
     except Exception as e:
@@ -486,97 +788,150 @@ async def setup(interaction: discord.Interaction, local1: discord.Role, global1:
     except Exception as e:
         print("Error registering server in /setup:", e)
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
-        query = "SELECT OwnerID FROM servers WHERE Guild_ID = %s"
-        cursor.execute(query, (guild.id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
+        config = await guild_configs.get(guild.id)
     except Exception as e:
         print("Error retrieving OwnerID:", e)
         await interaction.response.send_message("Error checking server registration.", ephemeral=True)
         return
-    if result is None or int(result[0]) == 0:
+    if config is None or config.owner_id == 0:
         await interaction.response.send_message("Access Denied: Server owner not registered. Please contact the bot admin.", ephemeral=True)
         return
-    if interaction.user.id != int(result[0]):
+    if interaction.user.id != config.owner_id:
         await interaction.response.send_message("Access Denied: Only the registered server owner can run this command.", ephemeral=True)
         return
     try:
-        connection = db_connection()
-        cursor = connection.cursor()
         update_query = "UPDATE servers SET Server_Name = %s, Local_1 = %s, Local_2 = %s, Local_3 = %s, Global_1 = %s, Global_2 = %s, Global_3 = %s, setup = TRUE WHERE Guild_ID = %s"
         data = (guild.name, local1.id, local2.id if local2 else None, local3.id if local3 else None, global1.id, global2.id if global2 else None, global3.id if global3 else None, guild.id)
-        cursor.execute(update_query, data)
-        connection.commit()
-        cursor.close()
-        connection.close()
-        for member in guild.members:
-            await add_member_to_users(member)
+        await repo.execute(update_query, data)
+        guild_configs.invalidate(guild.id)
+        await add_members_to_users(guild.members)
         await interaction.response.send_message("Server setup complete. Command access is now enabled.", ephemeral=True)
     except Exception as e:
         print("Error in /setup:", e)
         await interaction.response.send_message("There was an error during setup.", ephemeral=True)
 
+# === Global ban jobs ===
+# Every /globalban and /globalunban is a durable job in BAN_JOBS_FILE: guilds
+# still pending when the process stops are picked up again by on_ready.
+FANOUT_ACTIONS = {"ban": fanout.ban_action, "unban": fanout.unban_action}
+
+async def _run_ban_job(job: BanJob, guild_ids: List[int], record):
+    if job.meta.get("set_flag"):
+        # Part of the job, so a restart before it ran still applies it on resume.
+        await set_global_ban(job.user_id, job.kind == "ban")
+    guilds = []
+    for guild_id in guild_ids:
+        guild = bot.get_guild(guild_id)
+        if guild is None:
+            record(fanout.GuildResult(guild_id, job.guilds[guild_id][0], fanout.FAILED, "bot is not in this guild"))
+        else:
+            guilds.append(guild)
+    action = FANOUT_ACTIONS[job.kind](discord.Object(id=job.user_id), job.reason)
+    await guild_fanout.run(guilds, action, on_result=record)
+
+def _ban_job_completed(job: BanJob):
+    # A job the command is waiting on is reported by the command itself.
+    if not job.resumed:
+        return
+    results = fanout.summarize(job.results())
+    done = fanout.BANNED if job.kind == "ban" else fanout.UNBANNED
+    webhooks.enqueue(BAN_WEBHOOK_URL, content=(
+        f"**Global {job.kind} job `{job.id}` for <@{job.user_id}> (ID: {job.user_id}) "
+        f"resumed after a restart and finished** ({SHARD_LABEL}).\n"
+        f"**Servers affected:** {', '.join(r.guild_name for r in results.get(done, [])) or 'None'}\n"
+        f"**Could not {job.kind} in:** {len(job.failed())} server(s). See /banjobs job_id:{job.id}"
+    ))
+
+ban_jobs = BanJobQueue(BAN_JOBS_FILE, _run_ban_job, concurrency=BAN_JOB_CONCURRENCY,
+                       on_complete=_ban_job_completed)
+metrics.gauge("ban_job_pending_guilds", lambda: ban_jobs.stats()["pending_guilds"])
+
+async def global_fanout(kind: str, user, reason: str) -> List[fanout.GuildResult]:
+    """Ban or unban in this process's guilds and, over shard IPC, in every other process's.
+
+    Each process runs its part as a durable job under the same job ID; this
+    process's job also sets the user's Global_Banned flag before its guilds.
+    """
+    job = await ban_jobs.submit(kind, user.id, reason, [(g.id, g.name) for g in bot.guilds],
+                                meta={"set_flag": True})
+    if shard_ipc is None or not shard_ipc.peers:
+        return await ban_jobs.wait(job)
+    payload = {"kind": kind, "user_id": user.id, "reason": reason, "job_id": job.id}
+    results, replies = await asyncio.gather(ban_jobs.wait(job), shard_ipc.broadcast("fanout", payload))
+    for peer, reply, error in replies:
+        if error is not None:
+            # The guilds of an unreachable process are unknown here; report the process itself.
+            results.append(fanout.GuildResult(0, f"shard process {peer}", fanout.FAILED, error))
+        else:
+            results.extend(fanout.GuildResult(*r) for r in reply)
+    return results
+
+async def _remote_fanout(payload: Dict[str, Any]) -> List[list]:
+    user_id = int(payload["user_id"])
+    # The requesting process's job writes the flag to the shared database.
+    _cache_global_ban(user_id, payload["kind"] == "ban")
+    job = await ban_jobs.submit(payload["kind"], user_id, payload["reason"],
+                                [(g.id, g.name) for g in bot.guilds], job_id=payload.get("job_id"))
+    return [list(r) for r in await ban_jobs.wait(job)]
+
+async def _remote_ban_jobs(payload: Dict[str, Any]) -> Dict[str, Any]:
+    retried = await ban_jobs.retry_failed(payload["retry"]) if payload.get("retry") else None
+    return {"jobs": [job.summary() for job in ban_jobs.jobs.values()], "retry": retried}
+
+def _share_indexed_users(rows: List[Dict[str, Any]]):
+    # Other processes read the shared database into /searchuser only at startup.
+    # Inserts are reported on storage threads, so hand the broadcast to the IPC's loop.
+    if shard_ipc is None or not shard_ipc.peers or shard_ipc.loop is None:
+        return
+    payload = {"users": [[str(r["User_ID"]), r["User_Name"]] for r in rows]}
+    asyncio.run_coroutine_threadsafe(shard_ipc.broadcast("index_users", payload, timeout=10), shard_ipc.loop)
+
+async def _remote_index_users(payload: Dict[str, Any]) -> int:
+    user_search.add_many((user_id, user_name) for user_id, user_name in payload["users"])
+    return len(payload["users"])
+
+if shard_ipc is not None:
+    shard_ipc.register("fanout", _remote_fanout)
+    shard_ipc.register("ban_jobs", _remote_ban_jobs)
+    shard_ipc.register("index_users", _remote_index_users)
+
 # Slash Command: Global Ban
 @bot.tree.command(name="globalban", description="Globally ban a user from all servers. Reason required; reply with evidence screenshots.")
 async def globalban(interaction: discord.Interaction, user: discord.User, reason: str):
     await interaction.response.defer(ephemeral=True)
     # Ensure the user is in the database
     await add_user_to_db(user)
-    await set_global_ban(user.id, True)
-    banned_in = []
-    for guild in bot.guilds:
-        member = guild.get_member(user.id)
-        if member is None:
-            try:
-                # Use the provided user object directly
-                try:
-                    await guild.ban(user, reason=reason)
-                    banned_in.append(guild.name)
-                except Exception as e:
-                    print(f"Failed to ban <@{user.id}> in {guild.name}: {e}")
-            except Exception as e:
-                print(f"Error processing user {user.id} in {guild.name}: {e}")
-        else:
-            await add_member_to_users(member)
-            try:
-                await guild.ban(member, reason=reason)
-                banned_in.append(guild.name)
-            except Exception as e:
-                print(f"Failed to ban <@{user.id}> in {guild.name}: {e}")
+    results = fanout.summarize(await global_fanout("ban", user, reason))
+    for result in results.get(fanout.FORBIDDEN, []) + results.get(fanout.FAILED, []):
+        print(f"Failed to ban <@{user.id}> in {result.guild_name}: {result.error}")
+    banned_in = [r.guild_name for r in results.get(fanout.BANNED, [])]
+    already_banned = len(results.get(fanout.ALREADY_BANNED, []))
+    not_banned = len(results.get(fanout.FORBIDDEN, [])) + len(results.get(fanout.FAILED, []))
     loc = f"{interaction.guild.name} - {interaction.channel.mention}"
     webhook_message = (
         f"**Global Ban executed for <@{user.id}> (ID: {user.id}).**\n"
         f"**Reason:** {reason}\n"
         f"**Banned by:** <@{interaction.user.id}> (ID: {interaction.user.id})\n"
         f"**Location:** {loc}\n"
-        f"**Servers affected:** {', '.join(banned_in)}\n\n"
+        f"**Servers affected:** {', '.join(banned_in)}\n"
+        f"**Already banned in:** {already_banned} server(s) | **Could not ban in:** {not_banned} server(s)\n\n"
         "Please reply with screenshots of evidence supporting this ban."
     )
-    try:
-        async with aiohttp.ClientSession() as session:
-            webhook = discord.Webhook.from_url(BAN_WEBHOOK_URL, session=session)
-            await webhook.send(content=webhook_message)
-    except Exception as e:
-        print("Error sending webhook message in global ban:", e)
-    await interaction.followup.send(f"Globally banned <@{user.id}> from: {', '.join(banned_in)}. Database updated.", ephemeral=True)
+    webhooks.enqueue(BAN_WEBHOOK_URL, content=webhook_message)
+    await interaction.followup.send(
+        f"Globally banned <@{user.id}> from: {', '.join(banned_in)}. "
+        f"Already banned in {already_banned}, failed in {not_banned}. Database updated.",
+        ephemeral=True,
+    )
 
 # Slash Command: Global Unban
 @bot.tree.command(name="globalunban", description="Globally unban a user from all servers and remove the global ban flag.")
 async def globalunban(interaction: discord.Interaction, user: discord.User):
     await interaction.response.defer(ephemeral=True)
-    await set_global_ban(user.id, False)
-    unbanned_in = []
-    for guild in bot.guilds:
-        try:
-            await guild.unban(user, reason="Global unban command issued.")
-            unbanned_in.append(guild.name)
-        except discord.NotFound:
-            pass
-        except Exception as e:
-            print(f"Failed to unban <@{user.id}> in {guild.name}: {e}")
+    results = fanout.summarize(await global_fanout("unban", user, "Global unban command issued."))
+    for result in results.get(fanout.FORBIDDEN, []) + results.get(fanout.FAILED, []):
+        print(f"Failed to unban <@{user.id}> in {result.guild_name}: {result.error}")
+    unbanned_in = [r.guild_name for r in results.get(fanout.UNBANNED, [])]
     loc = f"{interaction.guild.name} - {interaction.channel.mention}"
     webhook_message = (
         f"**Global Unban executed for <@{user.id}> (ID: {user.id}).**\n"
@@ -584,14 +939,85 @@ async def globalunban(interaction: discord.Interaction, user: discord.User):
         f"**Location:** {loc}\n"
         f"**Guilds affected:** {', '.join(unbanned_in) if unbanned_in else 'None'}."
     )
-    try:
-        async with aiohttp.ClientSession() as session:
-            webhook = discord.Webhook.from_url(BAN_WEBHOOK_URL, session=session)
-            await webhook.send(content=webhook_message)
-    except Exception as e:
-        print("Error sending webhook message in global unban:", e)
+    webhooks.enqueue(BAN_WEBHOOK_URL, content=webhook_message)
     await interaction.followup.send(f"Global unban executed for <@{user.id}> from: {', '.join(unbanned_in)}. Database updated.", ephemeral=True)
 
+# Slash Command: Ban Jobs
+def _merge_job_summaries(summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One entry per job ID across shard processes, newest first."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for s in summaries:
+        m = merged.get(s["id"])
+        if m is None:
+            merged[s["id"]] = dict(s, pending=list(s["pending"]), failed=list(s["failed"]))
+            continue
+        m["total"] += s["total"]
+        m["pending"] += s["pending"]
+        m["failed"] += s["failed"]
+        m["created_at"] = min(m["created_at"], s["created_at"])
+        m["finished_at"] = None if not (m["finished_at"] and s["finished_at"]) else max(m["finished_at"], s["finished_at"])
+    return sorted(merged.values(), key=lambda s: s["created_at"], reverse=True)
+
+# retry_failed() outcomes from every process, most useful first.
+RETRY_MESSAGES = [
+    (RETRY_QUEUED, "Failed servers were queued again."),
+    (RETRY_RUNNING, "Not retried: the job is still running. Retry once it has finished."),
+    (RETRY_SUPERSEDED, "Not retried: a newer ban job for this user has run since."),
+    (RETRY_NO_FAILURES, "Nothing to retry: no server failed with a retryable error."),
+]
+
+def _retry_message(outcomes: List[str]) -> str:
+    return next((message for outcome, message in RETRY_MESSAGES if outcome in outcomes), "")
+
+def _job_line(s: Dict[str, Any]) -> str:
+    done = s["total"] - len(s["pending"])
+    state = "finished" if s["finished_at"] else "running"
+    started = s["created_at"][:16].replace("T", " ")
+    return (f"`{s['id']}` {s['kind']} <@{s['user_id']}>: {done}/{s['total']} guild(s) done, "
+            f"{len(s['pending'])} pending, {len(s['failed'])} failed ({state}, started {started} UTC)")
+
+@bot.tree.command(name="banjobs", description="Show global ban/unban jobs with pending or failed servers.")
+@discord.app_commands.describe(
+    job_id="Show one job's pending and failed servers",
+    retry="Retry the failed servers of job_id"
+)
+async def banjobs(interaction: discord.Interaction, job_id: Optional[str] = None, retry: bool = False):
+    await interaction.response.defer(ephemeral=True)
+    retried = []
+    if retry and job_id:
+        retried.append(await ban_jobs.retry_failed(job_id))
+    summaries = [job.summary() for job in ban_jobs.jobs.values()]
+    unreachable = 0
+    if shard_ipc is not None and shard_ipc.peers:
+        payload = {"retry": job_id} if retry and job_id else {}
+        for _, reply, error in await shard_ipc.broadcast("ban_jobs", payload, timeout=10):
+            if error is None:
+                summaries.extend(reply["jobs"])
+                retried.append(reply["retry"])
+            else:
+                unreachable += 1
+    jobs = _merge_job_summaries(summaries)
+    if job_id:
+        job = next((s for s in jobs if s["id"] == job_id), None)
+        if job is None:
+            await interaction.followup.send(f"No ban job `{job_id}`.", ephemeral=True)
+            return
+        lines = [_job_line(job)]
+        if retry:
+            lines.append(_retry_message(retried))
+        lines += [f"pending: {name} ({guild_id})" for guild_id, name in job["pending"]]
+        lines += [f"failed: {name} ({guild_id}): {error}" for guild_id, name, error in job["failed"]]
+    else:
+        # Unfinished jobs and finished ones with failures; clean finished jobs are noise here.
+        shown = [s for s in jobs if not s["finished_at"] or s["failed"]][:15]
+        lines = [_job_line(s) for s in shown] or ["No ban jobs pending or failed."]
+    if unreachable:
+        lines.append(f"{unreachable} shard process(es) did not answer; their guilds are not included.")
+    text = "\n".join(lines)
+    if len(text) > 1900:
+        text = text[:1900].rsplit("\n", 1)[0] + "\n…"
+    await interaction.followup.send(text, ephemeral=True)
+
 # Slash Command: Report User
 @bot.tree.command(name="reportuser", description="Report a user. Specify the user, reason, and location of the incident.")
 async def reportuser(interaction: discord.Interaction, user: discord.User, reason: str, location: str):
@@ -602,9 +1028,7 @@ async def reportuser(interaction: discord.Interaction, user: discord.User, reaso
         f"**Location:** {location}\n"
         f"**Reason:** {reason}"
     )
-    async with aiohttp.ClientSession() as session:
-        webhook = discord.Webhook.from_url(REPORT_WEBHOOK_URL, session=session)
-        await webhook.send(content=report_message)
+    webhooks.enqueue(REPORT_WEBHOOK_URL, content=report_message)
     if not interaction.response.is_done():
         await interaction.response.send_message("Your report has been submitted. Moderators or administrators will review your report and may contact you for further details.", ephemeral=True)
     else:
@@ -616,12 +1040,37 @@ async def sync_here(interaction: discord.Interaction):
     await interaction.response.defer(ephemeral=True)
     await bot.tree.sync(guild=interaction.guild)
     await interaction.followup.send("Commands synced for this guild.", ephemeral=True)
-    
+
+# Slash Command: Metrics
+@bot.tree.command(name="metrics", description="Show command, storage and REST latency metrics. (Admin only)")
+@discord.app_commands.checks.has_permissions(administrator=True)
+async def metrics_summary(interaction: discord.Interaction):
+    if not metrics.enabled:
+        await interaction.response.send_message("Metrics are disabled (METRICS_ENABLED=false).", ephemeral=True)
+        return
+    storage = repo.stats()
+    writes = user_writes.stats()
+    pipeline = joins.stats()
+    lines = metrics.summary(top=15) or ["No samples recorded yet."]
+    lines.append("")
+    lines.append(f"storage: queue {storage['queue_depth']}/{storage['workers']} workers, "
+                 f"avg wait {storage['avg_wait_ms']:.2f}ms, max wait {storage['max_wait_ms']:.2f}ms")
+    lines.append(f"user writes: queue {writes['queue_depth']}, avg wait {writes['avg_wait_ms']:.2f}ms, "
+                 f"max wait {writes['max_wait_ms']:.2f}ms")
+    lines.append(f"joins: queue {pipeline['queue_depth']}, avg decision {pipeline['avg_decision_ms']:.2f}ms")
+    lines.append(f"webhooks: {webhooks.sent} sent, {webhooks.failed} failed, "
+                 f"{sum(webhooks.queue_depths().values())} queued")
+    text = "\n".join(lines)
+    if len(text) > 1900:
+        text = text[:1900].rsplit("\n", 1)[0] + "\n…"
+    await interaction.response.send_message(f"```\n{text}\n```", ephemeral=True)
+
 # Slash Command: Local Kick
 @bot.tree.command(name="localkick", description="Kick a user from this server. Reason required; reply with evidence screenshots.")
 async def localkick(interaction: discord.Interaction, user: discord.Member, reason: str):
     try:
-        await interaction.guild.kick(user, reason=reason)
+        with metrics.timer("rest_call_seconds", call="kick"):
+            await interaction.guild.kick(user, reason=reason)
         loc = f"{interaction.guild.name} - {interaction.channel.mention}"
         webhook_message = (
             f"**Local Kick executed for <@{user.id}> (ID: {user.id}) in {interaction.guild.name}.**\n"
@@ -629,9 +1078,7 @@ async def localkick(interaction: discord.Interaction, user: discord.Member, reas
             f"**Location:** {loc}\n\n"
             "Please reply with screenshots of evidence supporting this kick."
         )
-        async with aiohttp.ClientSession() as session:
-            webhook = discord.Webhook.from_url(LK_WEBHOOK_URL, session=session)
-            await webhook.send(content=webhook_message)
+        webhooks.enqueue(LK_WEBHOOK_URL, content=webhook_message)
         if not interaction.response.is_done():
             await interaction.response.send_message(f"Locally kicked <@{user.id}> from {interaction.guild.name}.", ephemeral=True)
         else:
@@ -643,7 +1090,8 @@ async def localkick(interaction: discord.Interaction, user: discord.Member, reas
 @bot.tree.command(name="localban", description="Ban a user from this server. Reason required; reply with evidence screenshots.")
 async def localban(interaction: discord.Interaction, user: discord.Member, reason: str):
     try:
-        await interaction.guild.ban(user, reason=reason)
+        with metrics.timer("rest_call_seconds", call="ban"):
+            await interaction.guild.ban(user, reason=reason)
         loc = f"{interaction.guild.name} - {interaction.channel.mention}"
         webhook_message = (
             f"**Local Ban executed for <@{user.id}> (ID: {user.id}) in {interaction.guild.name}.**\n"
@@ -651,9 +1099,7 @@ async def localban(interaction: discord.Interaction, user: discord.Member, reaso
             f"**Location:** {loc}\n\n"
             "Please reply with screenshots of evidence supporting this ban."
         )
-        async with aiohttp.ClientSession() as session:
-            webhook = discord.Webhook.from_url(LB_WEBHOOK_URL, session=session)
-            await webhook.send(content=webhook_message)
+        webhooks.enqueue(LB_WEBHOOK_URL, content=webhook_message)
         if not interaction.response.is_done():
             await interaction.response.send_message(f"Locally banned <@{user.id}> from {interaction.guild.name}.", ephemeral=True)
         else:
@@ -662,121 +1108,179 @@ async def localban(interaction: discord.Interaction, user: discord.Member, reaso
         await interaction.response.send_message(f"Error banning user: {e}", ephemeral=True)
 
 
+SEARCH_PAGE_SIZE = 10
+
+USER_ROW_COLUMNS = ["User_ID", "User_Name", "Account_Age", "Global_Banned"]
+
+def _search_users(cursor, query: str, page: int) -> Tuple[List[Dict[str, Any]], int]:
+    def fetch(user_id: str) -> Optional[Dict[str, Any]]:
+        cursor.execute(f"SELECT {', '.join(USER_ROW_COLUMNS)} FROM Users WHERE User_ID = %s", (user_id,))
+        row = cursor.fetchone()
+        return dict(zip(USER_ROW_COLUMNS, row)) if row else None
+
+    if query.isdigit():
+        row = fetch(query)
+        return ([row] if row and page == 1 else []), (1 if row else 0)
+    user_ids, total = user_search.search(query, limit=SEARCH_PAGE_SIZE, offset=(page - 1) * SEARCH_PAGE_SIZE)
+    return [row for row in map(fetch, user_ids) if row], total
+
 @bot.tree.command(
     name="searchuser",
     description="Search users.csv by ID or username (global roles only)."
 )
 @discord.app_commands.describe(
-    query="Discord ID or username"
+    query="Discord ID or username (prefixes and close spellings also match)",
+    page="Results page (10 per page)"
 )
-async def searchuser(interaction: discord.Interaction, query: str):
+async def searchuser(interaction: discord.Interaction, query: str, page: int = 1):
     await interaction.response.defer(ephemeral=True)
     try:
-        conn = db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT Global_1, Global_2, Global_3 FROM servers WHERE Guild_ID = %s",
-            (interaction.guild.id,)
-        )
-        allowed_roles = [
-            int(r) for r in cur.fetchone() if r and str(r).upper() != "NULL"
-        ]
-        cur.close()
-        conn.close()
+        allowed_roles = (await guild_configs.get(interaction.guild.id)).global_roles
     except Exception:
         return await interaction.followup.send(
             "Internal error resolving roles.", ephemeral=True
         )
-    if not any(r in [role.id for role in interaction.user.roles] for r in allowed_roles):
+    if allowed_roles.isdisjoint(role.id for role in interaction.user.roles):
         return await interaction.followup.send(
             "Access Denied: You do not have permission to use this command.",
             ephemeral=True,
         )
-    matches = []
+    page = max(page, 1)
     try:
-        with open(USERS_CSV, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if query.isdigit() and row["User_ID"] == query:
-                    matches.append(row)
-                elif not query.isdigit():
-                    q_lower = query.lower()
-                    stored = row["User_Name"].lower()
-                    if ("#" in q_lower and stored == q_lower) or (stored.split("#")[0] == q_lower):
-                        matches.append(row)
+        matches, total = await repo.transaction(_search_users, query, page)
     except Exception:
         return await interaction.followup.send(
             "Internal error reading database.", ephemeral=True
         )
     if not matches:
         return await interaction.followup.send(
-            "No matching users found.", ephemeral=True
+            "No matching users found." if total == 0 else f"No results on page {page}.", ephemeral=True
         )
     lines = [
         f"User_ID: {r['User_ID']} | User_Name: {r['User_Name']} | "
         f"Account_Age: {r['Account_Age']} | Global_Banned: {r['Global_Banned']}"
-        for r in matches[:10]
+        for r in matches
     ]
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    lines.append(f"Page {page} of {pages} ({total} match{'es' if total != 1 else ''})")
     await interaction.followup.send("\n".join(lines), ephemeral=True)
 
 
 
 # Slash Command: Purge
 @bot.tree.command(name="purge", description="Delete messages and log them.")
+@discord.app_commands.describe(
+    channel="Channel to purge",
+    limit=f"Maximum number of messages to delete (up to {PURGE_MAX_MESSAGES})",
+    author="Only delete messages from this user",
+    contains="Only delete messages matching this pattern (regular expression, case-insensitive)",
+    newer_than_hours="Only delete messages sent within the last N hours",
+    older_than_hours="Only delete messages sent more than N hours ago",
+)
 @discord.app_commands.checks.has_permissions(manage_messages=True)
-async def purge(interaction: discord.Interaction, channel: discord.TextChannel, limit: int):
-    if limit <= 0 or limit > 1000:
-        await interaction.response.send_message("Please specify a limit between 1 and 1000.", ephemeral=True)
+async def purge(interaction: discord.Interaction, channel: discord.TextChannel, limit: int,
+                author: Optional[discord.User] = None, contains: Optional[str] = None,
+                newer_than_hours: Optional[float] = None, older_than_hours: Optional[float] = None):
+    if limit <= 0 or limit > PURGE_MAX_MESSAGES:
+        await interaction.response.send_message(f"Please specify a limit between 1 and {PURGE_MAX_MESSAGES}.", ephemeral=True)
         return
-    await interaction.response.send_message(f"Purging {limit} messages from {channel.mention}.", ephemeral=True)
-    deleted_messages = await channel.purge(limit=limit)
-    log_filename = f"purged_messages_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    with open(log_filename, mode="w", encoding="utf-8", newline="") as csvfile:
-        csvwriter = csv.writer(csvfile)
-        csvwriter.writerow(["Timestamp", "Author", "Author ID", "Content"])
-        for message in deleted_messages:
-            csvwriter.writerow([
-                message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                f"{message.author}",
-                message.author.id,
-                message.content.replace("\n", "\\n")
-            ])
-    if PURGE_WEBHOOK_URL:
-        try:
-            async with aiohttp.ClientSession() as session:
-                with open(log_filename, "rb") as log_file:
-                    data = aiohttp.FormData()
-                    data.add_field("content", f"Purged {len(deleted_messages)} messages from {channel.mention}. Log file attached:")
-                    data.add_field("file", log_file, filename=log_filename, content_type="text/csv")
-                    async with session.post(PURGE_WEBHOOK_URL, data=data) as response:
-                        if response.status not in [200, 204]:
-                            response_text = await response.text()
-                            print(f"Failed to send log file to the purge webhook: {response.status} {response_text}")
-        except Exception as e:
-            print(f"Error sending log file to the purge webhook: {e}")
-    else:
+    try:
+        pattern = compile_pattern(contains)
+    except ValueError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
+        return
+    now = datetime.now(UTC)
+    purge_filter = PurgeFilter(
+        author_id=author.id if author else None,
+        after=now - timedelta(hours=newer_than_hours) if newer_than_hours else None,
+        before=now - timedelta(hours=older_than_hours) if older_than_hours else None,
+        pattern=pattern,
+    )
+    await interaction.response.send_message(f"Purging up to {limit} messages from {channel.mention}.", ephemeral=True)
+
+    def send_log(part, content: str):
+        if PURGE_WEBHOOK_URL:
+            webhooks.enqueue(PURGE_WEBHOOK_URL, content=content, files=[part])
+
+    archive = PurgeArchive(
+        f"purged_messages_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        compress=PURGE_LOG_GZIP,
+        max_part_bytes=PURGE_ATTACHMENT_BYTES,
+        # Full parts go out while the purge is still running.
+        on_part=lambda part: send_log(part, f"Purge of {channel.mention} in progress. Log file attached:"),
+    )
+
+    async def report(stats):
+        await interaction.edit_original_response(
+            content=f"Purging {channel.mention}: {stats.deleted} deleted, {stats.scanned} scanned "
+                    f"({stats.seconds:.0f}s)."
+        )
+
+    engine = PurgeEngine(
+        channel, limit, purge_filter, archive,
+        scan_limit=PURGE_SCAN_LIMIT,
+        single_delete_rate=PURGE_SINGLE_DELETE_RATE,
+        on_progress=report,
+    )
+    stats = await engine.run()
+    summary = (
+        f"Purged {stats.deleted} messages from {channel.mention} "
+        f"({stats.bulk_deleted} bulk, {stats.single_deleted} individually, {stats.failed} failed; "
+        f"{stats.scanned} scanned in {stats.seconds:.0f}s)."
+    )
+    for part in archive.finish():
+        send_log(part, f"{summary} Log file attached:")
+    if not PURGE_WEBHOOK_URL:
         print("Purge webhook URL not set. Log file was not sent.")
-    os.remove(log_filename)
+    try:
+        await interaction.edit_original_response(content=summary)
+    except Exception as e:
+        print("Error updating purge status:", e)
 
 # Slash Command: Avatar Update (Optional)
 @bot.event
 async def on_user_update(before: discord.User, after: discord.User):
     if before.avatar != after.avatar:
-        new_avatar_url = after.avatar.url if after.avatar else None
-        message = f"<@{after.id}> changed their profile picture."
-        embed = discord.Embed(description=message)
-        if new_avatar_url:
-            embed.set_image(url=new_avatar_url)
-        async with aiohttp.ClientSession() as session:
-            await session.post(AVATAR_WEBHOOK_URL, json={"content": message, "embeds": [embed.to_dict()]})
-# ── auto-sync slash commands ─────────────────────────────────────────────
-@bot.event
-async def on_ready():
-    await bot.tree.sync()                      # update global schema
-    for g in bot.guilds:                       # push to every guild
-        await bot.tree.sync(guild=g)
-    print(f"✅ Slash-command sync complete in {len(bot.guilds)} guild(s).")
-# ─────────────────────────────────────────────────────────────────────────
+        avatars.changed(after.id, after.avatar.url if after.avatar else None)
+
+# Startup Reconciliation
+async def reconcile_guild(guild: discord.Guild):
+    started = time.perf_counter()
+    reconcile_started = datetime.now(UTC)
+    try:
+        await register_server(guild)
+    except Exception as e:
+        print("Error auto-registering server:", e)
+    try:
+        config = await guild_configs.get(guild.id)
+        if not (config and config.setup):
+            print(f"Server {guild.name} is not set up; not adding members to Users table.")
+            return
+        members = guild.members
+        digest = member_digest(m.id for m in members)
+        last_reconciled = checkpoints.reconciled_at(guild.id)
+        if checkpoints.digest(guild.id) == digest:
+            outcome = "membership unchanged"
+        else:
+            if last_reconciled is not None:
+                # Only members who joined while the bot was offline can be missing.
+                members = [m for m in members if m.joined_at is None or m.joined_at >= last_reconciled]
+            stats = await add_members_to_users(members)
+            if stats["error"] is not None:
+                # No checkpoint, so the next start retries these members.
+                print(f"Guild {guild.name} not reconciled: {stats['error']}")
+                return
+            outcome = f"{stats['inserted']} added from {len(members)} candidate(s)"
+        checkpoints.set(guild.id, digest, len(guild.members), reconcile_started)
+        print(f"Guild {guild.name} ready in {time.perf_counter() - started:.3f}s ({outcome}).")
+    except Exception as e:
+        print(f"Error reconciling members for guild {guild.name}:", e)
+
+if SHARD_COUNT:
+    @bot.event
+    async def on_shard_ready(shard_id: int):
+        print(f"Shard {shard_id} ready ({SHARD_LABEL} of {bot.shard_count} in this process).")
+
 # On Ready
 @bot.event
 async def on_ready():
@@ -786,26 +1290,25 @@ async def on_ready():
         print("Slash commands synced.")
     except Exception as e:
         print("Error syncing slash commands:", e)
-    for guild in bot.guilds:
-        print(f"Checking members in guild: {guild.name}")
-        try:
-            await register_server(guild)
-        except Exception as e:
-            print("Error auto-registering server:", e)
-        try:
-            connection = db_connection()
-            cursor = connection.cursor()
-            query = "SELECT setup FROM servers WHERE Guild_ID = %s"
-            cursor.execute(query, (guild.id,))
-            result = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            if result and _is_truthy(result[0]):
-                for member in guild.members:
-                    await add_member_to_users(member)
-            else:
-                print(f"Server {guild.name} is not set up; not adding members to Users table.")
-        except Exception as e:
-            print(f"Error checking setup for guild {guild.name}:", e)
+    # Guild objects exist now, so bans interrupted by the last shutdown can continue.
+    ban_jobs.resume()
+    started = time.perf_counter()
+    await asyncio.gather(*(reconcile_guild(guild) for guild in bot.guilds))
+    try:
+        await repo.run(checkpoints.save)
+    except Exception as e:
+        print("Error saving reconcile checkpoints:", e)
+    print(f"Reconciled {len(bot.guilds)} guild(s) in {time.perf_counter() - started:.3f}s.")
 
-bot.run(BOT_TOKEN)
\ No newline at end of file
+if __name__ == "__main__":
+    bot.run(BOT_TOKEN)
+    user_writes.close()
+    repo.close()
+    snapshots.close()
+    if database is not None:
+        database.close()
+    else:
+        servers_table.close()
+        _users().close()
+        if users_index is not None:
+            users_index.close()
\ No newline at end of file
@@ -0,0 +1,174 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+
+from tracing import tracer
+
+# Bucket upper bounds in seconds, from 100us to 30s.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, interpolating linearly inside the one that holds the quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "started", "span")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: LabelKey):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        # Timed blocks double as trace spans when an interaction is being traced.
+        self.span = tracer.span(self.name.removesuffix("_seconds"), dict(self.labels) if self.labels else None)
+        self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        status = ("status", "error" if exc_type else "ok")
+        self.metrics._observe(self.name, tuple(sorted(self.labels + (status,))), elapsed)
+        self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class Metrics:
+    """Latency histograms keyed by metric name and labels, plus gauges read at scrape time.
+
+    With enabled=False, observe() returns immediately and timer() only opens
+    a trace span, which is itself a no-op outside a traced interaction.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        if self.enabled:
+            self._observe(name, tuple(sorted(labels.items())), seconds)
+
+    def _observe(self, name: str, labels: LabelKey, seconds: float):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name: str, **labels: str):
+        """`with metrics.timer("x_seconds", op="y"):` records the block's duration, labelled status="ok" or status="error" if it raises."""
+        if not self.enabled:
+            return tracer.span(name.removesuffix("_seconds"), labels or None)
+        return _Timer(self, name, tuple(sorted(labels.items())))
+
+    def gauge(self, name: str, read: Callable[[], float]):
+        self._gauges[name] = read
+
+    def _snapshot(self) -> List[Tuple[str, LabelKey, Histogram]]:
+        with self._lock:
+            snapshot = []
+            for name, series in sorted(self._histograms.items()):
+                for labels, h in sorted(series.items()):
+                    copy = Histogram()
+                    copy.counts, copy.total, copy.count = list(h.counts), h.total, h.count
+                    snapshot.append((name, labels, copy))
+            return snapshot
+
+    def render_prometheus(self) -> str:
+        lines = []
+        current = None
+        for name, labels, h in self._snapshot():
+            if name != current:
+                lines.append(f"# TYPE {name} histogram")
+                current = name
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), h.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {h.total}")
+            lines.append(f"{name}_count{_labels(labels)} {h.count}")
+        for name, read in sorted(self._gauges.items()):
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top: int = 20) -> List[str]:
+        """One line per series, busiest first: count, estimated p50 and p99, and mean."""
+        rows = sorted(self._snapshot(), key=lambda s: s[2].count, reverse=True)[:top]
+        return [
+            f"{name}{_labels(labels)}  n={h.count}  p50={h.quantile(0.5) * 1000:.2f}ms  "
+            f"p99={h.quantile(0.99) * 1000:.2f}ms  avg={h.total / h.count * 1000:.2f}ms"
+            for name, labels, h in rows
+        ]
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+async def serve(registry: Metrics, host: str, port: int):
+    """Serve GET /metrics in Prometheus text format; returns the aiohttp runner (call .cleanup() to stop)."""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(text=registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[metrics] Serving http://{host}:{port}/metrics")
+    return runner
+
+
+# Process-wide registry; main.py sets enabled from METRICS_ENABLED.
+metrics = Metrics()
@@ -0,0 +1,106 @@
+import csv
+import gzip
+import io
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+HEADER = ["Timestamp", "Author", "Author ID", "Content"]
+
+Attachment = Tuple[str, bytes, str]  # (filename, data, content type)
+
+
+class PurgeArchive:
+    """CSV log of purged messages built in memory, cut into attachments of at most max_part_bytes.
+
+    Rows are encoded (and gzip-compressed if asked) as they are added, so
+    only the finished parts are held, never a second copy of the log.
+    Every part is a complete CSV with its own header row. With on_part,
+    each full part is handed over as soon as it closes instead of being kept.
+    """
+
+    def __init__(self, basename: str, compress: bool = False, max_part_bytes: int = 8 * 1024 * 1024,
+                 on_part: Optional[Callable[[Attachment], None]] = None):
+        self.basename = basename
+        self.compress = compress
+        self.max_part_bytes = max_part_bytes
+        self.on_part = on_part
+        self.rows = 0
+        self._parts: List[Attachment] = []
+        self._part_count = 0
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line)
+        self._buffer: Optional[io.BytesIO] = None
+        self._gzip: Optional[gzip.GzipFile] = None
+        self._unflushed = 0
+        self._part_rows = 0
+
+    def add(self, message):
+        self._write_row([
+            message.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            f"{message.author}",
+            message.author.id,
+            message.content.replace("\n", "\\n"),
+        ])
+        self.rows += 1
+
+    def _encode(self, row) -> bytes:
+        self._line.seek(0)
+        self._line.truncate()
+        self._writer.writerow(row)
+        return self._line.getvalue().encode("utf-8")
+
+    def _write_row(self, row):
+        data = self._encode(row)
+        if self._buffer is None:
+            self._open_part()
+        elif self._part_rows and self._size(pending=len(data)) > self.max_part_bytes:
+            if self._gzip is not None and self._unflushed:
+                # The compressor holds back output; flush it to get the real size before splitting.
+                self._gzip.flush(zlib.Z_SYNC_FLUSH)
+                self._unflushed = 0
+            if self._size(pending=len(data)) > self.max_part_bytes:
+                self._close_part()
+                self._open_part()
+        self._write(data)
+        self._part_rows += 1
+
+    def _size(self, pending: int) -> int:
+        # Upper bound for gzip: assume unflushed input doesn't compress at all.
+        return self._buffer.getbuffer().nbytes + self._unflushed + pending + (32 if self._gzip else 0)
+
+    def _write(self, data: bytes):
+        if self._gzip is not None:
+            self._gzip.write(data)
+            self._unflushed += len(data)
+        else:
+            self._buffer.write(data)
+
+    def _open_part(self):
+        self._buffer = io.BytesIO()
+        self._gzip = gzip.GzipFile(fileobj=self._buffer, mode="wb") if self.compress else None
+        self._unflushed = 0
+        self._part_rows = 0
+        self._write(self._encode(HEADER))
+
+    def _close_part(self, last: bool = False):
+        if self._gzip is not None:
+            self._gzip.close()
+        self._part_count += 1
+        extension, content_type = (".csv.gz", "application/gzip") if self.compress else (".csv", "text/csv")
+        name = self.basename if last and self._part_count == 1 else f"{self.basename}_part{self._part_count}"
+        part = (name + extension, self._buffer.getvalue(), content_type)
+        self._buffer = None
+        self._gzip = None
+        if self.on_part is not None and not last:
+            self.on_part(part)
+        else:
+            self._parts.append(part)
+
+    def finish(self) -> List[Attachment]:
+        """Close the current part and return the attachments not yet handed to on_part."""
+        if self._buffer is None and not self._part_count:
+            self._open_part()
+        if self._buffer is not None:
+            self._close_part(last=True)
+        parts, self._parts = self._parts, []
+        return parts
@@ -0,0 +1,157 @@
+import re
+import time
+from datetime import datetime, timedelta, UTC
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Pattern
+
+import discord
+
+from fanout import RateLimiter
+from metrics import metrics
+from purge_archive import PurgeArchive
+
+# Bulk delete only accepts messages younger than 14 days; keep a margin for the time the request takes.
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5)
+BULK_DELETE_SIZE = 100
+
+
+class PurgeFilter(NamedTuple):
+    author_id: Optional[int] = None
+    after: Optional[datetime] = None
+    before: Optional[datetime] = None
+    pattern: Optional[Pattern] = None
+
+    @property
+    def narrows(self) -> bool:
+        """True if some messages in the scanned range may not match, so more must be scanned than deleted."""
+        return self.author_id is not None or self.pattern is not None
+
+    def matches(self, message) -> bool:
+        if self.author_id is not None and message.author.id != self.author_id:
+            return False
+        if self.pattern is not None and not self.pattern.search(message.content or ""):
+            return False
+        return True
+
+
+def compile_pattern(text: Optional[str]) -> Optional[Pattern]:
+    """Case-insensitive regex; raises ValueError with a readable message if it doesn't compile."""
+    if not text:
+        return None
+    try:
+        return re.compile(text, re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid pattern: {e}") from None
+
+
+class PurgeStats(NamedTuple):
+    scanned: int
+    matched: int
+    bulk_deleted: int
+    single_deleted: int
+    failed: int
+    seconds: float
+
+    @property
+    def deleted(self) -> int:
+        return self.bulk_deleted + self.single_deleted
+
+
+class PurgeEngine:
+    """Deletes up to `limit` matching messages from a channel, streaming its history.
+
+    Recent messages are bulk-deleted 100 at a time; anything past the bulk
+    delete age goes through single deletes at `single_delete_rate` per
+    second. Each deleted message is written to the archive straight away,
+    and on_progress is awaited every `progress_every` seconds.
+    """
+
+    def __init__(self, channel, limit: int, purge_filter: PurgeFilter, archive: PurgeArchive,
+                 scan_limit: Optional[int] = None, single_delete_rate: float = 1.0,
+                 on_progress: Optional[Callable[[PurgeStats], Awaitable[None]]] = None,
+                 progress_every: float = 5.0):
+        self.channel = channel
+        self.limit = limit
+        self.filter = purge_filter
+        self.archive = archive
+        self.scan_limit = scan_limit
+        self.single_limiter = RateLimiter(single_delete_rate, burst=1)
+        self.on_progress = on_progress
+        self.progress_every = progress_every
+        self._started = 0.0
+        self._last_progress = 0.0
+        self.scanned = 0
+        self.matched = 0
+        self.bulk_deleted = 0
+        self.single_deleted = 0
+        self.failed = 0
+
+    def stats(self) -> PurgeStats:
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        return PurgeStats(self.scanned, self.matched, self.bulk_deleted, self.single_deleted, self.failed, elapsed)
+
+    async def run(self) -> PurgeStats:
+        self._started = self._last_progress = time.monotonic()
+        history_limit = self.scan_limit if self.filter.narrows else min(self.limit, self.scan_limit or self.limit)
+        bulk_cutoff = datetime.now(UTC) - BULK_DELETE_MAX_AGE
+        batch: List = []
+        history = self.channel.history(
+            limit=history_limit, before=self.filter.before, after=self.filter.after, oldest_first=False
+        )
+        async for message in history:
+            self.scanned += 1
+            if self.filter.matches(message):
+                self.matched += 1
+                if message.created_at >= bulk_cutoff:
+                    batch.append(message)
+                    if len(batch) == BULK_DELETE_SIZE:
+                        await self._bulk_delete(batch)
+                        batch = []
+                else:
+                    # History is newest first, so everything from here on is past the bulk window.
+                    if batch:
+                        await self._bulk_delete(batch)
+                        batch = []
+                    await self._single_delete(message)
+            await self._maybe_report()
+            if self.matched >= self.limit:
+                break
+        if batch:
+            await self._bulk_delete(batch)
+        return self.stats()
+
+    async def _bulk_delete(self, batch: List):
+        try:
+            with metrics.timer("rest_call_seconds", call="bulk_delete"):
+                await self.channel.delete_messages(batch)
+        except discord.HTTPException as e:
+            print(f"Bulk delete of {len(batch)} messages in {self.channel} failed ({e}); retrying one by one.")
+            for message in batch:
+                await self._single_delete(message)
+            return
+        self.bulk_deleted += len(batch)
+        for message in batch:
+            self.archive.add(message)
+
+    async def _single_delete(self, message):
+        await self.single_limiter.acquire()
+        try:
+            with metrics.timer("rest_call_seconds", call="delete_message"):
+                await message.delete()
+        except discord.NotFound:
+            return
+        except discord.HTTPException as e:
+            self.failed += 1
+            print(f"Failed to delete message {message.id} in {self.channel}: {e}")
+            return
+        self.single_deleted += 1
+        self.archive.add(message)
+
+    async def _maybe_report(self):
+        now = time.monotonic()
+        if self.on_progress is None or now - self._last_progress < self.progress_every:
+            return
+        self._last_progress = now
+        try:
+            await self.on_progress(self.stats())
+        except Exception as e:
+            print(f"Purge progress update failed: {e}")
@@ -0,0 +1,52 @@
+import hashlib
+import json
+import os
+import threading
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+
+def member_digest(member_ids: Iterable[int]) -> str:
+    ids = array("Q", sorted(member_ids))
+    return hashlib.sha256(ids.tobytes()).hexdigest()
+
+
+class ReconcileCheckpoints:
+    """Per-guild member-ID digest and last reconcile time, persisted as JSON between restarts."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: Dict[str, dict] = {}
+        if path.exists():
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"[reconcile] Ignoring unreadable checkpoint file: {e}")
+
+    def digest(self, guild_id: int) -> Optional[str]:
+        entry = self._state.get(str(guild_id))
+        return entry["digest"] if entry else None
+
+    def reconciled_at(self, guild_id: int) -> Optional[datetime]:
+        entry = self._state.get(str(guild_id))
+        return datetime.fromisoformat(entry["reconciled_at"]) if entry else None
+
+    def set(self, guild_id: int, digest: str, member_count: int, reconciled_at: datetime):
+        with self._lock:
+            self._state[str(guild_id)] = {
+                "digest": digest,
+                "member_count": member_count,
+                "reconciled_at": reconciled_at.isoformat(),
+            }
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._state, indent=2)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
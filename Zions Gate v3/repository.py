@@ -0,0 +1,148 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, ContextManager, Dict, Optional, Sequence
+
+
+class AsyncRepository:
+    """Awaitable storage access. Every call runs on a bounded thread pool, never on the event loop.
+
+    connect is the backend's db_connection(); each call opens a connection,
+    runs, commits and closes it on a worker thread. instrument(op), if given,
+    returns a context manager wrapped around each call on its worker (op is
+    "fetchone", "execute", the transaction function's name, ...). Calls run
+    in a copy of the caller's context, so context variables carry over.
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_workers: int = 4, saturation_warn_after: float = 10.0,
+                 instrument: Optional[Callable[[str], ContextManager]] = None):
+        self._connect = connect
+        self._instrument = instrument
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._max_pending = 0
+        self._calls = 0
+        self._errors = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+        self._saturation_warn_after = saturation_warn_after
+        self._last_saturation_warning = 0.0
+
+    async def run(self, fn: Callable[..., Any], *args, op: Optional[str] = None) -> Any:
+        """Run a blocking storage function on the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        with self._stats_lock:
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+            saturated = self._pending > self.max_workers
+        if saturated and submitted - self._last_saturation_warning >= self._saturation_warn_after:
+            self._last_saturation_warning = submitted
+            print(f"[storage] Pool saturated: {self._pending} calls queued for {self.max_workers} workers.")
+
+        def job():
+            started = time.perf_counter()
+            failed = False
+            try:
+                if self._instrument is None:
+                    return fn(*args)
+                with self._instrument(op or getattr(fn, "__name__", "call").lstrip("_")):
+                    return fn(*args)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                finished = time.perf_counter()
+                self._record(started - submitted, finished - started, failed)
+
+        try:
+            return await loop.run_in_executor(self._executor, contextvars.copy_context().run, job)
+        finally:
+            with self._stats_lock:
+                self._pending -= 1
+
+    def _record(self, waited: float, ran: float, failed: bool):
+        with self._stats_lock:
+            self._calls += 1
+            self._errors += failed
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._run_total += ran
+            self._run_max = max(self._run_max, ran)
+
+    def _call(self, fn: Callable[[Any], Any]) -> Any:
+        connection = self._connect()
+        try:
+            cursor = connection.cursor()
+            try:
+                result = fn(cursor)
+                connection.commit()
+                return result
+            finally:
+                cursor.close()
+        finally:
+            connection.close()
+
+    def _fetchone(self, query: str, params: Sequence[Any]):
+        def fn(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchone()
+        return self._call(fn)
+
+    def _fetchall(self, query: str, params: Sequence[Any]):
+        def fn(cursor):
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        return self._call(fn)
+
+    def _execute(self, query: str, params: Sequence[Any]) -> int:
+        def fn(cursor):
+            cursor.execute(query, params)
+            return cursor.rowcount
+        return self._call(fn)
+
+    def _executemany(self, query: str, seq_params) -> int:
+        def fn(cursor):
+            cursor.executemany(query, seq_params)
+            return cursor.rowcount
+        return self._call(fn)
+
+    async def transaction(self, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(cursor, *args) on one connection, commit, and always close it."""
+        return await self.run(self._call, lambda cursor: fn(cursor, *args), op=fn.__name__.lstrip("_"))
+
+    async def fetchone(self, query: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+        return await self.run(self._fetchone, query, params)
+
+    async def fetchall(self, query: str, params: Sequence[Any] = ()) -> list:
+        return await self.run(self._fetchall, query, params)
+
+    async def execute(self, query: str, params: Sequence[Any] = ()) -> int:
+        return await self.run(self._execute, query, params)
+
+    async def executemany(self, query: str, seq_params) -> int:
+        return await self.run(self._executemany, query, list(seq_params))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            calls = self._calls or 1
+            return {
+                "workers": self.max_workers,
+                "queue_depth": self._pending,
+                "max_queue_depth": self._max_pending,
+                "calls": self._calls,
+                "errors": self._errors,
+                "avg_wait_ms": self._wait_total / calls * 1000,
+                "max_wait_ms": self._wait_max * 1000,
+                "avg_run_ms": self._run_total / calls * 1000,
+                "max_run_ms": self._run_max * 1000,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,135 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+# Trigrams shared by more names than this are too common to narrow a fuzzy search.
+MAX_POSTING = 2_000
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _split(user_name: str) -> Tuple[str, str]:
+    full = user_name.lower()
+    return full, full.split("#")[0]
+
+
+class UserSearchIndex:
+    """In-memory index over User_Name: exact names, a sorted array for prefixes and trigrams for typos.
+
+    search() ranks exact full-name matches, then exact base-name matches
+    (the part before '#'), then prefix matches, then fuzzy matches by
+    trigram similarity.
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.3):
+        self.fuzzy_threshold = fuzzy_threshold
+        self._lock = threading.Lock()
+        self._by_full: Dict[str, Set[str]] = {}
+        self._by_base: Dict[str, Set[str]] = {}
+        self._sorted_bases: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_base)
+
+    def add(self, user_id: str, user_name: str):
+        self.add_many([(user_id, user_name)])
+
+    def add_many(self, entries: Iterable[Tuple[str, str]]):
+        with self._lock:
+            by_full, by_base, trigrams = self._by_full, self._by_base, self._trigrams
+            new_bases = []
+            for user_id, user_name in entries:
+                full, base = _split(user_name)
+                by_full.setdefault(full, set()).add(user_id)
+                ids = by_base.get(base)
+                if ids is None:
+                    ids = by_base[base] = set()
+                    new_bases.append(base)
+                    padded = f"  {base} "
+                    for i in range(len(padded) - 2):
+                        gram = padded[i:i + 3]
+                        posting = trigrams.get(gram)
+                        if posting is None:
+                            trigrams[gram] = {base}
+                        else:
+                            posting.add(base)
+                ids.add(user_id)
+            if len(new_bases) > 64:
+                self._sorted_bases.extend(new_bases)
+                self._sorted_bases.sort()
+            else:
+                for base in new_bases:
+                    insort(self._sorted_bases, base)
+
+    def add_in_background(self, entries: List[Tuple[str, str]], chunk_size: int = 10_000) -> threading.Thread:
+        """Index a large initial load without holding the lock for the whole build."""
+        def build():
+            started = time.perf_counter()
+            for i in range(0, len(entries), chunk_size):
+                self.add_many(entries[i:i + chunk_size])
+            print(f"[search] Indexed {len(entries)} user name(s) in {time.perf_counter() - started:.1f}s.")
+        thread = threading.Thread(target=build, name="search-index", daemon=True)
+        thread.start()
+        return thread
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Tuple[List[str], int]:
+        """Return (user IDs for the requested page, total match count)."""
+        full, base = _split(query.strip())
+        ranked: List[str] = []
+        seen: Set[str] = set()
+
+        def take(ids: Iterable[str]):
+            for user_id in sorted(ids):
+                if user_id not in seen:
+                    seen.add(user_id)
+                    ranked.append(user_id)
+
+        with self._lock:
+            if "#" in full:
+                take(self._by_full.get(full, ()))
+            if base:
+                take(self._by_base.get(base, ()))
+                for name in self._prefix(base):
+                    take(self._by_base[name])
+                for name in self._fuzzy(base):
+                    take(self._by_base[name])
+        return ranked[offset:offset + limit], len(ranked)
+
+    def _prefix(self, base: str, max_names: int = 500) -> List[str]:
+        names = []
+        i = bisect_left(self._sorted_bases, base)
+        while i < len(self._sorted_bases) and len(names) < max_names:
+            name = self._sorted_bases[i]
+            if not name.startswith(base):
+                break
+            if name != base:
+                names.append(name)
+            i += 1
+        # Shorter completions are closer to what was typed.
+        return sorted(names, key=lambda n: (len(n), n))
+
+    def _fuzzy(self, base: str, max_names: int = 50) -> List[str]:
+        grams = _trigrams(base)
+        postings = [self._trigrams[g] for g in grams if g in self._trigrams]
+        selective = [p for p in postings if len(p) <= MAX_POSTING]
+        if not selective and postings:
+            selective = [min(postings, key=len)]
+        counts = Counter()
+        for posting in selective:
+            counts.update(posting)
+        scored = []
+        for name, shared in counts.items():
+            if name == base or name.startswith(base):
+                continue
+            # A name of length n has at most n + 1 padded trigrams; close enough for ranking.
+            score = shared / (len(grams) + len(name) + 1 - shared)
+            if score >= self.fuzzy_threshold:
+                scored.append((-score, name))
+        scored.sort()
+        return [name for _, name in scored[:max_names]]
@@ -0,0 +1,233 @@
+"""Request/reply between the bot processes of one sharded deployment.
+
+Each process listens on its own port and dials its peers on first use.
+Messages are JSON lines; a connection starts with a hello carrying the
+shared secret, which must not be empty. broadcast() asks every peer at once and returns one entry
+per peer, with the error text in place of a result for a peer that is down
+or times out, so one missing process never fails the whole command.
+"""
+import asyncio
+import hmac
+import json
+from itertools import count
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import metrics
+
+Address = Tuple[str, int]
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+# Fan-out replies list every guild of a process; leave room for large ones.
+MAX_LINE = 16 * 1024 * 1024
+
+
+class IPCError(Exception):
+    pass
+
+
+def parse_peers(value: str) -> List[Address]:
+    """"127.0.0.1:7401,127.0.0.1:7402" -> [("127.0.0.1", 7401), ("127.0.0.1", 7402)]"""
+    peers = []
+    for item in value.split(","):
+        item = item.strip()
+        if item:
+            host, _, port = item.rpartition(":")
+            peers.append((host or "127.0.0.1", int(port)))
+    return peers
+
+
+def _line(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message, default=str) + "\n").encode("utf-8")
+
+
+class _Connection:
+    """One outgoing connection; replies are matched to requests by id."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, name: str):
+        self.reader = reader
+        self.writer = writer
+        self.name = name
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.write_lock = asyncio.Lock()
+        self.task = asyncio.create_task(self._read_replies())
+
+    @property
+    def closed(self) -> bool:
+        return self.task.done()
+
+    async def _read_replies(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                future = self.pending.pop(reply.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            print(f"[shard-ipc] Connection to {self.name} lost: {e}")
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(IPCError(f"connection to {self.name} closed"))
+            self.pending.clear()
+            self.writer.close()
+
+    async def close(self):
+        self.writer.close()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+
+class ShardIPC:
+    def __init__(self, name: str, host: str, port: int, peers: List[Address],
+                 secret: str, timeout: float = 120.0):
+        if not secret:
+            # An empty secret would let anything that can reach the port run a global ban.
+            raise ValueError("shard IPC needs a shared secret (SHARD_IPC_SECRET)")
+        self.name = name
+        self.host = host
+        self.port = port
+        self.peers = [p for p in peers if p != (host, port)]
+        self.secret = secret
+        self.timeout = timeout
+        self.handlers: Dict[str, Handler] = {}
+        # The event loop start() ran on, for callers on other threads.
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: set = set()
+        self._connections: Dict[Address, _Connection] = {}
+        self._connect_locks: Dict[Address, asyncio.Lock] = {}
+        self._ids = count(1)
+        self.served = 0
+        self.sent = 0
+        self.failed = 0
+
+    def register(self, op: str, handler: Handler):
+        self.handlers[op] = handler
+
+    # Serving
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if self.port:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port, limit=MAX_LINE)
+            print(f"[shard-ipc] {self.name} listening on {self.host}:{self.port}, {len(self.peers)} peer(s)")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        tasks = set()
+        write_lock = asyncio.Lock()
+        self._clients.add(writer)
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            if not hmac.compare_digest(str(hello.get("secret", "")), self.secret):
+                print(f"[shard-ipc] Rejected a connection from {hello.get('name', 'unknown')}: bad secret")
+                return
+            writer.write(_line({"name": self.name}))
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self._dispatch(json.loads(line), writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            print(f"[shard-ipc] Peer connection closed: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, message: Dict[str, Any], writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        handler = self.handlers.get(message.get("op"))
+        try:
+            if handler is None:
+                raise IPCError(f"unknown op {message.get('op')!r}")
+            reply = {"id": message.get("id"), "ok": True, "result": await handler(message.get("payload") or {})}
+        except Exception as e:
+            reply = {"id": message.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"}
+        self.served += 1
+        try:
+            async with write_lock:
+                writer.write(_line(reply))
+                await writer.drain()
+        except OSError as e:
+            print(f"[shard-ipc] Could not reply to {message.get('op')}: {e}")
+
+    # Requests
+    async def _connection(self, address: Address) -> _Connection:
+        connection = self._connections.get(address)
+        if connection is not None and not connection.closed:
+            return connection
+        async with self._connect_locks.setdefault(address, asyncio.Lock()):
+            connection = self._connections.get(address)
+            if connection is not None and not connection.closed:
+                return connection
+            reader, writer = await asyncio.open_connection(*address, limit=MAX_LINE)
+            writer.write(_line({"name": self.name, "secret": self.secret}))
+            await writer.drain()
+            hello = await reader.readline()
+            if not hello:
+                writer.close()
+                raise IPCError(f"{address[0]}:{address[1]} refused the connection (check SHARD_IPC_SECRET)")
+            name = json.loads(hello).get("name") or f"{address[0]}:{address[1]}"
+            connection = self._connections[address] = _Connection(reader, writer, name)
+            return connection
+
+    async def request(self, address: Address, op: str, payload: Dict[str, Any],
+                      timeout: Optional[float] = None) -> Any:
+        """Send one request and wait for its result; raises IPCError (or TimeoutError/OSError) on failure."""
+        with metrics.timer("ipc_request_seconds", op=op):
+            connection = await self._connection(address)
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            connection.pending[request_id] = future
+            try:
+                async with connection.write_lock:
+                    connection.writer.write(_line({"id": request_id, "op": op, "payload": payload}))
+                    await connection.writer.drain()
+                self.sent += 1
+                reply = await asyncio.wait_for(future, timeout or self.timeout)
+            finally:
+                connection.pending.pop(request_id, None)
+        if not reply.get("ok"):
+            raise IPCError(f"{connection.name}: {reply.get('error')}")
+        return reply.get("result")
+
+    async def broadcast(self, op: str, payload: Dict[str, Any],
+                        timeout: Optional[float] = None) -> List[Tuple[str, Any, Optional[str]]]:
+        """(peer, result, error) for every peer; error is None on success."""
+        async def one(address: Address):
+            label = f"{address[0]}:{address[1]}"
+            try:
+                return label, await self.request(address, op, payload, timeout), None
+            except Exception as e:
+                self.failed += 1
+                print(f"[shard-ipc] {op} on {label} failed: {type(e).__name__}: {e}")
+                return label, None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+
+        return list(await asyncio.gather(*(one(address) for address in self.peers)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "peers": len(self.peers),
+            "connected": sum(1 for c in self._connections.values() if not c.closed),
+            "sent": self.sent,
+            "served": self.served,
+            "failed": self.failed,
+        }
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # wait_closed() also waits for connections peers still hold open.
+            for writer in list(self._clients):
+                writer.close()
+            await self._server.wait_closed()
+        for connection in list(self._connections.values()):
+            await connection.close()
+        self._connections.clear()
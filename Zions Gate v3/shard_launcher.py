@@ -0,0 +1,92 @@
+"""Run the bot's shards across several local processes.
+
+    python shard_launcher.py --processes 2 [--shards 4] [--base-port 7400]
+
+Shards are dealt round-robin (process i runs shards i, i+P, ...). Every
+process gets the shard settings main.py reads, an IPC port of base-port + i
+with the others as peers, a shared random SHARD_IPC_SECRET unless one is
+set, and 1/P of REST_RATE_LIMIT since Discord's global limit is per token.
+Storage is shared through SQLite (STORAGE_BACKEND=sqlite, SQLITE_PATH).
+If one process exits, the others are stopped too.
+"""
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BOT_DIR = Path(__file__).resolve().parent
+
+
+def plan(processes: int, shards: int, base_port: int, host: str = "127.0.0.1",
+         environ: Dict[str, str] = os.environ) -> List[Dict[str, str]]:
+    """The environment overrides for each process."""
+    if processes < 1 or shards < processes:
+        raise ValueError("need at least one shard per process")
+    peers = ",".join(f"{host}:{base_port + i}" for i in range(processes))
+    secret = environ.get("SHARD_IPC_SECRET") or secrets.token_hex(16)
+    rate = float(environ.get("REST_RATE_LIMIT", "40")) / processes
+    metrics_port = int(environ.get("METRICS_PORT", "0"))
+    envs = []
+    for i in range(processes):
+        envs.append({
+            "SHARD_COUNT": str(shards),
+            "SHARD_IDS": ",".join(str(s) for s in range(i, shards, processes)),
+            "SHARD_IPC_HOST": host,
+            "SHARD_IPC_PORT": str(base_port + i),
+            "SHARD_IPC_PEERS": peers,
+            "SHARD_IPC_SECRET": secret,
+            "REST_RATE_LIMIT": str(rate),
+            "METRICS_PORT": str(metrics_port + i) if metrics_port else "0",
+            "STORAGE_BACKEND": "sqlite",
+        })
+    return envs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--shards", type=int, default=None, help="total shard count (default: one per process)")
+    parser.add_argument("--base-port", type=int, default=7400)
+    parser.add_argument("--host", default="127.0.0.1")
+    args = parser.parse_args()
+
+    if os.environ.get("STORAGE_BACKEND", "sqlite").strip().lower() != "sqlite":
+        sys.exit("Sharded processes share storage through SQLite; unset STORAGE_BACKEND or set it to sqlite.")
+    children = []
+    for i, overrides in enumerate(plan(args.processes, args.shards or args.processes, args.base_port, args.host)):
+        print(f"[launcher] Process {i}: shards {overrides['SHARD_IDS']} of {overrides['SHARD_COUNT']}, "
+              f"IPC port {overrides['SHARD_IPC_PORT']}")
+        children.append(subprocess.Popen([sys.executable, str(BOT_DIR / "main.py")], cwd=BOT_DIR,
+                                         env={**os.environ, **overrides}))
+
+    def stop(*_):
+        for child in children:
+            if child.poll() is None:
+                child.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    code = 0
+    try:
+        while all(child.poll() is None for child in children):
+            time.sleep(0.5)
+        exited = next(child for child in children if child.poll() is not None)
+        code = exited.returncode
+        print(f"[launcher] A shard process exited with code {code}; stopping the rest.")
+    finally:
+        stop()
+        for child in children:
+            try:
+                child.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                child.kill()
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
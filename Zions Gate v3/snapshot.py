@@ -0,0 +1,128 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from git import Repo
+
+from metrics import metrics
+
+
+def _blob_sha(path: Path) -> str:
+    """Same hash git uses for the file's blob, so it can be compared with HEAD."""
+    data = path.read_bytes() if path.exists() else b""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class SnapshotPublisher:
+    """Coalesces CSV changes and publishes them as a moving git snapshot commit.
+
+    mark_dirty() is cheap and safe to call from the event loop. The git work
+    (add, commit --amend, force-push) runs on a worker thread once window
+    seconds have passed since the first unpublished change, and is skipped
+    when the files hash the same as the last published snapshot.
+    """
+
+    def __init__(self, repo_path: Path, files: List[Path], remote_url: Optional[str],
+                 window: float = 60.0, before_push: Optional[Callable[[], None]] = None):
+        self.repo_path = repo_path
+        self.files = files
+        self.remote_url = remote_url
+        self.window = window
+        self.before_push = before_push
+        self._cond = threading.Condition()
+        self._dirty_since: Optional[float] = None
+        self._flush_requested = False
+        self._stopping = False
+        self._published = 0
+        self._last_hash: Optional[Tuple[str, ...]] = None
+        self._thread: Optional[threading.Thread] = None
+        if self.remote_url:
+            self._thread = threading.Thread(target=self._run, name="csv-snapshot", daemon=True)
+            self._thread.start()
+
+    def mark_dirty(self):
+        if self._thread is None:
+            return
+        with self._cond:
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Publish pending changes now and wait for it. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        with self._cond:
+            if self._dirty_since is None:
+                return True
+            target = self._published + 1
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._published >= target, timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush-on-shutdown hook: publish anything pending, then stop the worker."""
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._dirty_since is None and not self._stopping:
+                    self._cond.wait()
+                if self._dirty_since is None:
+                    return
+                while not self._stopping and not self._flush_requested:
+                    remaining = self._dirty_since + self.window - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._dirty_since = None
+                self._flush_requested = False
+            self.publish()
+            with self._cond:
+                self._published += 1
+                self._cond.notify_all()
+
+    def publish(self):
+        """Stage the files, amend the moving snapshot commit and force-push it."""
+        started = time.perf_counter()
+        status = "unchanged"
+        try:
+            if self.before_push:
+                self.before_push()
+            repo = Repo(self.repo_path, search_parent_directories=True)
+            repo_root = Path(repo.working_tree_dir)
+            rel_files = [str(p.resolve().relative_to(repo_root.resolve())) for p in self.files]
+            content_hash = tuple(_blob_sha(p) for p in self.files)
+            if self._last_hash is None and repo.head.is_valid():
+                # First publish since startup: HEAD is what was pushed last time.
+                tree = repo.head.commit.tree
+                try:
+                    self._last_hash = tuple(tree[f].hexsha for f in rel_files)
+                except KeyError:
+                    pass
+            if content_hash == self._last_hash:
+                return
+            status = "pushed"
+            repo.index.add(rel_files)
+            commit_msg = f"CSV snapshot {datetime.now(UTC):%Y-%m-%d %H:%M UTC}"
+            if repo.head.is_valid():
+                repo.git.commit("--amend", "--no-edit", "-m", commit_msg)
+            else:
+                repo.index.commit(commit_msg)
+            repo.git.push("--force", self.remote_url, "HEAD")
+            self._last_hash = content_hash
+            print(f"[CSV snapshot] Pushed {commit_msg}.")
+        except Exception as e:
+            status = "error"
+            print(f"[CSV snapshot] Git push skipped: {e}")
+        finally:
+            metrics.observe("snapshot_push_seconds", time.perf_counter() - started, status=status)
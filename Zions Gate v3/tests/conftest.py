@@ -0,0 +1,27 @@
+"""Run from the bot folder: cd "Zions Gate v3" && python -m pytest tests"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BOT_DIR))
+sys.path.insert(0, str(BOT_DIR / "benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def bot(tmp_path_factory):
+    """main.py imported once over the benchmark data set (CSV backend, no git pushes)."""
+    from bench_handlers import generate
+
+    data_dir = tmp_path_factory.mktemp("data")
+    generate(data_dir, 1_000)
+    os.environ.update({"DATA_DIR": str(data_dir), "STORAGE_BACKEND": "csv", "CSV_PUSH_REMOTE": "",
+                       "CSV_PUSH_TOKEN": "", "TRACING_ENABLED": "false", "SHARD_COUNT": "0"})
+    import main
+
+    main.users_loaded.wait()
+    yield main
+    main.user_writes.close()
+    main.repo.close()
@@ -0,0 +1,55 @@
+import asyncio
+
+from avatar_notifier import AvatarNotifier
+
+
+def notify(changes, window=0.05, wait=0.0, remember=10_000):
+    """Feed (user_id, avatar_url) changes through a notifier and return the posted batches."""
+    posts = []
+
+    async def scenario():
+        notifier = AvatarNotifier(posts.append, window=window, remember=remember)
+        for change in changes:
+            if change is None:
+                # Let the current window close before the next change.
+                await asyncio.sleep(window * 3)
+            else:
+                notifier.changed(*change)
+        await asyncio.sleep(wait)
+        await notifier.close()
+        return notifier
+
+    return posts, asyncio.run(scenario())
+
+
+def test_changes_within_the_window_announce_only_the_latest_avatar():
+    posts, notifier = notify([(1, "a.png"), (1, "b.png"), (1, "c.png")], wait=0.15)
+    assert len(posts) == 1
+    [embed] = posts[0]
+    assert embed["image"]["url"] == "c.png"
+    assert embed["description"] == "<@1> changed their profile picture. (3 changes)"
+    assert (notifier.events, notifier.posted) == (3, 1)
+
+
+def test_cycling_back_to_the_announced_avatar_is_suppressed():
+    posts, notifier = notify([(1, "a.png"), None, (1, "b.png"), (1, "a.png")])
+    assert [[e["image"]["url"] for e in batch] for batch in posts] == [["a.png"]]
+    assert notifier.suppressed == 1
+
+
+def test_users_due_together_share_messages_of_up_to_ten_embeds():
+    posts, _ = notify([(user_id, f"{user_id}.png") for user_id in range(23)])
+    assert [len(batch) for batch in posts] == [10, 10, 3]
+    assert [e["image"]["url"] for batch in posts for e in batch] == [f"{i}.png" for i in range(23)]
+
+
+def test_removed_avatar_is_announced_without_an_image():
+    posts, _ = notify([(1, None)])
+    [[embed]] = posts
+    assert "image" not in embed
+
+
+def test_only_the_most_recent_users_are_remembered():
+    posts, _ = notify([(1, "a.png"), (2, "b.png"), None, (1, "a.png")], remember=1)
+    # User 1 was forgotten when user 2 was announced, so the same avatar is posted again.
+    assert [[e["image"]["url"] for e in batch] for batch in posts] == [["a.png", "b.png"], ["a.png"]]
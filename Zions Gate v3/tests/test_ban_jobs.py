@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+import pytest
+
+import fakes
+from ban_jobs import (BanJob, BanJobQueue, PENDING, RETRY_NO_FAILURES, RETRY_QUEUED, RETRY_RUNNING,
+                      RETRY_SUPERSEDED, RETRY_UNKNOWN)
+from bench_handlers import user_id
+from fanout import BANNED, FAILED, GuildResult
+
+GUILDS = [(1, "one"), (2, "two"), (3, "three")]
+
+
+class Runner:
+    """Records which jobs ran on which guilds; guilds in `fail` fail once."""
+
+    def __init__(self, delay: float = 0.01, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+        self.running = {}
+        self.overlaps = []
+
+    async def __call__(self, job, guild_ids, record):
+        if self.running.get(job.user_id):
+            self.overlaps.append(job.id)
+        self.running[job.user_id] = self.running.get(job.user_id, 0) + 1
+        self.calls.append((job.id, list(guild_ids)))
+        try:
+            for guild_id in guild_ids:
+                await asyncio.sleep(self.delay)
+                if guild_id in self.fail:
+                    self.fail.discard(guild_id)
+                    record(GuildResult(guild_id, job.guilds[guild_id][0], FAILED, "503"))
+                else:
+                    record(GuildResult(guild_id, job.guilds[guild_id][0], BANNED, None))
+        finally:
+            self.running[job.user_id] -= 1
+
+
+def test_submit_is_durable_before_any_guild_runs(tmp_path):
+    path = tmp_path / "ban_jobs.jsonl"
+    seen = []
+
+    async def runner(job, guild_ids, record):
+        seen.append([json.loads(line)["op"] for line in path.read_text().splitlines()])
+
+    async def run():
+        queue = BanJobQueue(path, runner)
+        await queue.wait(await queue.submit("ban", 5, "spam", GUILDS))
+        await queue.close()
+
+    asyncio.run(run())
+    assert seen == [["job"]]
+
+
+def test_jobs_for_one_user_run_in_order(tmp_path):
+    runner = Runner()
+
+    async def run():
+        queue = BanJobQueue(tmp_path / "ban_jobs.jsonl", runner, concurrency=4)
+        ban = await queue.submit("ban", 5, "spam", GUILDS, job_id="ban")
+        unban = await queue.submit("unban", 5, "appeal", GUILDS, job_id="unban")
+        other = await queue.submit("ban", 6, "spam", GUILDS, job_id="other")
+        for job in (ban, unban, other):
+            await queue.wait(job)
+        await queue.close()
+
+    asyncio.run(run())
+    assert runner.overlaps == []
+    order = [job_id for job_id, _ in runner.calls]
+    assert order.index("ban") < order.index("unban")
+    # Another user's job does not wait behind them.
+    assert order.index("other") < order.index("unban")
+
+
+def test_resume_runs_only_pending_guilds_in_order(tmp_path):
+    path = tmp_path / "ban_jobs.jsonl"
+    first = BanJob("a", "ban", 5, "spam", GUILDS)
+    second = BanJob("b", "unban", 5, "appeal", GUILDS)
+    with open(path, "w", encoding="utf-8") as f:
+        for job in (first, second):
+            f.write(json.dumps(BanJobQueue._job_record(job)) + "\n")
+        f.write(json.dumps({"op": "guild", "id": "a", "guild_id": 1, "status": BANNED, "error": None}) + "\n")
+        f.write('{"op": "guild", "id": "a", "gui')
+    runner = Runner()
+
+    async def run():
+        queue = BanJobQueue(path, runner, concurrency=2)
+        assert queue.jobs["a"].guilds[2][1] == PENDING
+        assert queue.resume() == 2
+        for job in list(queue.jobs.values()):
+            await queue.wait(job)
+        await queue.close()
+
+    asyncio.run(run())
+    assert runner.calls == [("a", [2, 3]), ("b", [1, 2, 3])]
+    assert runner.overlaps == []
+    assert BanJobQueue(path, runner).stats()["unfinished"] == 0
+
+
+def test_retry_outcomes(tmp_path):
+    runner = Runner(delay=0.05, fail=[2])
+
+    async def run():
+        queue = BanJobQueue(tmp_path / "ban_jobs.jsonl", runner)
+        assert await queue.retry_failed("nope") == RETRY_UNKNOWN
+        job = await queue.submit("ban", 5, "spam", GUILDS)
+        assert await queue.retry_failed(job.id) == RETRY_RUNNING
+        await queue.wait(job)
+        assert [f[0] for f in job.failed()] == [2]
+        assert await queue.retry_failed(job.id) == RETRY_QUEUED
+        await queue.wait(job)
+        assert job.failed() == []
+        assert await queue.retry_failed(job.id) == RETRY_NO_FAILURES
+
+        runner.fail.add(3)
+        old = await queue.submit("ban", 7, "spam", GUILDS)
+        await queue.wait(old)
+        newer = await queue.submit("unban", 7, "appeal", GUILDS)
+        await queue.wait(newer)
+        assert await queue.retry_failed(old.id) == RETRY_SUPERSEDED
+        await queue.close()
+
+    asyncio.run(run())
+
+
+def test_globalban_sets_the_flag_only_through_its_job(bot, monkeypatch):
+    guild = fakes.FakeGuild(1_000_000, fakes.FakeGateway(latency=0, jitter=0))
+    target = fakes.FakeMember(user_id(5))
+    assert not bot.is_globally_banned(target.id)
+
+    async def disk_full(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(bot.ban_jobs, "submit", disk_full)
+    with pytest.raises(OSError):
+        asyncio.run(bot.globalban.callback(fakes.FakeInteraction(guild, target, "globalban"), target, "spam"))
+    assert not bot.is_globally_banned(target.id)
+
+    # Running (or resuming) the job is what writes the flag.
+    job = BanJob("flag", "ban", target.id, "spam", [], meta={"set_flag": True})
+    asyncio.run(bot._run_ban_job(job, [], lambda result: None))
+    assert bot.is_globally_banned(target.id)
+    assert bot._users().is_banned(target.id) is True
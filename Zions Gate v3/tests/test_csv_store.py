@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+
+import pytest
+
+import csv_store
+from csv_store import CSVTable, load_csv
+
+COLUMNS = ["Server_AI_ID", "Guild_ID", "Server_Name", "setup"]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    csv_path = tmp_path / "servers.csv"
+    csv_path.write_text(",".join(COLUMNS) + "\n1,10,first,False\n", encoding="utf-8")
+    return csv_path, tmp_path / "servers.csv.journal"
+
+
+def disk_full(*args):
+    raise OSError("disk full")
+
+
+def open_table(paths, **kwargs):
+    csv_path, journal_path = paths
+    return CSVTable(csv_path, COLUMNS, "Guild_ID", "Server_AI_ID", journal_path=journal_path, **kwargs)
+
+
+def test_mutations_go_to_the_journal_not_the_csv(paths):
+    csv_path, journal_path = paths
+    before = csv_path.read_text(encoding="utf-8")
+    table = open_table(paths)
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    table.update(10, {"setup": "True"})
+    assert csv_path.read_text(encoding="utf-8") == before
+    assert len(journal_path.read_text(encoding="utf-8").splitlines()) == 2
+    table.close()
+
+
+def test_replay_after_crash(paths):
+    csv_path, journal_path = paths
+    table = open_table(paths)
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    table.update(11, {"setup": "True"})
+    # No close(): the process dies with the journal flushed but not folded in.
+    with open(journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "update", "key": "10", "val')
+
+    reopened = open_table(paths)
+    assert reopened.get(11) == {"Server_AI_ID": "2", "Guild_ID": "11", "Server_Name": "second", "setup": "True"}
+    # The torn record is dropped; the replayed state is written back to the CSV.
+    assert reopened.get(10)["setup"] == "False"
+    assert [r["Guild_ID"] for r in load_csv(csv_path)] == ["10", "11"]
+    assert journal_path.read_text(encoding="utf-8") == ""
+    assert reopened.insert({"Guild_ID": "12", "Server_Name": "third"})["Server_AI_ID"] == "3"
+    reopened.close()
+
+
+def test_replay_skips_inserts_already_in_the_csv(paths):
+    csv_path, journal_path = paths
+    table = open_table(paths)
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    table.close()
+    # Crash between writing the CSV and deleting the journal during compaction.
+    csv_path.write_text(csv_path.read_text(encoding="utf-8") + "2,11,second,False\n", encoding="utf-8")
+    table = open_table(paths)
+    assert len(table) == 2
+    table.close()
+
+
+def test_compaction_folds_the_journal_into_the_csv(paths):
+    csv_path, journal_path = paths
+    table = open_table(paths, compact_bytes=1)
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    table._compactor.join()
+    assert [r["Guild_ID"] for r in load_csv(csv_path)] == ["10", "11"]
+    assert journal_path.read_text(encoding="utf-8") == ""
+    assert not table._old_journal_path.exists()
+    table.close()
+
+
+def test_failed_compaction_is_recovered_by_the_next_one(paths, monkeypatch):
+    csv_path, journal_path = paths
+    table = open_table(paths)
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    real_save = csv_store.save_csv_atomic
+    monkeypatch.setattr(csv_store, "save_csv_atomic", disk_full)
+    table.compact()
+    assert table._old_journal_path.exists()
+
+    table.insert({"Guild_ID": "12", "Server_Name": "third", "setup": "False"})
+    monkeypatch.setattr(csv_store, "save_csv_atomic", real_save)
+    table.compact()
+    assert not table._old_journal_path.exists()
+    assert [r["Guild_ID"] for r in load_csv(csv_path)] == ["10", "11", "12"]
+    table.close()
+
+
+def test_leftover_old_journal_is_replayed_at_startup(paths, monkeypatch):
+    csv_path, journal_path = paths
+    table = open_table(paths)
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    monkeypatch.setattr(csv_store, "save_csv_atomic", disk_full)
+    table.compact()
+    table.insert({"Guild_ID": "12", "Server_Name": "third", "setup": "False"})
+    table.close()
+    monkeypatch.undo()
+
+    table = open_table(paths)
+    assert [r["Guild_ID"] for r in table.rows()] == ["10", "11", "12"]
+    assert not table._old_journal_path.exists()
+    assert [r["Guild_ID"] for r in load_csv(csv_path)] == ["10", "11", "12"]
+    table.close()
+
+
+def test_idle_writes_are_fsynced_by_the_timer(paths, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(csv_store.os, "fsync", lambda fd: (synced.append(fd), real_fsync(fd)))
+    table = open_table(paths, fsync_every=1000, fsync_interval=0.05)
+    table._last_sync = time.monotonic()
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    assert synced == [] and table._unsynced == 1
+    deadline = time.monotonic() + 2
+    while table._unsynced and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert table._unsynced == 0 and len(synced) == 1
+    table.close()
+
+
+def test_background_and_direct_compactions_do_not_overlap(paths, monkeypatch):
+    csv_path, journal_path = paths
+    real_save = csv_store.save_csv_atomic
+    saving = threading.Event()
+
+    def slow_save(*args):
+        # Only the first save is slow, so an overlapping second one would finish first.
+        if not saving.is_set():
+            saving.set()
+            time.sleep(0.1)
+        real_save(*args)
+
+    monkeypatch.setattr(csv_store, "save_csv_atomic", slow_save)
+    table = open_table(paths)
+    for guild_id in range(100, 150):
+        table.insert({"Guild_ID": str(guild_id), "Server_Name": "bulk", "setup": "False"})
+    # A direct compaction (the snapshot worker) is mid-save when writers start a background one.
+    direct = threading.Thread(target=table.compact)
+    direct.start()
+    saving.wait()
+    for guild_id in range(150, 200):
+        table.insert({"Guild_ID": str(guild_id), "Server_Name": "bulk", "setup": "False"})
+    table.compact_in_background()
+    table.insert({"Guild_ID": "200", "Server_Name": "bulk", "setup": "False"})
+    direct.join()
+    table._compactor.join()
+
+    # Simulate a crash right here: the CSV plus any journals on disk must hold every row.
+    reopened = open_table(paths)
+    assert sorted(r["Guild_ID"] for r in reopened.rows()) == sorted(r["Guild_ID"] for r in table.rows())
+    assert len(reopened) == 102
+    reopened.close()
+    table.close()
+
+
+def test_compact_in_background_hands_back_the_running_compaction(paths, monkeypatch):
+    csv_path, journal_path = paths
+    release = threading.Event()
+    real_save = csv_store.save_csv_atomic
+    monkeypatch.setattr(csv_store, "save_csv_atomic", lambda *args: (release.wait(), real_save(*args)))
+    table = open_table(paths)
+    table.insert({"Guild_ID": "11", "Server_Name": "second", "setup": "False"})
+    running = table.compact_in_background()
+    assert table.compact_in_background() is running
+    release.set()
+    running.join()
+    assert [r["Guild_ID"] for r in load_csv(csv_path)] == ["10", "11"]
+    table.close()
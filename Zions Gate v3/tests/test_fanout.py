@@ -0,0 +1,57 @@
+import asyncio
+
+import discord
+
+import fakes
+import fanout
+from fanout import GuildFanout, ban_action, unban_action
+
+
+def run(guilds, action):
+    return asyncio.run(GuildFanout(concurrency=4, rate=1000).run(guilds, action))
+
+
+def test_ban_makes_one_request_per_guild():
+    gateway = fakes.FakeGateway(latency=0, jitter=0)
+    guilds = fakes.make_guilds(6, gateway)
+    user = fakes.FakeMember(42)
+    results = run(guilds, ban_action(user, "raid"))
+    assert [r.status for r in results] == [fanout.BANNED] * 6
+    assert gateway.calls == 6
+    # Banning again is harmless and still costs one request per guild.
+    assert [r.status for r in run(guilds, ban_action(user, "raid"))] == [fanout.BANNED] * 6
+    assert gateway.calls == 12 and all(g.bans == {42} for g in guilds)
+
+
+def test_ban_results_by_outcome():
+    gateway = fakes.FakeGateway(latency=0, jitter=0)
+    guilds = fakes.make_guilds(3, gateway)
+    failures = {guilds[1].id: (discord.Forbidden, 403), guilds[2].id: (discord.HTTPException, 400)}
+
+    async def action(guild, throttle):
+        if guild.id in failures:
+            await throttle()
+            raise fakes.http_error(*failures[guild.id])
+        return await ban_action(fakes.FakeMember(42), "raid")(guild, throttle)
+
+    statuses = [r.status for r in run(guilds, action)]
+    assert statuses == [fanout.BANNED, fanout.FORBIDDEN, fanout.FAILED]
+
+
+def test_unknown_user_counts_as_nothing_to_ban():
+    gateway = fakes.FakeGateway(latency=0, jitter=0)
+    guild = fakes.make_guilds(1, gateway)[0]
+
+    async def unknown_user(user, reason=None):
+        raise fakes.http_error(discord.NotFound, 404, "Unknown User")
+
+    guild.ban = unknown_user
+    assert [r.status for r in run([guild], ban_action(fakes.FakeMember(42), "raid"))] == [fanout.ALREADY_BANNED]
+
+
+def test_unban_of_a_user_who_is_not_banned():
+    gateway = fakes.FakeGateway(latency=0, jitter=0)
+    guilds = fakes.make_guilds(2, gateway)
+    guilds[0].bans.add(42)
+    statuses = [r.status for r in run(guilds, unban_action(fakes.FakeMember(42), "appeal"))]
+    assert statuses == [fanout.UNBANNED, fanout.NOT_BANNED]
@@ -0,0 +1,76 @@
+import asyncio
+
+from guild_config import GuildConfig, GuildConfigCache
+
+ROW = ("True", "11", "", "NULL", "21", "22", None, "999")
+
+
+class Rows:
+    """A servers table stand-in that counts reads and can hold one open until released."""
+
+    def __init__(self):
+        self.rows = {1: ROW}
+        self.reads = 0
+        self.gate = None
+
+    async def fetch(self, guild_id):
+        self.reads += 1
+        row = self.rows.get(guild_id)
+        if self.gate is not None:
+            await self.gate.wait()
+        return row
+
+
+def test_row_is_parsed_into_role_sets():
+    config = GuildConfig.from_row(ROW)
+    assert config == GuildConfig(True, frozenset({11}), frozenset({21, 22}), 999)
+    assert GuildConfig.from_row(("False", "x", None, None, None, None, None, "")).owner_id == 0
+
+
+def test_configs_are_cached_until_invalidated():
+    rows = Rows()
+    cache = GuildConfigCache(rows.fetch)
+
+    async def scenario():
+        assert (await cache.get(1)).setup
+        assert (await cache.get(1)).setup
+        assert rows.reads == 1
+        rows.rows[1] = ("False",) + ROW[1:]
+        cache.invalidate(1)
+        assert not (await cache.get(1)).setup
+        assert rows.reads == 2
+
+    asyncio.run(scenario())
+
+
+def test_unregistered_guilds_are_cached_until_registered():
+    rows = Rows()
+    cache = GuildConfigCache(rows.fetch)
+
+    async def scenario():
+        assert await cache.get(2) is None
+        assert await cache.get(2) is None
+        assert rows.reads == 1
+        rows.rows[2] = ROW
+        cache.invalidate(2)
+        assert await cache.get(2) is not None
+
+    asyncio.run(scenario())
+
+
+def test_read_in_flight_during_invalidate_is_not_cached():
+    rows = Rows()
+    cache = GuildConfigCache(rows.fetch)
+
+    async def scenario():
+        rows.gate = asyncio.Event()
+        stale = asyncio.ensure_future(cache.get(1))
+        await asyncio.sleep(0)
+        # /setup changes the row while the old one is still on its way back.
+        rows.rows[1] = ("False",) + ROW[1:]
+        cache.invalidate(1)
+        rows.gate.set()
+        assert (await stale).setup
+        assert not (await cache.get(1)).setup
+
+    asyncio.run(scenario())
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_handlers import generate, user_id, user_name
+from id_index import UserIdIndex, build_index
+
+# bench_handlers.generate bans every 1000th user.
+BANNED = user_id(0)
+NOT_BANNED = user_id(1)
+
+
+def open_index(tmp_path, rows=2_000):
+    generate(tmp_path, rows)
+    csv_path = tmp_path / "users.csv"
+    build_index(csv_path, tmp_path / "users.csv.idx")
+    return UserIdIndex.open(tmp_path / "users.csv.idx", csv_path)
+
+
+def test_concurrent_row_reads_return_their_own_row(tmp_path):
+    index = open_index(tmp_path)
+    wanted = list(range(2_000)) * 5
+
+    def read(i):
+        return i, index.read_row(user_id(i))
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(read, wanted))
+    assert all(row["User_ID"] == str(user_id(i)) and row["User_Name"] == user_name(i) for i, row in results)
+    index.close()
+
+
+def test_bans_set_during_the_load_window_are_read_back(bot, tmp_path):
+    users_index = open_index(tmp_path, 1_000)
+    saved_index = bot.users_index
+    bot.users_index = users_index
+    bot.users_loaded.clear()
+    try:
+        bot._cache_global_ban(NOT_BANNED, True)
+        bot._cache_global_ban(BANNED, False)
+        cursor = bot.CSVCursor()
+        cursor.execute("SELECT Global_Banned FROM Users WHERE User_ID = %s", (NOT_BANNED,))
+        assert cursor.fetchone() == ("True",)
+        cursor.execute("SELECT User_Name, Global_Banned FROM Users WHERE User_ID = %s", (BANNED,))
+        assert cursor.fetchone() == (user_name(0), "False")
+    finally:
+        with bot._ban_lock:
+            bot._ban_changes.clear()
+            bot.banned_ids.discard(NOT_BANNED)
+            bot.banned_ids.add(BANNED)
+            bot.users_loaded.set()
+        bot.users_index = saved_index
+        users_index.close()
+
+
+def test_user_writes_during_the_load_window_leave_the_storage_pool_free(bot):
+    async def scenario():
+        # Unbanning a user that is not banned changes nothing once the table is back.
+        writes = [asyncio.ensure_future(bot.user_writes.execute(
+            "UPDATE Users SET Global_Banned = %s WHERE User_ID = %s", ("False", NOT_BANNED)))
+            for _ in range(bot.STORAGE_WORKERS + 2)]
+        config = await asyncio.wait_for(bot.repo.fetchone(bot.GUILD_CONFIG_QUERY, (1_000_000,)), 5)
+        assert config is not None
+        assert not any(w.done() for w in writes)
+        bot.users_loaded.set()
+        await asyncio.gather(*writes)
+
+    bot.users_loaded.clear()
+    try:
+        asyncio.run(scenario())
+    finally:
+        bot.users_loaded.set()
+    assert bot._users().get(NOT_BANNED)["Global_Banned"] == "False"
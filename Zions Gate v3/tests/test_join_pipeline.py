@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+from join_pipeline import JoinPipeline, SpikeDetector
+
+
+def test_raid_mode_starts_at_the_threshold_and_ends_below_half():
+    spikes = SpikeDetector(threshold=4, window=10.0)
+    assert [spikes.record(1, t) for t in (0, 1, 2)] == [None, None, None]
+    assert spikes.record(1, 3) is True
+    assert spikes.record(1, 4) is None
+    # Joins at 2, 3, 4 and 12 are still in the window: not under half yet.
+    assert spikes.record(1, 12) is None
+    assert spikes.rate(1) == 4
+    assert spikes.record(1, 25) is False
+    assert not spikes.raiding[1]
+
+
+def test_joins_older_than_the_window_do_not_count():
+    spikes = SpikeDetector(threshold=3, window=5.0)
+    assert [spikes.record(1, t) for t in (0, 6, 12, 18)] == [None] * 4
+    assert spikes.rate(1) == 1
+
+
+def test_guilds_are_counted_separately():
+    spikes = SpikeDetector(threshold=2, window=60.0)
+    assert spikes.record(1, 0) is None
+    assert spikes.record(2, 0) is None
+    assert spikes.record(1, 1) is True
+    assert spikes.raiding == {1: True}
+
+
+def test_spike_handler_is_told_of_raid_mode():
+    changes = []
+    pipeline = JoinPipeline(lambda batch: None, spikes=SpikeDetector(threshold=3, window=60.0),
+                            on_spike=lambda guild_id, rate, raiding: changes.append((guild_id, rate, raiding)))
+    for _ in range(4):
+        pipeline.record_decision(7, time.perf_counter())
+    assert changes == [(7, 3, True)]
+    assert pipeline.stats()["joins"] == 4
+
+
+def test_members_are_flushed_in_batches():
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+
+    async def scenario():
+        pipeline = JoinPipeline(flush, batch_size=4, flush_interval=0.05)
+        for member in range(10):
+            pipeline.submit(member)
+        await pipeline.close()
+        return pipeline.stats()
+
+    stats = asyncio.run(scenario())
+    assert batches == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert stats["batches"] == 3 and stats["max_batch"] == 4
+
+
+def test_a_failed_flush_does_not_stop_the_worker():
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+        if len(batches) == 1:
+            raise OSError("database is locked")
+
+    async def scenario():
+        pipeline = JoinPipeline(flush, batch_size=2, flush_interval=0.01)
+        pipeline.submit("a")
+        await asyncio.sleep(0.05)
+        pipeline.submit("b")
+        await pipeline.close()
+
+    asyncio.run(scenario())
+    assert batches == [["a"], ["b"]]
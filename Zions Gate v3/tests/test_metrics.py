@@ -0,0 +1,39 @@
+import pytest
+
+from metrics import Metrics
+
+
+def series(registry: Metrics, name: str):
+    return {labels: h.count for n, labels, h in registry._snapshot() if n == name}
+
+
+def test_timer_labels_status_ok_and_error():
+    registry = Metrics()
+    with registry.timer("csv_write_seconds", table="users", op="journal"):
+        pass
+    with pytest.raises(ValueError):
+        with registry.timer("csv_write_seconds", table="users", op="journal"):
+            raise ValueError("disk full")
+    assert series(registry, "csv_write_seconds") == {
+        (("op", "journal"), ("status", "ok"), ("table", "users")): 1,
+        (("op", "journal"), ("status", "error"), ("table", "users")): 1,
+    }
+
+
+def test_disabled_registry_records_nothing():
+    registry = Metrics(enabled=False)
+    with registry.timer("x_seconds", op="y"):
+        pass
+    registry.observe("x_seconds", 0.1)
+    assert registry._snapshot() == []
+
+
+def test_prometheus_text():
+    registry = Metrics()
+    registry.observe("rest_call_seconds", 0.003, call="ban")
+    registry.gauge("queue_depth", lambda: 4)
+    text = registry.render_prometheus()
+    assert '# TYPE rest_call_seconds histogram' in text
+    assert 'rest_call_seconds_bucket{call="ban",le="0.005"} 1' in text
+    assert 'rest_call_seconds_count{call="ban"} 1' in text
+    assert "queue_depth 4.0" in text
@@ -0,0 +1,70 @@
+import csv
+import gzip
+import io
+import os
+from datetime import datetime, UTC
+from types import SimpleNamespace
+
+import fakes
+from purge_archive import HEADER, PurgeArchive
+
+
+def message(i, content=None):
+    return SimpleNamespace(created_at=datetime(2024, 1, 1, tzinfo=UTC), author=fakes.FakeMember(1000 + i),
+                           content=content if content is not None else f"message {i}")
+
+
+def read_rows(data, compressed=False):
+    text = (gzip.decompress(data) if compressed else data).decode("utf-8")
+    return list(csv.reader(io.StringIO(text)))
+
+
+def test_small_log_is_one_attachment():
+    archive = PurgeArchive("purge_1")
+    archive.add(message(1, "line one\nline two"))
+    [(name, data, content_type)] = archive.finish()
+    assert (name, content_type) == ("purge_1.csv", "text/csv")
+    assert read_rows(data) == [HEADER, ["2024-01-01 00:00:00", "user1001#0", "1001", "line one\\nline two"]]
+
+
+def test_empty_log_still_has_a_header():
+    [(name, data, _)] = PurgeArchive("purge_1").finish()
+    assert read_rows(data) == [HEADER]
+
+
+def test_large_log_is_split_into_parts_that_each_fit():
+    archive = PurgeArchive("purge_1", max_part_bytes=2_000)
+    for i in range(200):
+        archive.add(message(i))
+    parts = archive.finish()
+    assert len(parts) > 1
+    assert [name for name, _, _ in parts] == [f"purge_1_part{n}.csv" for n in range(1, len(parts) + 1)]
+    assert all(len(data) <= 2_000 for _, data, _ in parts)
+    rows = []
+    for _, data, _ in parts:
+        part_rows = read_rows(data)
+        assert part_rows[0] == HEADER
+        rows.extend(part_rows[1:])
+    assert [row[3] for row in rows] == [f"message {i}" for i in range(200)]
+
+
+def test_compressed_parts_fit_and_decompress():
+    archive = PurgeArchive("purge_1", compress=True, max_part_bytes=4_000)
+    for i in range(300):
+        # Random content, so gzip can't shrink the log under one part.
+        archive.add(message(i, os.urandom(30).hex()))
+    parts = archive.finish()
+    assert len(parts) > 1
+    assert all(name.endswith(".csv.gz") and len(data) <= 4_000 for name, data, _ in parts)
+    assert sum(len(read_rows(data, compressed=True)) - 1 for _, data, _ in parts) == 300
+
+
+def test_full_parts_are_handed_over_as_they_close():
+    handed = []
+    archive = PurgeArchive("purge_1", max_part_bytes=1_000, on_part=handed.append)
+    for i in range(100):
+        archive.add(message(i))
+    remaining = archive.finish()
+    assert handed and len(remaining) == 1
+    assert remaining[0][0] == f"purge_1_part{len(handed) + 1}.csv"
+    assert sum(len(read_rows(data)) - 1 for _, data, _ in handed + remaining) == 100
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta, UTC
+
+import discord
+import pytest
+
+import fakes
+from purge_archive import PurgeArchive
+from purge_engine import BULK_DELETE_SIZE, PurgeEngine, PurgeFilter, compile_pattern
+
+
+class StubMessage:
+    def __init__(self, channel, message_id, age, author_id=1, content=""):
+        self.channel = channel
+        self.id = message_id
+        self.created_at = datetime.now(UTC) - age
+        self.author = fakes.FakeMember(author_id)
+        self.content = content
+
+    async def delete(self):
+        self.channel.single.append(self.id)
+        self.channel.messages.remove(self)
+
+
+class StubChannel:
+    """Message history, newest first, with Discord's 14-day bulk delete rule."""
+
+    def __init__(self):
+        self.messages = []
+        self.bulk = []
+        self.single = []
+
+    def add(self, count, age, **kwargs):
+        for _ in range(count):
+            self.messages.append(StubMessage(self, len(self.messages) + 1, age, **kwargs))
+
+    async def history(self, limit=None, before=None, after=None, oldest_first=False):
+        for message in list(self.messages)[:limit]:
+            yield message
+
+    async def delete_messages(self, batch):
+        if len(batch) > BULK_DELETE_SIZE or any(datetime.now(UTC) - m.created_at > timedelta(days=14) for m in batch):
+            raise fakes.http_error(discord.HTTPException, 400, "Messages too old to bulk delete")
+        self.bulk.append([m.id for m in batch])
+        for message in batch:
+            self.messages.remove(message)
+
+
+def purge(channel, limit, purge_filter=PurgeFilter(), **kwargs):
+    archive = PurgeArchive("purge")
+    stats = asyncio.run(PurgeEngine(channel, limit, purge_filter, archive, single_delete_rate=1000, **kwargs).run())
+    return stats, archive
+
+
+def test_recent_messages_are_bulk_deleted_in_hundreds():
+    channel = StubChannel()
+    channel.add(250, timedelta(hours=1))
+    stats, archive = purge(channel, 250)
+    assert [len(batch) for batch in channel.bulk] == [100, 100, 50]
+    assert stats.bulk_deleted == 250 and stats.single_deleted == 0
+    assert archive.rows == 250
+
+
+def test_messages_past_the_bulk_window_are_deleted_one_by_one():
+    channel = StubChannel()
+    channel.add(30, timedelta(days=1))
+    channel.add(5, timedelta(days=14) - timedelta(minutes=1))
+    channel.add(10, timedelta(days=20))
+    stats, archive = purge(channel, 100)
+    # Messages just inside 14 days are already too close to the limit to bulk delete.
+    assert channel.bulk == [list(range(1, 31))]
+    assert channel.single == list(range(31, 46))
+    assert (stats.bulk_deleted, stats.single_deleted, stats.failed) == (30, 15, 0)
+    assert archive.rows == 45 and not channel.messages
+
+
+def test_failed_bulk_delete_falls_back_to_single_deletes():
+    channel = StubChannel()
+    channel.add(3, timedelta(hours=1))
+
+    async def rejected(batch):
+        raise fakes.http_error(discord.HTTPException, 500, "Internal Server Error")
+
+    channel.delete_messages = rejected
+    stats, _ = purge(channel, 3)
+    assert channel.single == [1, 2, 3]
+    assert (stats.bulk_deleted, stats.single_deleted) == (0, 3)
+
+
+def test_filters_scan_past_the_limit_until_enough_match():
+    channel = StubChannel()
+    channel.add(10, timedelta(hours=1), author_id=1, content="hello")
+    channel.add(10, timedelta(hours=2), author_id=2, content="BUY NOW")
+    stats, _ = purge(channel, 5, PurgeFilter(pattern=compile_pattern("buy now")), scan_limit=100)
+    assert channel.bulk == [list(range(11, 16))]
+    assert (stats.scanned, stats.matched, stats.deleted) == (15, 5, 5)
+
+    stats, _ = purge(channel, 100, PurgeFilter(author_id=1), scan_limit=100)
+    assert stats.deleted == 10 and all(m.author.id == 2 for m in channel.messages)
+
+
+def test_invalid_pattern_is_reported():
+    with pytest.raises(ValueError, match="Invalid pattern"):
+        compile_pattern("(")
@@ -0,0 +1,29 @@
+import asyncio
+
+import fakes
+from reconcile import member_digest
+
+# The first benchmark guild, which is set up.
+GUILD_ID = 1_000_000
+
+
+def make_guild(first_user_id: int, count: int):
+    guild = fakes.FakeGuild(GUILD_ID, fakes.FakeGateway(latency=0, jitter=0))
+    guild.members = [fakes.FakeMember(first_user_id + i, guild) for i in range(count)]
+    return guild
+
+
+def test_failed_insert_leaves_no_checkpoint(bot, monkeypatch):
+    guild = make_guild(900_000_000_000, 5)
+
+    async def locked(*args):
+        raise OSError("database is locked")
+
+    monkeypatch.setattr(bot.user_writes, "executemany", locked)
+    asyncio.run(bot.reconcile_guild(guild))
+    assert bot.checkpoints.digest(GUILD_ID) is None
+
+    monkeypatch.undo()
+    asyncio.run(bot.reconcile_guild(guild))
+    assert bot.checkpoints.digest(GUILD_ID) == member_digest(m.id for m in guild.members)
+    assert all(bot._users().get(m.id) is not None for m in guild.members)
@@ -0,0 +1,48 @@
+from search_index import UserSearchIndex
+
+
+def make_index(names):
+    index = UserSearchIndex()
+    index.add_many((str(user_id), name) for user_id, name in enumerate(names, 1))
+    return index
+
+
+def test_exact_full_name_ranks_before_base_name_matches():
+    index = make_index(["drako#0002", "drako#0001", "drakonis#0001"])
+    ids, total = index.search("drako#0001")
+    assert ids == ["2", "1", "3"] and total == 3
+
+
+def test_prefix_matches_rank_shorter_completions_first():
+    index = make_index(["kazumi#0", "kaz#0", "kazu#0", "rote#0"])
+    assert index.search("ka")[0] == ["2", "3", "1"]
+    assert index.search("rot")[0] == ["4"]
+
+
+def test_fuzzy_matches_catch_typos():
+    index = make_index(["shinaloveq#0", "miroteshi#0"])
+    assert index.search("shinalovq")[0] == ["1"]
+    assert index.search("zzzzzz") == ([], 0)
+
+
+def test_pages_cover_every_match_once():
+    index = make_index([f"kazu{i:03}#0" for i in range(25)])
+    pages = [index.search("kazu", limit=10, offset=offset) for offset in (0, 10, 20, 30)]
+    assert [total for _, total in pages] == [25] * 4
+    assert [len(ids) for ids, _ in pages] == [10, 10, 5, 0]
+    assert len({user_id for ids, _ in pages for user_id in ids}) == 25
+
+
+def test_users_sharing_a_name_are_all_found():
+    index = make_index(["twin#0001", "twin#0002"])
+    index.add("3", "Twin#0003")
+    assert index.search("TWIN") == (["1", "2", "3"], 3)
+    assert len(index) == 1
+
+
+def test_background_build_matches_a_direct_one():
+    names = [f"name{i}#0" for i in range(300)]
+    index = UserSearchIndex()
+    index.add_in_background([(str(i), n) for i, n in enumerate(names, 1)], chunk_size=64).join()
+    assert index.search("name29") == make_index(names).search("name29")
+    assert len(index) == 300
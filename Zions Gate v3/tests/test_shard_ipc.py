@@ -0,0 +1,126 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from shard_ipc import IPCError, ShardIPC, parse_peers
+
+BOT_DIR = Path(__file__).resolve().parent.parent
+SECRET = "test-secret"
+
+# One shard process: answers "whoami" with its pid and "echo" with its payload until stdin closes.
+PEER = textwrap.dedent("""
+    import asyncio, os, sys
+    sys.path.insert(0, sys.argv[1])
+    from shard_ipc import ShardIPC
+
+    async def main():
+        ipc = ShardIPC("peer", "127.0.0.1", int(sys.argv[2]), [], secret=sys.argv[3])
+
+        async def whoami(payload):
+            return os.getpid()
+
+        async def echo(payload):
+            return payload
+
+        ipc.register("whoami", whoami)
+        ipc.register("echo", echo)
+        await ipc.start()
+        print("ready", flush=True)
+        await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+        await ipc.close()
+
+    asyncio.run(main())
+""")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def peers():
+    started = []
+
+    def start(count: int, secret: str = SECRET):
+        ports = [free_port() for _ in range(count)]
+        for port in ports:
+            child = subprocess.Popen([sys.executable, "-c", PEER, str(BOT_DIR), str(port), secret],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            started.append(child)
+            while child.stdout.readline().strip() != "ready":
+                assert child.poll() is None
+        return [("127.0.0.1", port) for port in ports], [child.pid for child in started[-count:]]
+
+    yield start
+    for child in started:
+        child.stdin.close()
+        child.wait(timeout=10)
+
+
+def test_parse_peers():
+    assert parse_peers(" 127.0.0.1:7401, :7402,") == [("127.0.0.1", 7401), ("127.0.0.1", 7402)]
+
+
+def test_empty_secret_is_refused():
+    with pytest.raises(ValueError):
+        ShardIPC("p", "127.0.0.1", 0, [], secret="")
+
+
+def test_broadcast_reaches_every_process(peers):
+    addresses, pids = peers(2)
+    dead = ("127.0.0.1", free_port())
+
+    async def run():
+        ipc = ShardIPC("client", "127.0.0.1", 0, addresses + [dead], secret=SECRET, timeout=5)
+        try:
+            replies = await ipc.broadcast("whoami", {})
+            echoed = await ipc.request(addresses[0], "echo", {"big": "x" * 1_000_000})
+            with pytest.raises(IPCError):
+                await ipc.request(addresses[0], "no_such_op", {})
+            return replies, echoed, ipc.stats()
+        finally:
+            await ipc.close()
+
+    replies, echoed, stats = asyncio.run(run())
+    by_peer = {label: (result, error) for label, result, error in replies}
+    assert sorted(by_peer[f"{h}:{p}"][0] for h, p in addresses) == sorted(pids)
+    assert os.getpid() not in pids
+    # The process that is not running shows up as an error instead of failing the broadcast.
+    assert by_peer[f"{dead[0]}:{dead[1]}"][0] is None and by_peer[f"{dead[0]}:{dead[1]}"][1]
+    assert echoed == {"big": "x" * 1_000_000}
+    assert stats["failed"] == 1 and stats["connected"] == 2
+
+
+def test_wrong_secret_is_rejected(peers):
+    addresses, _ = peers(1, secret="other-secret")
+
+    async def run():
+        ipc = ShardIPC("client", "127.0.0.1", 0, addresses, secret=SECRET, timeout=5)
+        try:
+            with pytest.raises(IPCError):
+                await ipc.request(addresses[0], "whoami", {})
+        finally:
+            await ipc.close()
+
+    asyncio.run(run())
+
+
+def test_sharded_bot_processes(tmp_path):
+    """Two main.py processes over one SQLite database: global bans and new users reach both."""
+    import bench_shards
+    import sqlite_backend
+    from bench_handlers import generate
+
+    generate(tmp_path, 1_000)
+    sqlite_backend.import_csvs(tmp_path / "zions_gate.db", tmp_path / "servers.csv", tmp_path / "users.csv")
+    result = bench_shards.run(2, 6, tmp_path, free_port())
+    assert result["merged_guilds"] and result["caches_banned"] and result["caches_unbanned"]
+    assert result["search_shared"]
@@ -0,0 +1,79 @@
+import subprocess
+
+from git import Repo
+
+from snapshot import SnapshotPublisher
+
+
+def git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+def make_repos(tmp_path):
+    remote = tmp_path / "remote.git"
+    git("init", "--bare", "-q", str(remote), cwd=tmp_path)
+    work = tmp_path / "work"
+    repo = Repo.init(work)
+    with repo.config_writer() as config:
+        config.set_value("user", "name", "Bot")
+        config.set_value("user", "email", "bot@example.invalid")
+    users = work / "users.csv"
+    users.write_text("User_AI_ID,User_ID\n1,100\n", encoding="utf-8")
+    return remote, work, users
+
+
+def remote_log(remote):
+    return git("log", "--format=%s", "HEAD", cwd=remote).splitlines()
+
+
+def remote_file(remote, name):
+    return git("show", f"HEAD:{name}", cwd=remote)
+
+
+def test_snapshot_is_one_moving_commit_on_a_bare_remote(tmp_path):
+    remote, work, users = make_repos(tmp_path)
+    publisher = SnapshotPublisher(work, [users], str(remote), window=30)
+    publisher.mark_dirty()
+    assert publisher.flush(timeout=30)
+    assert remote_file(remote, "users.csv") == "User_AI_ID,User_ID\n1,100\n"
+    assert len(remote_log(remote)) == 1
+
+    users.write_text("User_AI_ID,User_ID\n1,100\n2,200\n", encoding="utf-8")
+    publisher.mark_dirty()
+    assert publisher.flush(timeout=30)
+    assert remote_file(remote, "users.csv").endswith("2,200\n")
+    # Amended and force-pushed, so the remote never grows a history.
+    assert len(remote_log(remote)) == 1
+    publisher.close(timeout=30)
+
+
+def test_unchanged_files_are_not_pushed_again(tmp_path):
+    remote, work, users = make_repos(tmp_path)
+    publisher = SnapshotPublisher(work, [users], str(remote), window=30)
+    publisher.mark_dirty()
+    assert publisher.flush(timeout=30)
+    head = git("rev-parse", "HEAD", cwd=remote)
+
+    # A restart: the new publisher compares against the pushed HEAD.
+    publisher.close(timeout=30)
+    publisher = SnapshotPublisher(work, [users], str(remote), window=30)
+    publisher.mark_dirty()
+    assert publisher.flush(timeout=30)
+    assert git("rev-parse", "HEAD", cwd=remote) == head
+    publisher.close(timeout=30)
+
+
+def test_close_flushes_pending_changes(tmp_path):
+    remote, work, users = make_repos(tmp_path)
+    publisher = SnapshotPublisher(work, [users], str(remote), window=3600)
+    publisher.mark_dirty()
+    publisher.close(timeout=30)
+    assert remote_file(remote, "users.csv") == "User_AI_ID,User_ID\n1,100\n"
+
+
+def test_no_remote_means_no_worker(tmp_path):
+    _, work, users = make_repos(tmp_path)
+    publisher = SnapshotPublisher(work, [users], None)
+    publisher.mark_dirty()
+    assert publisher.flush(timeout=1)
+    publisher.close()
@@ -0,0 +1,48 @@
+from sqlite_backend import SQLiteDatabase
+
+UPSERT_USER = ("INSERT INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s) "
+               "ON DUPLICATE KEY UPDATE Global_Banned = VALUES(Global_Banned)")
+INSERT_USER = "INSERT IGNORE INTO Users (User_ID, User_Name, Account_Age, Global_Banned) VALUES (%s, %s, %s, %s)"
+
+
+def open_database(tmp_path):
+    inserted = []
+    database = SQLiteDatabase(tmp_path / "zions_gate.db", on_insert=lambda table, rows: inserted.extend(rows))
+    return database, inserted
+
+
+def test_upsert_that_updates_is_not_reported_as_an_insert(tmp_path):
+    database, inserted = open_database(tmp_path)
+    connection = database.connect()
+    cursor = connection.cursor()
+    cursor.execute(INSERT_USER, (1, "a#0001", "2021-06-01", "False"))
+    cursor.execute(UPSERT_USER, (1, "a#0001", "2021-06-01", "True"))
+    cursor.execute(UPSERT_USER, (2, "b#0002", "2021-06-01", "True"))
+    connection.commit()
+    assert [row["User_ID"] for row in inserted] == [1, 2]
+    cursor.execute("SELECT User_ID, Global_Banned FROM Users ORDER BY User_ID")
+    assert cursor.fetchall() == [(1, "True"), (2, "True")]
+    database.close()
+
+
+def test_bulk_upsert_counts_only_new_rows(tmp_path):
+    database, inserted = open_database(tmp_path)
+    connection = database.connect()
+    cursor = connection.cursor()
+    cursor.executemany(UPSERT_USER, [(1, "a#0001", "2021-06-01", "False"), (2, "b#0002", "2021-06-01", "False")])
+    cursor.executemany(UPSERT_USER, [(2, "b#0002", "2021-06-01", "True"), (3, "c#0003", "2021-06-01", "True"),
+                                     (1, "a#0001", "2021-06-01", "True")])
+    assert cursor.rowcount == 1
+    connection.commit()
+    assert [row["User_ID"] for row in inserted] == [1, 2, 3]
+    database.close()
+
+
+def test_insert_ignore_reports_only_new_rows(tmp_path):
+    database, inserted = open_database(tmp_path)
+    connection = database.connect()
+    cursor = connection.cursor()
+    cursor.executemany(INSERT_USER, [(1, "a#0001", "2021-06-01", "False"), (1, "a#0001", "2021-06-01", "False")])
+    connection.commit()
+    assert [row["User_ID"] for row in inserted] == [1]
+    database.close()
@@ -0,0 +1,85 @@
+import sys
+import threading
+
+import pytest
+
+from user_table import COLUMNS, UserTable
+
+HEADER = ",".join(COLUMNS) + "\n"
+
+
+@pytest.fixture
+def paths(tmp_path):
+    csv_path = tmp_path / "users.csv"
+    csv_path.write_text(HEADER + "1,100,alice#0001,2020-01-02,False\n2,200,bob#0002,2021-03-04,True\n",
+                        encoding="utf-8")
+    return csv_path, tmp_path / "users.csv.journal"
+
+
+def open_table(paths, **kwargs):
+    csv_path, journal_path = paths
+    return UserTable(csv_path, COLUMNS, journal_path=journal_path, **kwargs)
+
+
+def test_reads_like_csv_rows(paths):
+    table = open_table(paths)
+    assert dict(table.get(100)) == {"User_AI_ID": "1", "User_ID": "100", "User_Name": "alice#0001",
+                                    "Account_Age": "2020-01-02", "Global_Banned": "False"}
+    assert table.is_banned(200) is True
+    assert table.is_banned(300) is None
+    assert table.banned_user_ids() == [200]
+    table.close()
+
+
+def test_rename_survives_replay_and_compaction(paths):
+    table = open_table(paths)
+    assert table.update(100, {"User_Name": "alice#9999", "Global_Banned": "True"})
+    assert table.get(100)["User_Name"] == "alice#9999"
+    assert ("100", "alice#9999") in table.id_name_pairs()
+    table.close()
+
+    table = open_table(paths)
+    assert table.get(100)["User_Name"] == "alice#9999"
+    assert table.is_banned(100) is True
+    table.update(100, {"User_Name": "alice#0042"})
+    table.compact()
+    table.close()
+    assert "alice#0042" in paths[0].read_text(encoding="utf-8")
+
+
+def test_ids_cannot_change(paths):
+    table = open_table(paths)
+    with pytest.raises(ValueError):
+        table.update(100, {"User_ID": "101"})
+    table.close()
+
+
+def test_lookups_stay_consistent_while_merging(paths):
+    table = open_table(paths)
+    table.MERGE_MIN = 16
+    inserted = []
+    missing = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            for user_id in inserted[-64:]:
+                if user_id not in table:
+                    missing.append(user_id)
+
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        for i in range(20_000):
+            user_id = 1_000_000 + i
+            table.insert({"User_ID": str(user_id), "User_Name": f"u{i}#0001",
+                          "Account_Age": "2022-01-01", "Global_Banned": "False"})
+            inserted.append(user_id)
+    finally:
+        done.set()
+        thread.join()
+        sys.setswitchinterval(previous)
+    table.close()
+    assert missing == []
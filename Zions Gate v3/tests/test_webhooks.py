@@ -0,0 +1,117 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from tracing import tracer
+from webhooks import WebhookDispatcher
+
+
+class StubDiscord:
+    """A local webhook endpoint that answers with queued statuses, then 204."""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.posts = []
+
+    async def handle(self, request):
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            self.posts.append({"payload": json.loads(form["payload_json"]),
+                               "files": [(f.filename, f.file.read()) for k, f in form.items() if k != "payload_json"]})
+        else:
+            self.posts.append({"payload": await request.json(), "files": []})
+        status = self.statuses.pop(0) if self.statuses else 204
+        if status == 429:
+            return web.json_response({"retry_after": 0.01}, status=429)
+        return web.Response(status=status)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/hook", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/hook"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def run(statuses, send, max_retries=5):
+    async def main():
+        async with StubDiscord(statuses) as stub:
+            dispatcher = WebhookDispatcher(max_retries=max_retries)
+            send(dispatcher, stub.url)
+            await dispatcher.close()
+            return stub, dispatcher
+
+    return asyncio.run(main())
+
+
+def test_queued_messages_are_merged_into_one_post():
+    def send(dispatcher, url):
+        dispatcher.enqueue(url, content="first")
+        dispatcher.enqueue(url, content="second", embeds=[{"description": "x"}])
+
+    stub, dispatcher = run([], send)
+    assert [p["payload"] for p in stub.posts] == [{"content": "first\n\nsecond", "embeds": [{"description": "x"}]}]
+    assert dispatcher.sent == 1 and dispatcher.failed == 0
+
+
+def test_rate_limits_and_server_errors_are_retried():
+    stub, dispatcher = run([429, 502], lambda d, url: d.enqueue(url, content="ban"))
+    assert [p["payload"]["content"] for p in stub.posts] == ["ban"] * 3
+    assert dispatcher.retries == 2 and dispatcher.sent == 1
+
+
+def test_client_errors_are_not_retried():
+    stub, dispatcher = run([400], lambda d, url: d.enqueue(url, content="bad"))
+    assert len(stub.posts) == 1
+    assert dispatcher.failed == 1 and dispatcher.retries == 0
+
+
+def test_files_go_as_multipart_and_are_not_merged():
+    def send(dispatcher, url):
+        dispatcher.enqueue(url, content="purge log", files=[("purge.txt", b"deleted", "text/plain")])
+        dispatcher.enqueue(url, content="after")
+
+    stub, _ = run([], send)
+    assert stub.posts[0] == {"payload": {"content": "purge log"}, "files": [("purge.txt", b"deleted")]}
+    assert stub.posts[1]["payload"] == {"content": "after"}
+
+
+def test_missing_url_is_dropped():
+    assert WebhookDispatcher().enqueue(None, content="x") is False
+
+
+def test_posts_sent_after_the_command_finished_join_its_trace(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracer, "path", tmp_path / "traces.jsonl")
+    monkeypatch.setattr(tracer, "slow_ms", 0)
+    monkeypatch.setattr(tracer, "enabled", True)
+
+    async def main():
+        async with StubDiscord() as stub:
+            dispatcher = WebhookDispatcher()
+            traces = []
+            for name in ("/localban", "/localkick"):
+                trace = tracer.start(name)
+                dispatcher.enqueue(stub.url, content=name)
+                traces.append(trace)
+            # The commands answer before the worker gets to post.
+            for trace in traces:
+                tracer.finish(trace)
+            assert not tracer.path.exists()
+            await dispatcher.close()
+            return stub
+
+    stub = asyncio.run(main())
+    assert len(stub.posts) == 1
+    written = [json.loads(line) for line in tracer.path.read_text(encoding="utf-8").splitlines()]
+    assert [t["name"] for t in written] == ["/localban", "/localkick"]
+    for trace in written:
+        root, send = trace["spans"]
+        assert send["name"] == "webhook_send" and send["parent"] == root["id"]
@@ -0,0 +1,239 @@
+"""Per-interaction tracing: one trace per slash command, child spans for checks, storage, REST and webhooks.
+
+Traces slower than slow_ms are appended to a JSON-lines file, one trace per
+line. To look at them as a flame graph, convert the file to Chrome trace
+events and open the result in chrome://tracing, Perfetto or speedscope:
+
+    python tracing.py slow_traces.jsonl -o slow_traces.json
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, UTC
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+_current: "ContextVar[Optional[Span]]" = ContextVar("trace_span", default=None)
+_span_ids = count(1)
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "started_at", "spans", "finished", "root", "status", "pending")
+
+    def __init__(self, name: str):
+        self.trace_id = os.urandom(8).hex()
+        self.name = name
+        self.started_at = datetime.now(UTC)
+        self.spans: List["Span"] = []
+        # Set once the trace has been written (or dropped); later spans are discarded.
+        self.finished = False
+        self.root: Optional["Span"] = None
+        # Set by Tracer.finish(); the trace is written once no handed-off work is pending.
+        self.status: Optional[str] = None
+        self.pending = 0
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "start", "end", "error", "_token")
+
+    def __init__(self, trace: Trace, parent_id: Optional[int], name: str, attrs: Optional[Dict[str, Any]]):
+        self.trace = trace
+        self.span_id = next(_span_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = self.end = 0.0
+        self.error: Optional[str] = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _current.reset(self._token)
+        # Spans that end after their trace was written (background work) are dropped.
+        if not self.trace.finished:
+            self.trace.spans.append(self)
+        return False
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        record = {
+            "id": self.span_id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+        }
+        if self.attrs:
+            record["attrs"] = self.attrs
+        if self.error:
+            record["error"] = self.error
+        return record
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class _Activate:
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span: Optional[Span]):
+        self.span = span
+
+    def __enter__(self):
+        self._token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+class Tracer:
+    """Starts and finishes traces and writes the slow ones to `path`.
+
+    span() is a no-op outside a trace, so instrumented code pays one
+    context-variable lookup when nothing is being traced. Work queued for
+    another task (webhook posts) takes hand_off() and calls release() when
+    done; a finished trace waits for those before it is written.
+    """
+
+    def __init__(self, path: Optional[Path] = None, slow_ms: float = 1000.0, enabled: bool = True):
+        self.path = path
+        self.slow_ms = slow_ms
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.traces = 0
+        self.written = 0
+
+    def start(self, name: str, **attrs: Any) -> Optional[Trace]:
+        """Open a trace and make its root span current for the calling task."""
+        if not self.enabled:
+            return None
+        trace = Trace(name)
+        trace.root = Span(trace, None, name, attrs or None)
+        trace.root.start = time.perf_counter()
+        # Not reset on finish: finish() usually runs in another task, and a
+        # finished trace makes span() a no-op anyway.
+        _current.set(trace.root)
+        return trace
+
+    def finish(self, trace: Optional[Trace], status: str = "ok"):
+        if trace is None or trace.finished or trace.status is not None:
+            return
+        trace.root.end = time.perf_counter()
+        trace.status = status
+        if not trace.pending:
+            self._complete(trace)
+
+    def hand_off(self) -> Optional[Span]:
+        """The current span, with its trace kept open until release(span) is called."""
+        span = _current.get()
+        if span is None or span.trace.finished:
+            return None
+        span.trace.pending += 1
+        return span
+
+    def release(self, span: Optional[Span]):
+        if span is None:
+            return
+        trace = span.trace
+        trace.pending -= 1
+        if not trace.pending and trace.status is not None and not trace.finished:
+            self._complete(trace)
+
+    def _complete(self, trace: Trace):
+        trace.finished = True
+        self.traces += 1
+        root = trace.root
+        duration_ms = (root.end - root.start) * 1000
+        if duration_ms >= self.slow_ms and self.path is not None:
+            self._write(trace, trace.status, duration_ms)
+
+    def span(self, name: str, attrs: Optional[Dict[str, Any]] = None):
+        parent = _current.get()
+        if parent is None or parent.trace.finished:
+            return _NOOP
+        return Span(parent.trace, parent.span_id, name, attrs)
+
+    def current(self) -> Optional[Span]:
+        return _current.get()
+
+    def activate(self, span: Optional[Span]) -> _Activate:
+        """Make `span` the parent for spans opened inside the block (e.g. work handed to another task)."""
+        return _Activate(span)
+
+    def _write(self, trace: Trace, status: str, duration_ms: float):
+        origin = trace.root.start
+        record = {
+            "trace_id": trace.trace_id,
+            "name": trace.name,
+            "started_at": trace.started_at.isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            "status": status,
+            "spans": [trace.root.to_dict(origin)] + [s.to_dict(origin) for s in list(trace.spans)],
+        }
+        line = json.dumps(record, default=str) + "\n"
+        try:
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.written += 1
+        except OSError as e:
+            print(f"[tracing] Could not write slow trace: {e}")
+
+
+def to_chrome_events(traces: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chrome trace-event "complete" events; each trace gets its own row (tid)."""
+    events = []
+    for tid, trace in enumerate(traces, 1):
+        origin = datetime.fromisoformat(trace["started_at"]).timestamp() * 1_000_000
+        events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": tid,
+                       "args": {"name": f"{trace['name']} {trace['trace_id']}"}})
+        for span in trace["spans"]:
+            events.append({
+                "ph": "X", "name": span["name"], "pid": 1, "tid": tid,
+                "ts": origin + span["start_ms"] * 1000, "dur": span["duration_ms"] * 1000,
+                "args": dict(span.get("attrs") or {}, **({"error": span["error"]} if "error" in span else {})),
+            })
+    return events
+
+
+# Process-wide tracer; main.py sets path, threshold and enabled from the environment.
+tracer = Tracer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert slow traces to Chrome trace-event JSON.")
+    parser.add_argument("traces", type=Path, help="JSON-lines file written by the bot")
+    parser.add_argument("-o", "--out", type=Path, default=None, help="output file (default: stdout)")
+    args = parser.parse_args()
+    with open(args.traces, encoding="utf-8") as f:
+        traces = [json.loads(line) for line in f if line.strip()]
+    output = json.dumps({"traceEvents": to_chrome_events(traces)})
+    if args.out:
+        args.out.write_text(output, encoding="utf-8")
+        print(f"Wrote {len(traces)} trace(s) to {args.out}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
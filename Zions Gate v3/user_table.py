@@ -0,0 +1,410 @@
+import csv
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from csv_store import CSVTable
+from id_index import build_index, index_is_fresh
+
+AI_ID = "User_AI_ID"
+USER_ID = "User_ID"
+USER_NAME = "User_Name"
+ACCOUNT_AGE = "Account_Age"
+GLOBAL_BANNED = "Global_Banned"
+COLUMNS = [AI_ID, USER_ID, USER_NAME, ACCOUNT_AGE, GLOBAL_BANNED]
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+MAX_UINT64 = (1 << 64) - 1
+MAX_UINT32 = (1 << 32) - 1
+
+
+def _canonical_int(value: str, limit: int = MAX_UINT64) -> Optional[int]:
+    """int(value) if str() of it gives value back exactly (no sign, spaces or leading zeros), else None."""
+    if value.isascii() and value.isdigit() and (value[0] != "0" or value == "0"):
+        number = int(value)
+        if number <= limit:
+            return number
+    return None
+
+
+# Account ages cluster on a few thousand dates, so parsed dates are memoized.
+_DAYS: Dict[str, int] = {}
+
+
+def _days(value: str) -> Optional[int]:
+    days = _DAYS.get(value)
+    if days is not None:
+        return days
+    if len(value) == 10 and value[4] == "-" and value[7] == "-":
+        try:
+            days = date.fromisoformat(value).toordinal() - EPOCH_ORDINAL
+        except ValueError:
+            return None
+        if 0 <= days <= MAX_UINT32:
+            _DAYS[value] = days
+            return days
+    return None
+
+
+class UserColumns:
+    """The Users table as parallel typed arrays.
+
+    User_AI_ID and User_ID are array('Q'), Account_Age is days since
+    1970-01-01 in array('I'), Global_Banned is one bit per row, and names are
+    UTF-8 in a single byte pool with an offset per row. A value that does not
+    round-trip through its column type (e.g. a non-date Account_Age) is kept
+    verbatim in `overflow`, so saving reproduces the CSV exactly.
+    """
+
+    __slots__ = ("ai_ids", "user_ids", "ages", "banned", "name_pool", "name_offsets", "overflow")
+
+    def __init__(self):
+        self.ai_ids = array("Q")
+        self.user_ids = array("Q")
+        self.ages = array("I")
+        self.banned = bytearray()
+        self.name_pool = bytearray()
+        self.name_offsets = array("Q", [0])
+        self.overflow: Dict[Tuple[int, str], str] = {}
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def copy(self) -> "UserColumns":
+        other = UserColumns()
+        other.ai_ids = array("Q", self.ai_ids)
+        other.user_ids = array("Q", self.user_ids)
+        other.ages = array("I", self.ages)
+        other.banned = bytearray(self.banned)
+        other.name_pool = bytearray(self.name_pool)
+        other.name_offsets = array("Q", self.name_offsets)
+        other.overflow = dict(self.overflow)
+        return other
+
+    def append(self, row: Dict[str, Any]) -> int:
+        get = row.get
+        return self.append_values(get(AI_ID, ""), get(USER_ID, ""), get(USER_NAME, ""),
+                                  get(ACCOUNT_AGE, ""), get(GLOBAL_BANNED, ""))
+
+    def append_values(self, ai_id, user_id, user_name, account_age, global_banned) -> int:
+        r = len(self.user_ids)
+        self.ai_ids.append(self._int(r, AI_ID, ai_id))
+        self.ages.append(self._age(r, account_age))
+        if not r & 7:
+            self.banned.append(0)
+        if global_banned == "True":
+            self.banned[r >> 3] |= 1 << (r & 7)
+        elif global_banned != "False":
+            self._set_banned(r, str(global_banned))
+        self.name_pool += str(user_name).encode("utf-8")
+        self.name_offsets.append(len(self.name_pool))
+        # User_ID last: a row is visible to readers once len() counts it.
+        self.user_ids.append(self._int(r, USER_ID, user_id))
+        return r
+
+    def _int(self, r: int, column: str, value: Any) -> int:
+        value = str(value)
+        number = _canonical_int(value)
+        if number is None:
+            self.overflow[(r, column)] = value
+            return 0
+        return number
+
+    def _age(self, r: int, value: Any) -> int:
+        value = str(value)
+        days = _days(value)
+        if days is None:
+            self.overflow[(r, ACCOUNT_AGE)] = value
+            return 0
+        return days
+
+    def _set_banned(self, r: int, value: str):
+        self.overflow.pop((r, GLOBAL_BANNED), None)
+        if value == "True":
+            self.banned[r >> 3] |= 1 << (r & 7)
+            return
+        self.banned[r >> 3] &= ~(1 << (r & 7)) & 0xFF
+        if value != "False":
+            self.overflow[(r, GLOBAL_BANNED)] = value
+            if value.strip().lower() in ("1", "true", "yes"):
+                self.banned[r >> 3] |= 1 << (r & 7)
+
+    def is_banned(self, r: int) -> bool:
+        return bool(self.banned[r >> 3] & (1 << (r & 7)))
+
+    def set(self, r: int, column: str, value: Any):
+        value = str(value)
+        if column == GLOBAL_BANNED:
+            self._set_banned(r, value)
+        elif column == ACCOUNT_AGE:
+            self.overflow.pop((r, column), None)
+            self.ages[r] = self._age(r, value)
+        elif column == USER_NAME:
+            # The pool is append-only; a renamed row keeps its new name beside it.
+            self.overflow[(r, column)] = value
+        elif column in (AI_ID, USER_ID):
+            raise ValueError(f"{column} cannot be changed")
+        else:
+            raise ValueError(f"Unknown or read-only column: {column}")
+
+    def value(self, r: int, column: str) -> str:
+        if self.overflow:
+            raw = self.overflow.get((r, column))
+            if raw is not None:
+                return raw
+        if column == USER_ID:
+            return str(self.user_ids[r])
+        if column == USER_NAME:
+            return self.name_pool[self.name_offsets[r]:self.name_offsets[r + 1]].decode("utf-8")
+        if column == GLOBAL_BANNED:
+            return "True" if self.is_banned(r) else "False"
+        if column == ACCOUNT_AGE:
+            return date.fromordinal(self.ages[r] + EPOCH_ORDINAL).isoformat()
+        if column == AI_ID:
+            return str(self.ai_ids[r])
+        raise KeyError(column)
+
+    def row_dict(self, r: int) -> Dict[str, str]:
+        return {c: self.value(r, c) for c in COLUMNS}
+
+
+class UserRow(Mapping):
+    """Read-only view of one UserTable row; reads like the dict CSVTable returns."""
+
+    __slots__ = ("_columns", "_row")
+
+    def __init__(self, columns: UserColumns, row: int):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, column: str) -> str:
+        return self._columns.value(self._row, column)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(COLUMNS)
+
+    def __len__(self) -> int:
+        return len(COLUMNS)
+
+    def __repr__(self) -> str:
+        return f"UserRow({self._columns.row_dict(self._row)!r})"
+
+
+class _IntIdSet(set):
+    """User_AI_IDs seen so far, held as ints but queried with the journal's strings."""
+
+    def __contains__(self, value) -> bool:
+        number = _canonical_int(str(value))
+        return set.__contains__(self, str(value) if number is None else number)
+
+    def add(self, value):
+        number = _canonical_int(str(value))
+        set.add(self, str(value) if number is None else number)
+
+
+class UserTable(CSVTable):
+    """CSVTable for users.csv, holding rows in UserColumns instead of one dict per user.
+
+    Lookups by User_ID binary-search a sorted (User_ID, row) index; rows added
+    since the index was last rebuilt sit in a small dict that is merged in
+    once it grows past 1/32 of the table. The three are swapped as one
+    tuple, so a lock-free reader never pairs a merged index with the emptied
+    dict that replaced the one it was merged from. get() and rows() return UserRow
+    views. Journal, compaction and save behave exactly as in CSVTable.
+
+    With an index_path, the on-disk User_ID index (id_index.py) is rebuilt in
+    a background thread whenever the CSV is rewritten, or at load if it does
+    not match the CSV.
+    """
+
+    MERGE_MIN = 4096
+
+    def __init__(self, path, columns: List[str], key_field: str = USER_ID, id_field: str = AI_ID,
+                 index_path=None, **kwargs):
+        if list(columns) != COLUMNS or key_field != USER_ID or id_field != AI_ID:
+            raise ValueError(f"UserTable expects columns {COLUMNS} keyed by {USER_ID}")
+        self._columns = UserColumns()
+        # (sorted User_IDs, row of each, User_ID -> row added since the last merge).
+        self._lookup: Tuple[array, array, Dict[int, int]] = (array("Q"), array("I"), {})
+        self._odd_keys: Dict[str, int] = {}
+        self.index_path = index_path
+        self._indexer: Optional[threading.Thread] = None
+        self._index_lock = threading.Lock()
+        self._index_dirty = False
+        super().__init__(path, columns, key_field, id_field, **kwargs)
+        if index_path is not None and self.path.exists() and not index_is_fresh(index_path, self.path):
+            self._rewritten()
+
+    # Row storage
+    def _read_csv(self) -> Iterator[List[str]]:
+        """users.csv rows as lists in COLUMNS order; skips building a dict per row."""
+        if not self.path.exists():
+            return
+        with open(self.path, newline='', encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            if header == COLUMNS:
+                for row in reader:
+                    if len(row) == 5:
+                        yield row
+                    elif row:
+                        yield (row + [""] * 5)[:5]
+                return
+            positions = [header.index(c) if c in header else None for c in COLUMNS]
+            for row in reader:
+                if row:
+                    yield [row[i] if i is not None and i < len(row) else "" for i in positions]
+
+    def _reset(self, rows: Iterable[List[str]]):
+        columns = UserColumns()
+        odd_keys: Dict[str, int] = {}
+        append = columns.append_values
+        for row in rows:
+            r = append(*row)
+            if (r, USER_ID) in columns.overflow:
+                odd_keys.setdefault(columns.overflow[(r, USER_ID)], r)
+        numeric = range(len(columns))
+        if odd_keys:
+            numeric = [r for r in numeric if (r, USER_ID) not in columns.overflow]
+        # sorted() is stable, so the first row of a duplicated User_ID comes first.
+        order = sorted(numeric, key=columns.user_ids.__getitem__)
+        self._columns = columns
+        self._lookup = (array("Q", (columns.user_ids[r] for r in order)), array("I", order), {})
+        self._odd_keys = odd_keys
+
+    def _find(self, key: str, number: Optional[int] = None) -> Optional[int]:
+        if number is None:
+            number = _canonical_int(key)
+            if number is None:
+                return self._odd_keys.get(key)
+        keys, rows, recent = self._lookup
+        i = bisect_left(keys, number)
+        if i < len(keys) and keys[i] == number:
+            return rows[i]
+        return recent.get(number)
+
+    def _append(self, row: Dict[str, str]):
+        key = str(row[USER_ID])
+        number = _canonical_int(key)
+        if number is None:
+            first = key not in self._odd_keys
+        else:
+            first = self._find(key, number) is None
+        r = self._columns.append(row)
+        if not first:
+            return
+        if number is None:
+            self._odd_keys[key] = r
+            return
+        keys, _, recent = self._lookup
+        recent[number] = r
+        if len(recent) > max(self.MERGE_MIN, len(keys) >> 5):
+            self._merge_recent()
+
+    def _merge_recent(self):
+        keys, rows, recent = self._lookup
+        recent = sorted(recent.items())
+        merged_keys = array("Q")
+        merged_rows = array("I")
+        i = 0
+        for key, row in recent:
+            j = bisect_left(keys, key, i)
+            merged_keys.extend(keys[i:j])
+            merged_rows.extend(rows[i:j])
+            merged_keys.append(key)
+            merged_rows.append(row)
+            i = j
+        merged_keys.extend(keys[i:])
+        merged_rows.extend(rows[i:])
+        self._lookup = (merged_keys, merged_rows, {})
+
+    def _assign(self, key: str, values: Dict[str, Any]) -> bool:
+        r = self._find(key)
+        if r is None:
+            return False
+        for column, value in values.items():
+            self._columns.set(r, column, value)
+        return True
+
+    def _known_ids(self) -> Set[str]:
+        ids = _IntIdSet(self._columns.ai_ids)
+        for (r, column), raw in self._columns.overflow.items():
+            if column == AI_ID:
+                ids.add(raw)
+        return ids
+
+    def _max_id(self) -> int:
+        return max(self._columns.ai_ids, default=0)
+
+    def _iter_rows(self) -> Iterable[Dict[str, str]]:
+        columns = self._columns
+        return (columns.row_dict(r) for r in range(len(columns)))
+
+    def _snapshot(self) -> Iterable[Dict[str, str]]:
+        columns = self._columns.copy()
+        return (columns.row_dict(r) for r in range(len(columns)))
+
+    # On-disk User_ID index
+    def _rewritten(self):
+        if self.index_path is None:
+            return
+        with self._index_lock:
+            self._index_dirty = True
+            if self._indexer is not None:
+                return
+            self._indexer = threading.Thread(target=self._build_index, name=f"index-{self.path.name}", daemon=True)
+            self._indexer.start()
+
+    def _build_index(self):
+        # Rewrites that land mid-build mark the index dirty again, so it is rebuilt once more.
+        while True:
+            with self._index_lock:
+                if not self._index_dirty:
+                    self._indexer = None
+                    return
+                self._index_dirty = False
+            try:
+                build_index(self.path, self.index_path)
+            except Exception as e:
+                print(f"[{self.path.name}] Could not build User_ID index: {e}")
+
+    def close(self):
+        super().close()
+        indexer = self._indexer
+        if indexer is not None:
+            indexer.join()
+
+    # Reads
+    def get(self, key) -> Optional[UserRow]:
+        r = self._find(str(key))
+        return None if r is None else UserRow(self._columns, r)
+
+    def __contains__(self, key) -> bool:
+        return self._find(str(key)) is not None
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def rows(self) -> List[UserRow]:
+        columns = self._columns
+        return [UserRow(columns, r) for r in range(len(columns))]
+
+    def is_banned(self, key) -> Optional[bool]:
+        """Global_Banned as a bool, or None for an unknown user; no strings built."""
+        r = self._find(str(key))
+        return None if r is None else self._columns.is_banned(r)
+
+    def id_name_pairs(self) -> List[Tuple[str, str]]:
+        """(User_ID, User_Name) for every row, for the /searchuser index."""
+        columns = self._columns
+        return [(columns.value(r, USER_ID), columns.value(r, USER_NAME)) for r in range(len(columns))]
+
+    def banned_user_ids(self) -> List[int]:
+        columns = self._columns
+        return [columns.user_ids[r] for r in range(len(columns))
+                if columns.banned[r >> 3] and columns.is_banned(r) and (r, USER_ID) not in columns.overflow]
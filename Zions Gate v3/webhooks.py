@@ -0,0 +1,168 @@
+import asyncio
+import contextvars
+import json
+import random
+import time
+from contextlib import ExitStack
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import aiohttp
+
+from metrics import metrics
+from tracing import tracer
+
+MAX_CONTENT = 2000
+MAX_EMBEDS = 10
+
+
+class WebhookMessage(NamedTuple):
+    content: Optional[str]
+    embeds: List[Dict[str, Any]]
+    files: List[Tuple[str, bytes, str]]  # (filename, data, content type)
+    spans: Tuple[Any, ...] = ()  # trace spans that enqueued the message, held via tracer.hand_off()
+
+
+class WebhookDispatcher:
+    """Background webhook delivery over one long-lived aiohttp session.
+
+    enqueue() returns immediately. Each URL gets its own queue and worker, so
+    one slow or rate-limited channel doesn't hold up another. Queued plain
+    messages for the same URL are merged into a single post where Discord's
+    limits allow. 429 and 5xx responses are retried with backoff.
+    """
+
+    def __init__(self, max_retries: int = 5):
+        self.max_retries = max_retries
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def enqueue(self, url: Optional[str], content: Optional[str] = None,
+                embeds: Optional[List[Dict[str, Any]]] = None,
+                files: Optional[List[Tuple[str, bytes, str]]] = None) -> bool:
+        if not url:
+            print("Webhook URL not set; message dropped.")
+            return False
+        queue = self._queues.get(url)
+        if queue is None:
+            queue = self._queues[url] = asyncio.Queue()
+            # A fresh context, so the worker doesn't inherit whichever interaction created it.
+            self._workers[url] = asyncio.create_task(self._worker(url, queue), context=contextvars.Context())
+        span = tracer.hand_off()
+        queue.put_nowait(WebhookMessage(content, embeds or [], files or [], (span,) if span else ()))
+        return True
+
+    def queue_depths(self) -> Dict[str, int]:
+        return {url: q.qsize() for url, q in self._queues.items()}
+
+    async def _worker(self, url: str, queue: asyncio.Queue):
+        carry = None
+        while True:
+            message = carry if carry is not None else await queue.get()
+            carry = None
+            taken = 1
+            # Fold whatever else is already waiting into the same post.
+            while not queue.empty():
+                following = queue.get_nowait()
+                merged = _merge(message, following)
+                if merged is None:
+                    carry = following
+                    break
+                message = merged
+                taken += 1
+            started = time.perf_counter()
+            status = "failed"
+            try:
+                with ExitStack() as stack:
+                    # One webhook_send span in the trace of each message folded into this post.
+                    for span in message.spans:
+                        stack.enter_context(tracer.activate(span))
+                        stack.enter_context(tracer.span("webhook_send"))
+                    ok = await self._send(url, message)
+                if ok:
+                    self.sent += 1
+                    status = "ok"
+                else:
+                    self.failed += 1
+            except Exception as e:
+                self.failed += 1
+                status = "error"
+                print(f"Error sending webhook message: {e}")
+            finally:
+                metrics.observe("webhook_send_seconds", time.perf_counter() - started, status=status)
+                for span in message.spans:
+                    tracer.release(span)
+                for _ in range(taken):
+                    queue.task_done()
+
+    async def _send(self, url: str, message: WebhookMessage) -> bool:
+        payload: Dict[str, Any] = {}
+        if message.content:
+            payload["content"] = message.content
+        if message.embeds:
+            payload["embeds"] = message.embeds
+        for attempt in range(self.max_retries + 1):
+            if message.files:
+                data = aiohttp.FormData()
+                data.add_field("payload_json", json.dumps(payload), content_type="application/json")
+                for i, (filename, body, content_type) in enumerate(message.files):
+                    data.add_field(f"files[{i}]", body, filename=filename, content_type=content_type)
+                request = self.session.post(url, data=data)
+            else:
+                request = self.session.post(url, json=payload)
+            async with request as response:
+                if response.status in (200, 204):
+                    return True
+                if response.status == 429:
+                    try:
+                        retry_after = float((await response.json()).get("retry_after", 1.0))
+                    except Exception:
+                        retry_after = float(response.headers.get("Retry-After", 1.0))
+                elif response.status >= 500:
+                    retry_after = 2 ** attempt * 0.5
+                else:
+                    print(f"Webhook post failed: {response.status} {await response.text()}")
+                    return False
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(retry_after + random.uniform(0, 0.25))
+        print(f"Webhook post failed after {self.max_retries} retries.")
+        return False
+
+    async def close(self, timeout: float = 10.0):
+        """Give queued messages a chance to go out, then stop the workers and the session."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues.values())), timeout)
+        except asyncio.TimeoutError:
+            print(f"Webhook dispatcher closed with {sum(self.queue_depths().values())} message(s) unsent.")
+        for task in self._workers.values():
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        for queue in self._queues.values():
+            while not queue.empty():
+                for span in queue.get_nowait().spans:
+                    tracer.release(span)
+        self._queues.clear()
+        self._workers.clear()
+        if self._session is not None:
+            await self._session.close()
+
+
+def _merge(first: WebhookMessage, second: WebhookMessage) -> Optional[WebhookMessage]:
+    if first.files or second.files:
+        return None
+    parts = [c for c in (first.content, second.content) if c]
+    content = "\n\n".join(parts) if parts else None
+    embeds = first.embeds + second.embeds
+    if content and len(content) > MAX_CONTENT or len(embeds) > MAX_EMBEDS:
+        return None
+    return WebhookMessage(content, embeds, [], first.spans + second.spans)